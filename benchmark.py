@@ -0,0 +1,202 @@
+"""
+Benchmark suite. Generates square worlds of given sizes and measures
+wall time and peak memory of loading, saving and playing them.
+Results are stored as json and can be compared with baseline:
+
+    python benchmark.py --sizes 10 100 --output results.json
+    python benchmark.py --baseline results.json --threshold 0.2
+
+Time is median time of one call in seconds, peak memory is measured
+with tracemalloc during one more call, in bytes.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from classes import FileHandler, Gem, Enemy
+from generator import WorldGenerator
+
+
+DEFAULT_SIZES = (10, 100, 500, 1000, 2000)
+OPERATIONS = ('read_from_json', 'save_to_json', 'move', 'look_around',
+              'use_gem', 'fight', 'did_win')
+
+
+def write_world(path, size, seed=0):
+    """
+    Writes json save with square world of given size.
+    """
+    WorldGenerator(size, seed=seed).save(path)
+
+
+def _run(operation, setup, repeat):
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup else ()
+        start = time.perf_counter()
+        operation(*args)
+        times.append(time.perf_counter() - start)
+    args = setup() if setup else ()
+    tracemalloc.start()
+    try:
+        operation(*args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {'time': statistics.median(times), 'peak': peak,
+            'repeat': repeat}
+
+
+def _operations(path, save_path, player):
+    x, y = player.current_location()
+    locations = player.locations()
+    here = locations[x][y]
+    east = locations[x][y + 1]
+    for location in (here, east):
+        location.set_barrier(0)
+    position = (x, y)
+    registry = player.enemy_registry()
+
+    def move():
+        player.move('east')
+        player.move('west')
+
+    def use_gem():
+        east.set_barrier(1)
+        player.equipment().append(Gem('gem', east.barrier_color()))
+        return ()
+
+    def fight():
+        player.set_health(100)
+        here.add_enemy(Enemy('Goblin', 20, 1))
+        registry.add(position, 'Goblin')
+        return ()
+
+    return {
+        'read_from_json': (lambda: FileHandler().read_from_json(path), None),
+        'save_to_json': (lambda: FileHandler().save_to_json(save_path,
+                                                            player), None),
+        'move': (move, None),
+        'look_around': (player.look_around, None),
+        'use_gem': (lambda: player.use_gem('east'), use_gem),
+        'fight': (lambda: player.fight('Goblin'), fight),
+        'did_win': (player.did_win, None)
+    }
+
+
+def run_size(size, repeat=None, operations=OPERATIONS, seed=0):
+    """
+    Returns dict with results of operations for world of given size.
+    """
+    if size < 3:
+        raise ValueError('World has to be at least 3x3')
+    if repeat is None:
+        repeat = 5 if size <= 100 else 1
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'world.json')
+        save_path = os.path.join(directory, 'save.json')
+        write_world(path, size, seed)
+        player = FileHandler().read_from_json(path)
+        benchmarks = _operations(path, save_path, player)
+        results = {}
+        random.seed(seed)
+        for name in operations:
+            operation, setup = benchmarks[name]
+            if name in ('read_from_json', 'save_to_json'):
+                results[name] = _run(operation, setup, repeat)
+            else:
+                results[name] = _run(operation, setup, 1000)
+        return results
+
+
+def run(sizes=DEFAULT_SIZES, repeat=None, operations=OPERATIONS, seed=0):
+    """
+    Returns results of all operations for all sizes,
+    in the format stored in json file.
+    """
+    results = {name: {} for name in operations}
+    for size in sizes:
+        for name, result in run_size(size, repeat, operations, seed).items():
+            results[name][str(size)] = result
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'results': results
+    }
+
+
+def compare(results, baseline, threshold=0.2):
+    """
+    Compares time of operations with baseline.
+    Returns list of (operation, size, ratio) for operations which got
+    slower than baseline by more than threshold.
+    """
+    regressions = []
+    for name, sizes in results['results'].items():
+        for size, result in sizes.items():
+            old = baseline['results'].get(name, {}).get(size)
+            if not old or not old['time']:
+                continue
+            ratio = result['time'] / old['time']
+            if ratio > 1 + threshold:
+                regressions.append((name, int(size), ratio))
+    return regressions
+
+
+def describe(results, baseline=None):
+    """
+    Returns results as table, with ratio to baseline if it is given.
+    """
+    lines = [f'{"operation":<16}{"size":>6}{"time":>14}{"peak":>14}'
+             + ('  vs baseline' if baseline else '')]
+    for name, sizes in results['results'].items():
+        for size, result in sizes.items():
+            line = (f'{name:<16}{size:>6}{result["time"] * 1e6:>12.1f}us'
+                    + f'{result["peak"] / 1024:>12.1f}kB')
+            old = (baseline or {}).get('results', {}).get(name, {}).get(size)
+            if old and old['time']:
+                line += f'  {result["time"] / old["time"]:.2f}x'
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Text game benchmarks')
+    parser.add_argument('--sizes', type=int, nargs='+',
+                        default=list(DEFAULT_SIZES))
+    parser.add_argument('--operations', nargs='+', choices=OPERATIONS,
+                        default=list(OPERATIONS))
+    parser.add_argument('--repeat', type=int,
+                        help='number of loads and saves for every size')
+    parser.add_argument('--output', help='file to store results in')
+    parser.add_argument('--baseline', help='results to compare with')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown, 0.2 means 20%%')
+    args = parser.parse_args()
+    results = run(args.sizes, args.repeat, args.operations)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file_handle:
+            baseline = json.load(file_handle)
+    print(describe(results, baseline))
+    if args.output:
+        with open(args.output, 'w') as file_handle:
+            json.dump(results, file_handle, indent=4)
+    if baseline:
+        regressions = compare(results, baseline, args.threshold)
+        for name, size, ratio in regressions:
+            print(f'Regression: {name} for size {size} is {ratio:.2f}x'
+                  + ' slower than baseline')
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
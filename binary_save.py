@@ -0,0 +1,383 @@
+"""
+Binary save file, version 1. All numbers are little-endian.
+
+    header
+    string offsets      (string_count + 1) x u64, relative to string data
+    string data         utf-8 encoded strings
+    players             player_count x PLAYER
+    locations           location_count x LOCATION, sorted by x and y
+    enemies             enemy_count x ENEMY
+    gems                gem_count x GEM
+
+Names, descriptions and colors are stored once in the string table and
+records refer to them by index. NO_STRING stands for None.
+Enemies and gems of one location or player are stored next to each
+other, records point to the first of them and store their number.
+"""
+import json
+import mmap
+import os
+import struct
+from json_stream import JsonStream
+import validation
+
+
+MAGIC = b'TGSB'
+VERSION = 1
+NO_STRING = 0xFFFFFFFF
+
+HEADER = struct.Struct('<4sHHIIIIII5Q')
+# name, x, y, power, health, first gem, gem count
+PLAYER = struct.Struct('<7I')
+# x, y, name, description, barrier color, barrier,
+# first enemy, enemy count, first gem, gem count
+LOCATION = struct.Struct('<5IB3x4I')
+# name, health, power
+ENEMY = struct.Struct('<3I')
+# name, color
+GEM = struct.Struct('<2I')
+
+
+class BinarySaveError(Exception):
+    pass
+
+
+class _StringTable:
+    def __init__(self):
+        self._ids = {}
+        self._strings = []
+
+    def add(self, string):
+        if string is None:
+            return NO_STRING
+        string_id = self._ids.get(string)
+        if string_id is None:
+            string_id = len(self._strings)
+            self._ids[string] = string_id
+            self._strings.append(string)
+        return string_id
+
+    def to_bytes(self):
+        offsets = bytearray()
+        data = bytearray()
+        for string in self._strings:
+            offsets += struct.pack('<Q', len(data))
+            data += string.encode('utf-8')
+        offsets += struct.pack('<Q', len(data))
+        return bytes(offsets), bytes(data)
+
+    def __len__(self):
+        return len(self._strings)
+
+
+class BinaryWriter:
+    """
+    Class BinaryWriter. Collects players and locations and writes them
+    as binary save. Players and locations are dicts in the same form
+    as in json saves and can be added in any order.
+    """
+    def __init__(self):
+        self._strings = _StringTable()
+        self._players = bytearray()
+        self._player_count = 0
+        self._locations = []
+        self._is_sorted = True
+        self._last_key = None
+        self._enemies = bytearray()
+        self._enemy_count = 0
+        self._gems = bytearray()
+        self._gem_count = 0
+
+    def _add_gems(self, gems):
+        first = self._gem_count
+        for gem in gems:
+            self._gems += GEM.pack(self._strings.add(gem['name']),
+                                   self._strings.add(gem['color']))
+            self._gem_count += 1
+        return first, self._gem_count - first
+
+    def add_player(self, player):
+        x, y = player['current_location'].split(',')
+        first_gem, gems_number = self._add_gems(player['equipment'])
+        self._players += PLAYER.pack(self._strings.add(player['name']),
+                                     int(x), int(y),
+                                     player['power'], player['health'],
+                                     first_gem, gems_number)
+        self._player_count += 1
+
+    def add_location(self, location):
+        strings = self._strings
+        first_enemy = self._enemy_count
+        for enemy in location['enemies']:
+            self._enemies += ENEMY.pack(strings.add(enemy['name']),
+                                        enemy['health'], enemy['power'])
+            self._enemy_count += 1
+        first_gem, gems_number = self._add_gems(location['gems'])
+        record = LOCATION.pack(location['x'], location['y'],
+                               strings.add(location['name']),
+                               strings.add(location['description']),
+                               strings.add(location['barrier_color']),
+                               1 if location['barrier'] else 0,
+                               first_enemy, self._enemy_count - first_enemy,
+                               first_gem, gems_number)
+        key = location['x'], location['y']
+        if self._last_key is not None and key < self._last_key:
+            self._is_sorted = False
+        self._last_key = key
+        self._locations.append(record)
+
+    def finish(self, file_handle, map_size):
+        """
+        Writes collected data to file opened in binary mode.
+        """
+        if not self._is_sorted:
+            self._locations.sort(key=lambda record:
+                                 LOCATION.unpack(record)[:2])
+        offsets, data = self._strings.to_bytes()
+        strings_offset = HEADER.size
+        players_offset = strings_offset + len(offsets) + len(data)
+        locations_offset = players_offset + len(self._players)
+        enemies_offset = (locations_offset
+                          + LOCATION.size * len(self._locations))
+        gems_offset = enemies_offset + len(self._enemies)
+        file_handle.write(HEADER.pack(MAGIC, VERSION, 0, map_size,
+                                      len(self._strings), self._player_count,
+                                      len(self._locations),
+                                      self._enemy_count, self._gem_count,
+                                      strings_offset, players_offset,
+                                      locations_offset, enemies_offset,
+                                      gems_offset))
+        file_handle.write(offsets)
+        file_handle.write(data)
+        file_handle.write(self._players)
+        file_handle.write(b''.join(self._locations))
+        file_handle.write(self._enemies)
+        file_handle.write(self._gems)
+
+
+def write(file_handle, map_size, players, locations):
+    """
+    Writes save in binary format to file opened in binary mode.
+    Locations can be any iterable, e.g. generator.
+    """
+    writer = BinaryWriter()
+    for location in locations:
+        writer.add_location(location)
+    for player in players:
+        writer.add_player(player)
+    writer.finish(file_handle, map_size)
+
+
+class BinarySave:
+    """
+    Class BinarySave. Reads save in binary format.
+    Records are decoded only when they are asked for, so single location
+    can be read without decoding the rest of the file.
+    :param source: path to file or bytes
+    :type source: str
+    """
+    def __init__(self, source):
+        self._file_handle = None
+        self._mmap = None
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._data = source
+        else:
+            self._file_handle = open(source, 'rb')
+            if os.fstat(self._file_handle.fileno()).st_size:
+                self._mmap = mmap.mmap(self._file_handle.fileno(), 0,
+                                       access=mmap.ACCESS_READ)
+            self._data = self._mmap if self._mmap is not None else b''
+        if len(self._data) < HEADER.size:
+            self.close()
+            raise BinarySaveError('File is too short')
+        (magic, version, _, self._map_size, self._string_count,
+         self._player_count, self._location_count, self._enemy_count,
+         self._gem_count, self._strings_offset, self._players_offset,
+         self._locations_offset, self._enemies_offset,
+         self._gems_offset) = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            self.close()
+            raise BinarySaveError('Not a binary save file')
+        if version != VERSION:
+            self.close()
+            raise BinarySaveError(f'Unsupported version {version}')
+        self._string_data = (self._strings_offset
+                             + 8 * (self._string_count + 1))
+        self._strings = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file_handle is not None:
+            self._file_handle.close()
+            self._file_handle = None
+
+    def map_size(self):
+        return self._map_size
+
+    def location_count(self):
+        return self._location_count
+
+    def string(self, string_id):
+        """
+        Returns string with given id from string table.
+        """
+        if string_id == NO_STRING:
+            return None
+        string = self._strings.get(string_id)
+        if string is None:
+            start, end = struct.unpack_from(
+                '<QQ', self._data, self._strings_offset + 8 * string_id)
+            string = bytes(self._data[self._string_data + start:
+                                      self._string_data + end]).decode()
+            self._strings[string_id] = string
+        return string
+
+    def _gems(self, first, count):
+        gems = []
+        for index in range(first, first + count):
+            name, color = GEM.unpack_from(self._data,
+                                          self._gems_offset
+                                          + GEM.size * index)
+            gems.append({'name': self.string(name),
+                         'color': self.string(color)})
+        return gems
+
+    def players(self):
+        """
+        Returns list of players as dicts, without locations.
+        """
+        players = []
+        for index in range(self._player_count):
+            name, x, y, power, health, first_gem, gems = PLAYER.unpack_from(
+                self._data, self._players_offset + PLAYER.size * index)
+            players.append({
+                'name': self.string(name),
+                'current_location': f'{x},{y}',
+                'power': power,
+                'health': health,
+                'equipment': self._gems(first_gem, gems)
+            })
+        return players
+
+    def _location_key(self, index):
+        return struct.unpack_from('<II', self._data,
+                                  self._locations_offset
+                                  + LOCATION.size * index)
+
+    def location_index(self, x, y):
+        """
+        Returns index of location record at given coordinates
+        or None if there is no such location.
+        """
+        low, high = 0, self._location_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._location_key(middle) < (x, y):
+                low = middle + 1
+            else:
+                high = middle
+        if low < self._location_count and self._location_key(low) == (x, y):
+            return low
+        return None
+
+    def location_at(self, index):
+        """
+        Returns location record with given index as dict.
+        """
+        (x, y, name, description, barrier_color, barrier, first_enemy,
+         enemies_number, first_gem, gems_number) = LOCATION.unpack_from(
+            self._data, self._locations_offset + LOCATION.size * index)
+        enemies = []
+        for enemy_index in range(first_enemy, first_enemy + enemies_number):
+            e_name, health, power = ENEMY.unpack_from(
+                self._data, self._enemies_offset + ENEMY.size * enemy_index)
+            enemies.append({'name': self.string(e_name),
+                            'health': health,
+                            'power': power})
+        return {
+            'x': x,
+            'y': y,
+            'name': self.string(name),
+            'description': self.string(description),
+            'barrier': barrier,
+            'barrier_color': self.string(barrier_color),
+            'enemies': enemies,
+            'gems': self._gems(first_gem, gems_number)
+        }
+
+    def location(self, x, y):
+        """
+        Returns location at given coordinates as dict
+        or None if there is no such location.
+        """
+        index = self.location_index(x, y)
+        if index is None:
+            return None
+        return self.location_at(index)
+
+    def locations(self):
+        """
+        Yields all locations as dicts, sorted by x and y.
+        """
+        for index in range(self._location_count):
+            yield self.location_at(index)
+
+
+def json_to_binary(json_path, binary_path):
+    """
+    Converts json save to binary save.
+    Locations are checked and read from json file one by one.
+    Raises SaveValidationError, which is KeyError, if save is not valid.
+    """
+    writer = BinaryWriter()
+    validator = validation.SaveValidator()
+    has_map_size = False
+    has_player = False
+    try:
+        with open(json_path, 'r') as file_handle:
+            stream = JsonStream(file_handle)
+            for key in stream.members():
+                if key == 'map_size':
+                    has_map_size = True
+                    validator.check_map_size(stream.value())
+                elif key == 'player':
+                    has_player = True
+                    for index in stream.items():
+                        player = validator.stream_player(
+                            stream, f'player[{index}]', writer.add_location)
+                        if not validator.problems():
+                            writer.add_player(player)
+                else:
+                    stream.value()
+        validator.finish(has_map_size, has_player)
+    except validation.TooManyProblems:
+        pass
+    if validator.problems():
+        raise validation.SaveValidationError(validator.problems())
+    with open(binary_path, 'wb') as file_handle:
+        writer.finish(file_handle, validator.size())
+
+
+def binary_to_json(binary_path, json_path):
+    """
+    Converts binary save to json save in the format of save_to_json.
+    All locations are written in the first player's data.
+    """
+    with BinarySave(binary_path) as save:
+        players = save.players()
+        for index, player in enumerate(players):
+            player['locations'] = list(save.locations()) if not index else []
+        data = {
+            'map_size': save.map_size(),
+            'player': players
+        }
+    with open(json_path, 'w') as file_handle:
+        json.dump(data, file_handle, indent=4)
@@ -1,5 +1,18 @@
 import json
+import os
+import sys
+from collections import OrderedDict
+from contextlib import nullcontext
+from itertools import islice
 from random import randint
+import binary_save
+import connectivity
+import pathfinding
+import perf
+import validation
+from commands import CommandError, CommandRegistry
+import predictor
+from json_stream import JsonStream
 
 
 class NegativePowerError(Exception):
@@ -34,154 +47,568 @@ class FilePathNotFound(Exception):
     pass
 
 
+class FrozenWorldError(Exception):
+    pass
+
+
+class EnemyRegistry:
+    """
+    Keeps count of living enemies on the map: in total, per location
+    and per enemy name. Lets win checks run without scanning the map.
+    """
+    def __init__(self, world=None):
+        self._total = 0
+        self._by_location = {}
+        self._by_name = {}
+        self._world = None
+        if world is None:
+            return
+        total = world.enemy_count()
+        if total is not None:
+            # counts per location and name are gathered on first use
+            self._total = total
+            self._world = world
+            return
+        self._scan(world)
+
+    def _scan(self, world):
+        for x, y, location in world.cells():
+            for enemy in location._enemies:
+                self.add((x, y), enemy._name)
+
+    def _index(self):
+        if self._world is not None:
+            world = self._world
+            self._world = None
+            self._total = 0
+            self._scan(world)
+
+    def add(self, position, name):
+        """
+        Registers living enemy at given position.
+        """
+        self._total += 1
+        if self._world is not None:
+            return
+        self._by_location[position] = self._by_location.get(position, 0) + 1
+        self._by_name[name] = self._by_name.get(name, 0) + 1
+
+    def remove(self, position, name):
+        """
+        Unregisters enemy that died at given position.
+        """
+        self._total -= 1
+        if self._world is not None:
+            return
+        left = self._by_location[position] - 1
+        if left:
+            self._by_location[position] = left
+        else:
+            del self._by_location[position]
+        left = self._by_name[name] - 1
+        if left:
+            self._by_name[name] = left
+        else:
+            del self._by_name[name]
+
+    def count(self):
+        """
+        Returns number of living enemies on the map.
+        """
+        return self._total
+
+    def count_at(self, position):
+        """
+        Returns number of living enemies at given position.
+        """
+        self._index()
+        return self._by_location.get(position, 0)
+
+    def count_named(self, name):
+        """
+        Returns number of living enemies with given name.
+        """
+        self._index()
+        return self._by_name.get(name, 0)
+
+    def positions(self):
+        """
+        Returns positions which still have living enemies.
+        """
+        self._index()
+        return self._by_location.keys()
+
+
+def _intern(value):
+    # names, descriptions and colors repeat across the map,
+    # interning keeps one copy of each
+    if isinstance(value, str):
+        return sys.intern(value)
+    return value
+
+
 class FileHandler():
+    def _read_gem(self, data):
+        return Gem(_intern(data['name']), _intern(data['color']))
+
+    def _read_enemy(self, data):
+        return Enemy(_intern(data['name']), data['health'], data['power'])
+
+    def _read_location(self, data):
+        enemies = [self._read_enemy(enemy) for enemy in data['enemies']]
+        gems = [self._read_gem(gem) for gem in data['gems']]
+        return Location(_intern(data['name']),
+                        _intern(data['description']),
+                        data['barrier'],
+                        _intern(data['barrier_color']),
+                        enemies,
+                        gems,
+                        data['x'],
+                        data['y'])
+
+    def _read_current_location(self, data):
+        player_x, player_y = data.split(',')
+        return int(player_x), int(player_y)
+
+    def _read_player(self, data, players_map):
+        current_location = self._read_current_location(
+            data['current_location'])
+        gems_eq = [self._read_gem(gem) for gem in data['equipment']]
+        return Player(data['name'], current_location, players_map,
+                      data['power'], data['health'], gems_eq)
+
+    @perf.timed
     def read_from_json(self, path):
+        """
+        Reads game saved by save_to_json.
+        Raises SaveValidationError, which is KeyError, if save is not valid.
+        """
         with open(path, 'r') as file_handle:
-            players_map = []
-            map = []
             data = json.load(file_handle)
-            map_size = data['map_size']
-            for item in data['player']:
-                gems_eq = []
-                try:
-                    p_name = item['name']
-                    player_x, player_y = item['current_location'].split(',')
-                    current_location = int(player_x), int(player_y)
-                    power = item['power']
-                    health = item['health']
-                    equipment = item['equipment']
-                    locations = item['locations']
-                    for p_item in equipment:
-                        try:
-                            gp_name = p_item['name']
-                            gp_color = p_item['color']
-                        except KeyError:
-                            raise KeyError('Missing key in file')
-                        gems_eq.append(Gem(gp_name, gp_color))
-                    for location in locations:
-                        enemies_loc = []
-                        gems_loc = []
-                        try:
-                            x = location['x']
-                            y = location['y']
-                            name = location['name']
-                            description = location['description']
-                            barrier = location['barrier']
-                            barrier_color = location['barrier_color']
-                            enemies = location['enemies']
-                            gems = location['gems']
-                            for enemy in enemies:
-                                try:
-                                    e_name = enemy['name']
-                                    e_health = enemy['health']
-                                    e_power = enemy['power']
-                                    enemy_class = Enemy(e_name, e_health,
-                                                        e_power)
-                                except KeyError:
-                                    raise KeyError('Missing key in file')
-                                enemies_loc.append(enemy_class)
-                            for gem in gems:
-                                try:
-                                    g_name = gem['name']
-                                    g_color = gem['color']
-                                    gem_class = Gem(g_name, g_color)
-                                except KeyError:
-                                    raise KeyError('Missing key in file')
-                                gems_loc.append(gem_class)
-                        except KeyError:
-                            raise KeyError('Missing key in file')
-                        loc = Location(name,
-                                       description,
-                                       barrier,
-                                       barrier_color,
-                                       enemies_loc,
-                                       gems_loc,
-                                       x,
-                                       y)
-                        map.append(loc)
-                except KeyError as e:
-                    raise KeyError('Missing key in file') from e
-            map_tuple = map_size, map
-            for i in range(map_tuple[0]):
-                players_map.append(list(range(map_tuple[0])))
-            for place in map_tuple[1]:
-                players_map[place._x][place._y] = place
-            player = Player(p_name, current_location, players_map, power,
-                            health, gems_eq)
-            return player
-
+        validation.validate(data)
+        players_map = World(data['map_size'])
+        for item in data['player']:
+            for location in item['locations']:
+                place = self._read_location(location)
+                players_map.put(place._x, place._y, place)
+        return self._read_player(data['player'][-1], players_map)
+
+    @perf.timed
+    def stream_from_json(self, source, chunk_size=65536):
+        """
+        Reads game saved by save_to_json from path or file object.
+        Locations are checked, decoded one by one and put on the map
+        straight away, so the whole parsed file is never kept in memory.
+        Works with pipes and other file objects that cannot seek.
+        Raises SaveValidationError, which is KeyError, if save is not valid.
+        """
+        if isinstance(source, (str, bytes, os.PathLike)):
+            with open(source, 'r') as file_handle:
+                return self.stream_from_json(file_handle, chunk_size)
+        stream = JsonStream(source, chunk_size)
+        validator = validation.SaveValidator()
+        pending = []
+        players_map = None
+        player_data = None
+        has_map_size = False
+        has_player = False
+
+        def put(location):
+            place = self._read_location(location)
+            if players_map is None:
+                pending.append(place)
+            else:
+                players_map.put(place._x, place._y, place)
+
+        try:
+            for key in stream.members():
+                if key == 'map_size':
+                    has_map_size = True
+                    validator.check_map_size(stream.value())
+                    if validator.problems():
+                        continue
+                    players_map = World(validator.size())
+                    for place in pending:
+                        players_map.put(place._x, place._y, place)
+                elif key == 'player':
+                    has_player = True
+                    for index in stream.items():
+                        player_data = validator.stream_player(
+                            stream, f'player[{index}]', put)
+                else:
+                    stream.value()
+            validator.finish(has_map_size, has_player)
+        except validation.TooManyProblems:
+            pass
+        if validator.problems():
+            raise validation.SaveValidationError(validator.problems())
+        return self._read_player(player_data, players_map)
+
+    def _gem_data(self, gem):
+        return {
+            'name': gem.name(),
+            'color': gem.color()
+        }
+
+    def _enemy_data(self, enemy):
+        return {
+            'name': enemy.name(),
+            'health': enemy.health(),
+            'power': enemy.power()
+        }
+
+    def _location_data(self, x, y, location):
+        return {
+            'x': x,
+            'y': y,
+            'name': location.name(),
+            'description': location.description(),
+            'barrier': location.barrier(),
+            'barrier_color': location.barrier_color(),
+            'enemies': [self._enemy_data(enemy)
+                        for enemy in location.enemies()],
+            'gems': [self._gem_data(gem) for gem in location.items()]
+        }
+
+    def _player_data(self, player_info):
+        player_current_location = str(player_info.current_location())[1:-1]
+        player_current_location = player_current_location.replace(' ', '')
+        return {
+            'name': player_info.name(),
+            'current_location': player_current_location,
+            'power': player_info.power(),
+            'health': player_info.health(),
+            'equipment': [self._gem_data(gem)
+                          for gem in player_info.equipment()]
+        }
+
+    def _locations_data(self, player_info):
+        for x, y, location in player_info.locations().cells():
+            yield self._location_data(x, y, location)
+
+    def save_data(self, player_info):
+        """
+        Returns game as dict in the format of json save.
+        """
+        player_data = self._player_data(player_info)
+        player_data['locations'] = list(self._locations_data(player_info))
+        return {
+            'map_size': len(player_info.locations()),
+            'player': [player_data]
+        }
+
+    @perf.timed
     def save_to_json(self, path, player_info):
         with open(path, 'w') as file_handle:
-            data = []
-            map_size = len(player_info.locations())
-            player_name = player_info.name()
-            player_current_location = str(player_info.current_location())[1:-1]
-            player_current_location = player_current_location.replace(' ', '')
-            player_power = player_info.power()
-            player_health = player_info.health()
-            player_equipment = []
-            locations = []
-            for item in player_info.equipment():
-                gem_name = item.name()
-                gem_color = item.color()
-                gem = {
-                    'name': gem_name,
-                    'color': gem_color
-                }
-                player_equipment.append(gem)
-            for list in player_info.locations():
-                for item in list:
-                    x = item.x()
-                    y = item.y()
-                    name = item.name()
-                    description = item.description()
-                    barrier = item.barrier()
-                    barrier_color = item.barrier_color()
-                    enemies = []
-                    gems = []
-                    for enemy in item.enemies():
-                        enemy_name = enemy.name()
-                        enemy_health = enemy.health()
-                        enemy_power = enemy.power()
-                        en = {
-                            'name': enemy_name,
-                            'health': enemy_health,
-                            'power': enemy_power
-                        }
-                        enemies.append(en)
-                    for g in item.items():
-                        g_name = g.name()
-                        g_color = g.color()
-                        ge = {
-                            'name': g_name,
-                            'color': g_color
-                        }
-                        gems.append(ge)
-                    location = {
-                        'x': x,
-                        'y': y,
-                        'name': name,
-                        'description': description,
-                        'barrier': barrier,
-                        'barrier_color': barrier_color,
-                        'enemies': enemies,
-                        'gems': gems
-                    }
-                    locations.append(location)
-            player_data = [{
-                'name': player_name,
-                'current_location': player_current_location,
-                'power': player_power,
-                'health': player_health,
-                'equipment': player_equipment,
-                'locations': locations
-            }]
-            data_final = {
-                'map_size': map_size,
-                'player': player_data
-            }
-            data.append(data_final)
-            json.dump(data_final, file_handle, indent=4)
+            json.dump(self.save_data(player_info), file_handle, indent=4)
+
+    @perf.timed
+    def read_players(self, path):
+        """
+        Reads game with many players saved by save_players.
+        Returns list of players sharing one map.
+        """
+        with open(path, 'r') as file_handle:
+            data = json.load(file_handle)
+        validation.validate(data, max_players=None)
+        players_map = World(data['map_size'])
+        for item in data['player']:
+            for location in item['locations']:
+                place = self._read_location(location)
+                players_map.put(place._x, place._y, place)
+        return [self._read_player(item, players_map)
+                for item in data['player']]
+
+    @perf.timed
+    def save_players(self, path, players):
+        """
+        Saves players sharing one map. Locations are saved once,
+        with the first player.
+        """
+        players_data = [self._player_data(player) for player in players]
+        for player_data in players_data:
+            player_data['locations'] = []
+        players_data[0]['locations'] = list(
+            self._locations_data(players[0]))
+        data = {
+            'map_size': len(players[0].locations()),
+            'player': players_data
+        }
+        with open(path, 'w') as file_handle:
+            json.dump(data, file_handle, indent=4)
+
+    @perf.timed
+    def read_template(self, path):
+        """
+        Reads game saved by save_to_json and freezes its map.
+        New games are started from it with Player.fork.
+        """
+        player = self.read_from_json(path)
+        player.locations().freeze()
+        return player
+
+    @perf.timed
+    def save_overlay(self, path, player_info):
+        """
+        Saves game played on OverlayWorld with only locations which
+        differ from the template.
+        """
+        player_data = self._player_data(player_info)
+        player_data['locations'] = [
+            self._location_data(x, y, location) for x, y, location
+            in player_info.locations().overlay_cells()]
+        data = {
+            'map_size': len(player_info.locations()),
+            'overlay': True,
+            'player': [player_data]
+        }
+        with open(path, 'w') as file_handle:
+            json.dump(data, file_handle, indent=4)
+
+    @perf.timed
+    def read_overlay(self, path, template):
+        """
+        Reads game saved by save_overlay on top of template world.
+        Raises SaveValidationError, which is KeyError, if save is not
+        valid or does not fit the template.
+        """
+        with open(path, 'r') as file_handle:
+            data = json.load(file_handle)
+        validation.validate(data, overlay=True)
+        if data['map_size'] != len(template):
+            raise validation.SaveValidationError(
+                [('map_size', 'Does not match template')])
+        player = data['player'][-1]
+        path = f"player[{len(data['player']) - 1}]"
+        if template.get(*self._read_current_location(
+                player['current_location'])) is VOID:
+            raise validation.SaveValidationError(
+                [(f'{path}.current_location', 'Not in template')])
+        players_map = OverlayWorld(template)
+        for index, location in enumerate(player['locations']):
+            place = self._read_location(location)
+            if template.get(place._x, place._y) is VOID:
+                raise validation.SaveValidationError(
+                    [(f'{path}.locations[{index}]', 'Not in template')])
+            players_map.restore(place._x, place._y, place)
+        return self._read_player(player, players_map)
+
+    @perf.timed
+    def save_to_binary(self, path, player_info):
+        """
+        Saves game in compact binary format.
+        """
+        temporary_path = f'{path}.tmp'
+        with open(temporary_path, 'wb') as file_handle:
+            binary_save.write(file_handle,
+                              len(player_info.locations()),
+                              [self._player_data(player_info)],
+                              self._locations_data(player_info))
+        os.replace(temporary_path, path)
+        player_info.locations().saved(path)
+
+    @perf.timed
+    def read_from_binary(self, path, lazy=False, cache_size=4096):
+        """
+        Reads game saved by save_to_binary.
+        If lazy is True, locations are read from memory-mapped file only
+        when they are used, see PagedWorld.
+        """
+        if lazy:
+            players_map = PagedWorld(path, cache_size)
+            player_data = players_map._save.players()[-1]
+        else:
+            with binary_save.BinarySave(path) as save:
+                players_map = World(save.map_size())
+                for data in save.locations():
+                    place = self._read_location(data)
+                    players_map.put(place._x, place._y, place)
+                player_data = save.players()[-1]
+        current_location = self._read_current_location(
+            player_data['current_location'])
+        gems_eq = [self._read_gem(gem) for gem in player_data['equipment']]
+        return Player(player_data['name'], current_location, players_map,
+                      player_data['power'], player_data['health'], gems_eq)
+
+
+class Journal:
+    """
+    Class Journal. Saves game as json snapshot and append-only journal
+    of changes made since the snapshot, kept in file next to it.
+    Saving writes only new changes. Journal is compacted into new
+    snapshot when it grows above threshold.
+    :param path: path to snapshot file
+    :type path: str
+    :param threshold: journal size in bytes that triggers compaction
+    :type threshold: int
+    """
+    def __init__(self, path, threshold=1 << 20):
+        self._path = path
+        self._journal_path = f'{path}.journal'
+        self._threshold = threshold
+        self._changes = []
+        self._needs_snapshot = True
+
+    def path(self):
+        """
+        Returns path to snapshot file.
+        """
+        return self._path
+
+    def journal_path(self):
+        """
+        Returns path to journal file.
+        """
+        return self._journal_path
+
+    def record(self, change):
+        """
+        Adds change to list of changes waiting to be saved.
+        """
+        self._changes.append(change)
+
+    def attach(self, player):
+        """
+        Starts recording player's changes. Next save writes snapshot.
+        """
+        player._journal = self
+        self._changes = []
+        self._needs_snapshot = True
+
+    def save(self, player):
+        """
+        Appends changes to journal or writes new snapshot.
+        """
+        if self._needs_snapshot or not os.path.exists(self._path):
+            return self.snapshot(player)
+        lines = ''.join(json.dumps(change) + '\n'
+                        for change in self._changes)
+        size = 0
+        if os.path.exists(self._journal_path):
+            size = os.path.getsize(self._journal_path)
+        if size + len(lines) > self._threshold:
+            return self.snapshot(player)
+        with open(self._journal_path, 'a') as file_handle:
+            file_handle.write(lines)
+        self._changes = []
+
+    def snapshot(self, player):
+        """
+        Writes whole game to snapshot file and empties journal.
+        """
+        # journal starts with id of its snapshot, so that journal left
+        # over after failed compaction is not replayed on new snapshot
+        snapshot_id = os.urandom(8).hex()
+        data = {'journal': snapshot_id}
+        data.update(FileHandler().save_data(player))
+        temporary_path = f'{self._path}.tmp'
+        with open(temporary_path, 'w') as file_handle:
+            json.dump(data, file_handle, indent=4)
+        os.replace(temporary_path, self._path)
+        with open(self._journal_path, 'w') as file_handle:
+            file_handle.write(json.dumps(['snapshot', snapshot_id]) + '\n')
+        self._changes = []
+        self._needs_snapshot = False
+
+    def load(self):
+        """
+        Reads snapshot, replays journal on it and returns player
+        with this journal attached.
+        """
+        player = FileHandler().read_from_json(self._path)
+        snapshot_id = None
+        with open(self._path, 'r') as file_handle:
+            stream = JsonStream(file_handle, chunk_size=256)
+            for key in stream.members():
+                if key == 'journal':
+                    snapshot_id = stream.value()
+                break
+        if os.path.exists(self._journal_path):
+            with open(self._journal_path, 'r') as file_handle:
+                header = file_handle.readline()
+                if header and json.loads(header) == ['snapshot',
+                                                     snapshot_id]:
+                    for line in file_handle:
+                        if line.strip():
+                            self._apply(player, json.loads(line))
+        player._journal = self
+        self._changes = []
+        self._needs_snapshot = False
+        return player
+
+    def _apply(self, player, change):
+        kind = change[0]
+        world = player._locations
+        if kind == 'position':
+            player._set_location((change[1], change[2]))
+        elif kind == 'barrier':
+            world.remove_barrier(change[1], change[2])
+        elif kind == 'pickup':
+            world.take_gems(change[1], change[2], player._equipment)
+        elif kind == 'gem_used':
+            player._equipment.take(change[1])
+        elif kind == 'enemy_health':
+            location = world.writable(change[1], change[2])
+            location.enemy_at(change[3]).set_health(change[4])
+        elif kind == 'enemy_died':
+            location = world.writable(change[1], change[2])
+            player._remove_enemy((change[1], change[2]), location,
+                                 location.enemy_at(change[3]))
+        elif kind == 'health':
+            player._health = change[1]
+        elif kind == 'power':
+            player._power = change[1]
+        else:
+            raise ValueError(f'Unknown change in journal: {kind}')
+
+
+# Rules of moving, using gems, picking up gems and fighting. Player and
+# solver.Model both follow them, so that solver plays the same game.
+STEPS = {'north': (-1, 0), 'south': (1, 0), 'west': (0, -1), 'east': (0, 1)}
+DIRECTIONS = tuple(STEPS)
+
+
+def step(x, y, direction):
+    """
+    Returns coordinates of location next to x, y in given direction.
+    """
+    dx, dy = STEPS[direction]
+    return x + dx, y + dy
+
+
+def can_enter(location):
+    """
+    Returns True if player can move into location.
+    """
+    return not location._barrier
+
+
+def opening_gem(location):
+    """
+    Returns color of gem which removes barrier of location.
+    """
+    return location._barrier_color
+
+
+def leaving_opens(location):
+    """
+    Returns True if moving out of location removes its barrier.
+    """
+    return bool(location._barrier)
+
+
+def gems_to_pick(location):
+    """
+    Returns gems which player takes when picking up gems in location.
+    """
+    return location._items
+
+
+def can_fight(enemy):
+    """
+    Returns True if enemy is fought, enemy without health is not.
+    """
+    return enemy.is_alive()
 
 
 class Player:
@@ -200,6 +627,10 @@ class Player:
     :param equipment: player's equipment
     :param type: list
     """
+    __slots__ = ('_name', '_power', '_current_location', '_locations',
+                 '_equipment', '_health', '_base_health', '_enemy_registry',
+                 '_journal')
+
     def __init__(self,
                  name,
                  current_location=None,
@@ -216,11 +647,19 @@ class Player:
         if health < 0:
             raise NegativeHealthError(health)
         self._power = int(power)
+        if not isinstance(locations, World):
+            locations = World.from_rows(locations)
         self._current_location = current_location
         self._locations = locations
+        if not isinstance(equipment, Inventory):
+            equipment = Inventory(equipment)
         self._equipment = equipment
         self._health = health
         self._base_health = health
+        self._enemy_registry = locations.enemy_registry()
+        self._journal = None
+        if current_location is not None:
+            locations.add_player(self, *current_location)
 
     def name(self):
         """
@@ -258,6 +697,12 @@ class Player:
         """
         return self._equipment
 
+    def enemy_registry(self):
+        """
+        Returns registry of living enemies on player's map.
+        """
+        return self._enemy_registry
+
     def set_power(self, new_power):
         """
         Sets player's power.
@@ -265,6 +710,7 @@ class Player:
         if new_power < 0:
             raise NegativePowerError(new_power)
         self._power = int(new_power)
+        self._record('power', self._power)
 
     def set_health(self, new_health):
         """
@@ -273,68 +719,94 @@ class Player:
         if new_health < 0:
             raise NegativeHealthError(new_health)
         self._health = new_health
+        self._record('health', self._health)
+
+    def journal(self):
+        """
+        Returns journal player's changes are recorded in or None.
+        """
+        return self._journal
+
+    def _record(self, *change):
+        if self._journal is not None:
+            self._journal.record(change)
+
+    def _set_location(self, new_location):
+        self._locations.move_player(self, self._current_location,
+                                    new_location)
+        self._current_location = new_location
+        self._record('position', *new_location)
+
+    def _move_to(self, direction):
+        x, y = step(self._current_location[0], self._current_location[1],
+                    direction)
+        target = self._locations[x][y]
+        if target is VOID:
+            return f'\n\t\tCannot go {direction}\n'
+        if not can_enter(target):
+            return '\n\t\tThere is a barrier. You cannot go there\n'
+        self._set_location((x, y))
+        return f'\n\t\tYou moved {direction}\n'
 
     def move_east(self):
-        x, y = self._current_location[0], self._current_location[1]
-        is_barrier = '\n\t\tThere is a barrier. You cannot go there\n'
-        if y+1 == len(self._locations):
-            return '\n\t\tCannot go east\n'
-        east = self._locations[x][y+1]
-        if east._barrier:
-            return is_barrier
-        self._current_location = (x, y + 1)
-        return '\n\t\tYou moved east\n'
+        return self._move_to('east')
 
     def move_west(self):
-        x, y = self._current_location[0], self._current_location[1]
-        is_barrier = '\n\t\tThere is a barrier. You cannot go there\n'
-        if y == 0:
-            return '\n\t\tCannot go west\n'
-        west = self._locations[x][y-1]
-        if west._barrier:
-            return is_barrier
-        self._current_location = (x, y - 1)
-        return '\n\t\tYou moved west\n'
+        return self._move_to('west')
 
     def move_north(self):
-        x, y = self._current_location[0], self._current_location[1]
-        is_barrier = '\n\t\tThere is a barrier. You cannot go there\n'
-        if x == 0:
-            return '\n\t\tCannot go north\n'
-        north = self._locations[x-1][y]
-        if north._barrier:
-            return is_barrier
-        self._current_location = (x - 1, y)
-        return '\n\t\tYou moved north\n'
+        return self._move_to('north')
 
     def move_south(self):
-        x, y = self._current_location[0], self._current_location[1]
-        is_barrier = '\n\t\tThere is a barrier. You cannot go there\n'
-        if x+1 == len(self._locations):
-            return '\n\t\tCannot go south\n'
-        south = self._locations[x+1][y]
-        if south._barrier:
-            return is_barrier
-        self._current_location = (x + 1, y)
-        return '\n\t\tYou moved south\n'
+        return self._move_to('south')
 
     def move(self, direction):
         """
         Moves player to another location if location does not have barrier.
         Changes player's current location.
         """
-        if direction not in ['east', 'west', 'north', 'south']:
+        if direction not in STEPS:
             return '\n\t\tInvalid direction\n'
+        self._leave()
+        return self._move_to(direction)
+
+    def _leave(self):
+        x, y = self._current_location[0], self._current_location[1]
+        if leaving_opens(self._locations[x][y]):
+            self._remove_barrier(x, y)
+
+    def _remove_barrier(self, x, y):
+        if self._locations.remove_barrier(x, y):
+            self._record('barrier', x, y)
+
+    def travel(self, target):
+        """
+        Moves player by the shortest way without barriers to location
+        given by name or by coordinates 'x,y'.
+        """
+        world = self._locations
+        coordinates = target.replace(' ', '').split(',')
+        if len(coordinates) == 2 and all(c.isdigit() for c in coordinates):
+            targets = [(int(coordinates[0]), int(coordinates[1]))]
+            if world.get(*targets[0]) is VOID:
+                return '\n\t\tThere is no such location.\n'
+        else:
+            targets = world.paths().cells_named(target)
+            if not targets:
+                return '\n\t\tThere is no such location.\n'
         x, y = self._current_location[0], self._current_location[1]
-        self._locations[x][y].remove_barrier()
-        if direction == 'east':
-            return self.move_east()
-        if direction == 'west':
-            return self.move_west()
-        if direction == 'north':
-            return self.move_north()
-        if direction == 'south':
-            return self.move_south()
+        if (x, y) in targets:
+            return f'\n\t\tYou are already in {world.get(x, y)._name}.\n'
+        path = world.paths().path((x, y), targets)
+        if path is None:
+            return f'\n\t\tYou cannot get to {target}.\n'
+        self._leave()
+        x, y = path[-1]
+        self._set_location((x, y))
+        name = world.get(x, y)._name
+        moves = 'move' if len(path) == 1 else 'moves'
+        return (f'\n\t\tYou travelled to {name} ({x},{y})'
+                f' in {len(path)} {moves}.\n')
 
     def pickup_gems(self):
         """
@@ -343,13 +815,11 @@ class Player:
         """
         x, y = self._current_location[0], self._current_location[1]
         location = self._locations[x][y]
-        gems = location._items
-        if not gems:
+        if not gems_to_pick(location):
             return "\n\t\tThere are no gems here\n"
         else:
-            for gem in gems:
-                self._equipment.append(gem)
-            location.clear_items()
+            self._locations.take_gems(x, y, self._equipment)
+            self._record('pickup', x, y)
             return "\n\t\tGems were added to your equipment\n"
 
     def use_gem(self, direction):
@@ -357,55 +827,36 @@ class Player:
         Uses gem from player's equipment to remove barrier
         if player has proper gem.
         """
-        if direction not in ['east', 'west', 'north', 'south']:
+        if direction not in STEPS:
             return '\n\t\tInvalid direction\n'
-        x, y = self._current_location[0], self._current_location[1]
-        east = self._locations[x][y+1]
-        west = self._locations[x][y-1]
-        north = self._locations[x-1][y]
-        south = self._locations[x+1][y]
-        length_of_eq = len(self._equipment)
-        if direction == 'east':
-            direction = east
-        if direction == 'west':
-            direction = west
-        if direction == 'north':
-            direction = north
-        if direction == 'south':
-            direction = south
-        if not direction._barrier:
+        x, y = step(self._current_location[0], self._current_location[1],
+                    direction)
+        location = self._locations[x][y]
+        if can_enter(location):
             return '\n\t\tThere is no barrier there.\n'
-        for gem in self._equipment:
-            if gem._color == direction._barrier_color:
-                direction.remove_barrier()
-                self._equipment.remove(gem)
-        if len(self._equipment) == length_of_eq:
+        gem = self._equipment.take(opening_gem(location))
+        if gem is None:
             return '\n\t\tYou do not have proper gem to remove this barrier.\n'
+        self._remove_barrier(x, y)
+        self._record('gem_used', gem._color)
         return '\n\t\tYou used gem and removed barrier.\n'
 
     def show_equipment(self):
         """
         Returns players current equipment.
         """
-        index = 0
-        equipment_description = 'You have '
-        for item in self._equipment:
-            if index == 0:
-                equipment_description += item._name
-                index += 1
-            else:
-                equipment_description += f', {item._name}'
         if not self._equipment:
             return '\n\t\tYou do not have items.\n'
-        return f'\n\t\t{equipment_description}\n'
+        names = ', '.join(item._name for item in self._equipment)
+        return f'\n\t\tYou have {names}\n'
 
     def look_east(self):
         x, y = self._current_location[0], self._current_location[1]
-        if y+1 == len(self._locations):
+        east = self._locations[x][y+1]
+        if east is VOID:
             name_e = 'Sea East'
             barrier_description_e = ''
         else:
-            east = self._locations[x][y+1]
             name_e = east._name
             if east._barrier:
                 barrier_description_e = (f'It has {east._barrier_color}'
@@ -416,11 +867,11 @@ class Player:
 
     def look_west(self):
         x, y = self._current_location[0], self._current_location[1]
-        if y == 0:
+        west = self._locations[x][y-1]
+        if west is VOID:
             name_w = 'Sea West'
             barrier_description_w = ''
         else:
-            west = self._locations[x][y-1]
             name_w = west._name
             if west._barrier:
                 barrier_description_w = (f'It has {west._barrier_color}'
@@ -431,11 +882,11 @@ class Player:
 
     def look_north(self):
         x, y = self._current_location[0], self._current_location[1]
-        if x == 0:
+        north = self._locations[x-1][y]
+        if north is VOID:
             name_n = 'Sea North'
             barrier_description_n = ''
         else:
-            north = self._locations[x-1][y]
             name_n = north._name
             if north._barrier:
                 barrier_description_n = (f'It has {north._barrier_color}'
@@ -446,11 +897,11 @@ class Player:
 
     def look_south(self):
         x, y = self._current_location[0], self._current_location[1]
-        if x+1 == len(self._locations):
+        south = self._locations[x+1][y]
+        if south is VOID:
             name_s = 'Sea South'
             barrier_description_s = ''
         else:
-            south = self._locations[x+1][y]
             name_s = south._name
             if south._barrier:
                 barrier_description_s = (f'It has {south._barrier_color}'
@@ -463,7 +914,30 @@ class Player:
         """
         Returns info about current player's location and
         locations next to player.
+        Description is cached until one of these locations changes.
         """
+        x, y = self._current_location[0], self._current_location[1]
+        description = self._locations.cached_look(x, y)
+        if description is None:
+            description = self._describe_around()
+            self._locations.remember_look(x, y, description)
+        return description + self._describe_players()
+
+    def _describe_players(self):
+        x, y = self._current_location[0], self._current_location[1]
+        world = self._locations
+        players = []
+        for place, cell in (('here', (x, y)), ('east', (x, y + 1)),
+                            ('west', (x, y - 1)), ('north', (x - 1, y)),
+                            ('south', (x + 1, y))):
+            for player in world.players_at(*cell):
+                if player is not self:
+                    players.append(f'{player._name} ({place})')
+        if not players:
+            return ''
+        return f"\t\tPlayers nearby: {', '.join(players)}.\n"
+
+    def _describe_around(self):
         x, y = self._current_location[0], self._current_location[1]
         location = self._locations[x][y]
         name_e, barrier_description_e = self.look_east()
@@ -510,6 +984,7 @@ class Player:
         if damage < 0:
             raise NegativeDamageError('Damage cannot be negative.')
         self._health -= min(damage, self._health)
+        self._record('health', self._health)
 
     def attack(self, name_of_enemy):
         """
@@ -521,13 +996,22 @@ class Player:
             return 'You have no power.'
         if not location._enemies:
             return 'There are no enemies to attack.'
-        for enemy in location._enemies:
-            en = enemy._name
-            if name_of_enemy == enemy._name:
-                damage = randint(1, self.power())
-                enemy.take_damage(damage)
-                return (f'{enemy._name} lost {damage} points of health.' +
-                        f' {en} has {enemy._health} points of health left.\n')
+        location = self._locations.writable(x, y)
+        enemy = location.find_enemy(name_of_enemy)
+        if enemy is not None:
+            return self._attack((x, y), location, enemy)
+
+    def _attack(self, position, location, enemy):
+        if self._power == 0:
+            return 'You have no power.'
+        en = enemy._name
+        damage = randint(1, self._power)
+        enemy.take_damage(damage)
+        if self._journal is not None:
+            self._record('enemy_health', *position,
+                         location.enemy_index(enemy), enemy._health)
+        return (f'{enemy._name} lost {damage} points of health.' +
+                f' {en} has {enemy._health} points of health left.\n')
 
     def enemy_attack(self, name_of_enemy):
         """
@@ -536,50 +1020,134 @@ class Player:
         """
         x, y = self._current_location[0], self._current_location[1]
         location = self._locations[x][y]
-        for enemy in location._enemies:
-            if name_of_enemy == enemy._name:
-                damage = randint(1, enemy.power())
-                self.take_damage(damage)
-                if self._health <= 0:
-                    self._health = 0
-                    return (f'You lost {damage} points of health.'
-                            + f' You have {self._health} points of health'
-                            + ' left.\n\n\t\tYou died.')
-                return (f'You lost {damage} points of health.'
-                        + f' You have {self._health} points of health left.\n')
-
-    def fight(self, name_of_enemy):
+        enemy = location.find_enemy(name_of_enemy)
+        if enemy is not None:
+            return self._enemy_attack(enemy)
+
+    def _enemy_attack(self, enemy):
+        damage = randint(1, enemy.power())
+        self.take_damage(damage)
+        if self._health <= 0:
+            self._health = 0
+            return (f'You lost {damage} points of health.'
+                    + f' You have {self._health} points of health'
+                    + ' left.\n\n\t\tYou died.')
+        return (f'You lost {damage} points of health.'
+                + f' You have {self._health} points of health left.\n')
+
+    def fight(self, name_of_enemy, log='full'):
         """
         Removes health points of player and enemy until one has no
         health points left.
+        With log 'full' returns description of every attack,
+        with 'summary' resolves fight without describing attacks and
+        returns one line with result, with 'stream' returns generator
+        of lines of full description, fight goes on as lines are read.
+        All modes draw the same random numbers in the same order.
+        Enemy without health is not fought in any mode.
+        Returns None if there is no such enemy.
         """
+        if log not in ('full', 'summary', 'stream'):
+            raise ValueError(f'Unknown fight log: {log}')
         x, y = self._current_location[0], self._current_location[1]
         location = self._locations[x][y]
-        fight = '\n'
-        for enemy in location._enemies:
-            if name_of_enemy == enemy._name:
-                while enemy.is_alive():
-                    if self._health == 0:
-                        break
-                    fight += f'\t\t{self.attack(name_of_enemy)}\n'
-                    if enemy._health == 0:
-                        fight += f'\t\t{enemy._name} died.\n'
-                        location._enemies.remove(enemy)
-                        break
-                    fight += f'\t\t{(self.enemy_attack(name_of_enemy))}\n'
-                return fight
+        if location.find_enemy(name_of_enemy) is None:
+            return None
+        location = self._locations.writable(x, y)
+        enemy = location.find_enemy(name_of_enemy)
+        alive = can_fight(enemy)
+        if log == 'summary':
+            if not alive:
+                return f'\n\t\t{enemy._name} has no health left.\n'
+            return self._resolve_fight((x, y), location, enemy)
+        if alive:
+            fight_log = self._fight_log(name_of_enemy, (x, y), location,
+                                        enemy)
+        else:
+            fight_log = iter(())
+        if log == 'stream':
+            return fight_log
+        return '\n' + ''.join(fight_log)
+
+    def _fight_log(self, name_of_enemy, position, location, enemy):
+        # enemy is shared with other players on the map, who can kill it
+        # while streamed fight waits for next line to be read
+        while True:
+            if not location.has_enemy(enemy):
+                yield f'\t\t{enemy._name} was killed by someone else.\n'
+                break
+            if self._health == 0:
+                break
+            yield f'\t\t{self._attack(position, location, enemy)}\n'
+            if not location.has_enemy(enemy):
+                continue
+            if enemy._health == 0:
+                self._remove_enemy(position, location, enemy)
+                yield f'\t\t{enemy._name} died.\n'
+                break
+            yield f'\t\t{self._enemy_attack(enemy)}\n'
+
+    def _resolve_fight(self, position, location, enemy):
+        draw = randint
+        power = self._power
+        enemy_power = enemy._power
+        health = self._health
+        enemy_health = enemy._health
+        rounds = 0
+        while enemy_health > 0 and health > 0:
+            rounds += 1
+            if power:
+                enemy_health -= min(draw(1, power), enemy_health)
+                if enemy_health == 0:
+                    break
+            health -= min(draw(1, enemy_power), health)
+        if rounds:
+            enemy.set_health(enemy_health)
+            self._health = health
+            if self._journal is not None:
+                self._record('enemy_health', *position,
+                             location.enemy_index(enemy), enemy_health)
+                self._record('health', health)
+        rounds_description = f"{rounds} round{'s' if rounds != 1 else ''}"
+        if enemy_health == 0:
+            self._remove_enemy(position, location, enemy)
+            return (f'\n\t\t{enemy._name} died after {rounds_description}.'
+                    + f' You have {health} points of health left.\n')
+        return (f'\n\t\tYou died after {rounds_description}.'
+                + f' {enemy._name} has {enemy_health} points of health'
+                + ' left.\n')
+
+    def _remove_enemy(self, position, location, enemy):
+        if self._journal is not None:
+            self._record('enemy_died', *position,
+                         location.enemy_index(enemy))
+        location.remove_enemy(enemy)
+        with self._locations.lock():
+            self._enemy_registry.remove(position, enemy._name)
+
+    def can_reach(self, x, y):
+        """
+        Returns True if player can walk to location at given coordinates
+        without removing any barrier.
+        """
+        return self._locations.connectivity().reachable(
+            self._current_location, (x, y))
+
+    def can_still_win(self):
+        """
+        Returns False if some enemy cannot be reached any more, even if
+        every gem could open all barriers of its color.
+        """
+        return self._locations.connectivity().can_reach_all(
+            self._current_location, self._equipment.color_counts(),
+            self._enemy_registry.positions())
 
+    @perf.timed
     def did_win(self):
         """
         Returns True if there are no enemies left on map.
         """
-        enemies_total = []
-        for row in self._locations:
-            for column in row:
-                for enemy in column._enemies:
-                    enemies_total.append(enemy)
-        if not enemies_total:
-            return True
+        return self._enemy_registry.count() == 0
 
     def rest(self):
         """
@@ -588,93 +1156,64 @@ class Player:
         self.set_health(self._base_health)
         return '\n\t\tYour health points have been restored.\n'
 
+    def predict_fight(self, name_of_enemy, trials=10000, seed=None):
+        """
+        Returns predicted result of fight with enemy,
+        based on given number of simulated fights.
+        """
+        x, y = self._current_location[0], self._current_location[1]
+        enemy = self._locations[x][y].find_enemy(name_of_enemy)
+        if enemy is None:
+            return f"\n\t\tThere is no enemy named {name_of_enemy}\n"
+        if enemy._power == 0:
+            return f'\n\t\t{name_of_enemy} cannot hurt you.\n'
+        prediction = predictor.predict_fight(self._health, self._power,
+                                             enemy._health, enemy._power,
+                                             trials, seed)
+        return prediction.describe(name_of_enemy)
+
     def enemy_info(self, name_of_enemy):
         x, y = self._current_location[0], self._current_location[1]
         location = self._locations[x][y]
-        for enemy in location._enemies:
-            if name_of_enemy == enemy._name:
-                return enemy.__str__()
-            else:
-                continue
+        enemy = location.find_enemy(name_of_enemy)
+        if enemy is not None:
+            return enemy.__str__()
         return f"\n\t\tThere is no enemy named {name_of_enemy}\n"
 
     def action(self, action):
         """
         Returns method proper to user's input.
+        Every command is measured in perf.STATS.
         """
-        action = action.lower().split()
-        if action[0] == 'move' and len(action) == 2:
-            return self.move(action[1])
-        if action[0] == 'use' and action[1] == 'gem' and len(action) == 3:
-            return self.use_gem(action[2])
-        if action[0] == 'pickup' and action[1] == 'gems' and len(action) == 2:
-            return self.pickup_gems()
-        if action[0] == 'look' and action[1] == 'around' and len(action) == 2:
-            return self.look_around()
-        if action[0] == 'fight':
-            enemy_name = ''
-            for item in action[1:-1]:
-                enemy_name += f"{item} "
-            enemy_name += action[-1]
-            fight = self.fight(enemy_name.title())
-            if fight is None:
-                return 'Invalid action.'
-            return fight
-        if action[0] == 'rest' and len(action) == 1:
-            return self.rest()
-        if (action[0] == 'show' and action[1] == 'equipment'
-                and len(action) == 2):
-            return self.show_equipment()
-        if action[0] == 'show' and action[1] == 'stats' and len(action) == 2:
-            return self.__str__()
-        if action[0] == 'enemy' and action[1] == 'info' and len(action) == 3:
-            return self.enemy_info(action[2].title())
-        if action[0] == 'help' and len(action) == 1:
-            return self.help()
-        if action[0] == 'save' and len(action) == 2:
-            try:
-                FileHandler().save_to_json(action[1], self)
-                return f'\n\t\tsaved to {action[1]}\n'
-            except PermissionError:
-                raise PermissionError("Missing permissions to open file")
-            except IsADirectoryError:
-                raise IsADirectoryError('Can only work on files')
-        return 'Invalid action.'
+        try:
+            command, args = COMMANDS.parse(action)
+        except CommandError:
+            return 'Invalid action.'
+        return perf.STATS.run_command(command.name, command.run, self, args)
+
+    def save(self, path):
+        """
+        Saves game to file, to journal if it is attached to this file.
+        """
+        try:
+            if self._journal and self._journal.path() == path:
+                self._journal.save(self)
+            else:
+                FileHandler().save_to_json(path, self)
+            return f'\n\t\tsaved to {path}\n'
+        except PermissionError:
+            raise PermissionError("Missing permissions to open file")
+        except IsADirectoryError:
+            raise IsADirectoryError('Can only work on files')
 
     def help(self):
         """
-        Returns commands used in game.
-        """
-        se = "'show equipment' - shows player's current equipment"
-        ss = "'show stats' - shows player's current stats"
-        pg = "'pickup gems' - pickups all gems from current location"
-        ug = ("'use gem (direction)' - uses proper gem from equipment"
-              + "and removes barrier")
-        la = "'look around' - shows info about current location"
-        mo = "'move (direction)' - moves player to new location"
-        fi = "'fight (enemy)' - player fights with chosen enemy"
-        re = "'rest' - restores player's health"
-        en = "'enemy info (enemy)' - shows info about enemy"
-        save = "'save (path to file)' - saves game to chosen file"
-        exit = "'exit' - closes the game"
-        help = "'help' - shows list of commends"
-
-        comms = f"""
-        \tList of commands:
-        \t{se}
-        \t{ss}
-        \t{pg}
-        \t{ug}
-        \t{la}
-        \t{mo}
-        \t{fi}
-        \t{re}
-        \t{en}
-        \t{save}
-        \t{exit}
-        \t{help}
-        """
-        return comms
+        Returns commands used in game, described in COMMANDS.
+        """
+        lines = COMMANDS.describe() + ["'exit' - closes the game"]
+        return ('\n        \tList of commands:\n'
+                + ''.join(f'        \t{line}\n' for line in lines)
+                + '        ')
 
     def info(self):
         """
@@ -685,10 +1224,100 @@ class Player:
         health = f'\t\tMy current health is {self._health}.'
         return f'\n{name}\n{power}\n{health}\n'
 
+    def fork(self):
+        """
+        Returns new player with the same stats and equipment, playing on
+        OverlayWorld of this player's map. Frozen map, e.g. read with
+        FileHandler.read_template, is shared by all forks, any other map
+        is copied and stays unchanged.
+        """
+        return Player(self._name, self._current_location,
+                      OverlayWorld(self._locations), self._power,
+                      self._health, list(self._equipment))
+
     def __str__(self):
         return self.info()
 
 
+def _fight_command(player, name_of_enemy, log='full'):
+    fight = player.fight(name_of_enemy.title(), log=log)
+    if fight is None:
+        return 'Invalid action.'
+    return fight
+
+
+def _enemy_info_command(player, name):
+    # name can be followed by number of enemy, e.g. 'orc 2'
+    words = name.split()
+    if len(words) > 2 or (len(words) == 2 and not words[1].isdigit()):
+        return 'Invalid action.'
+    return player.enemy_info(name.title())
+
+
+def _profile_command(name):
+    if name == 'off':
+        perf.STATS.profile(None)
+        return '\n\t\tProfiling stopped.\n'
+    if name == 'report':
+        return perf.STATS.profile_report() or '\n\t\tNothing profiled yet.\n'
+    words, _, every = name.rpartition(' every ')
+    if not every.isdigit() or not words:
+        words, every = name, '1'
+    if words not in {command.name for command in COMMANDS.commands()}:
+        return 'Invalid action.'
+    perf.STATS.profile(words, int(every) or 1)
+    return f'\n\t\tProfiling {words!r} every {int(every) or 1} call(s).\n'
+
+
+COMMANDS = CommandRegistry()
+COMMANDS.register('show equipment', Player.show_equipment,
+                  description="shows player's current equipment")
+COMMANDS.register('show stats', Player.info,
+                  description="shows player's current stats")
+COMMANDS.register('pickup gems', Player.pickup_gems,
+                  description='pickups all gems from current location')
+COMMANDS.register('use gem', Player.use_gem, args=1,
+                  arg_names=('direction',),
+                  description=('uses proper gem from equipment'
+                               ' and removes barrier'))
+COMMANDS.register('look around', Player.look_around,
+                  description='shows info about current location')
+COMMANDS.register('move', Player.move, args=1, arg_names=('direction',),
+                  description='moves player to new location')
+COMMANDS.register('travel to', Player.travel, rest=True,
+                  arg_names=('location or x,y',),
+                  description='moves player by the shortest way')
+COMMANDS.register('fight', _fight_command, rest=True, arg_names=('enemy',),
+                  description='player fights with chosen enemy')
+COMMANDS.register('quick fight', lambda player, name:
+                  _fight_command(player, name, 'summary'), rest=True,
+                  arg_names=('enemy',),
+                  description='fights with chosen enemy, shows only result')
+COMMANDS.register('predict fight', lambda player, name:
+                  player.predict_fight(name.title()), rest=True,
+                  arg_names=('enemy',),
+                  description='predicts result of fight with chosen enemy')
+COMMANDS.register('rest', Player.rest,
+                  description="restores player's health")
+COMMANDS.register('enemy info', _enemy_info_command, rest=True,
+                  arg_names=('enemy',),
+                  description='shows info about enemy')
+COMMANDS.register('save', Player.save, args=1,
+                  arg_names=('path to file',),
+                  description='saves game to chosen file')
+COMMANDS.register('stats perf', lambda player: perf.STATS.describe(),
+                  description='shows latency of commands and operations')
+COMMANDS.register('stats perf json', lambda player: perf.STATS.to_json(),
+                  description='shows latency measurements as json')
+COMMANDS.register('stats perf profile', lambda player, name:
+                  _profile_command(name), rest=True,
+                  arg_names=('command',),
+                  description=('profiles chosen command,'
+                               " 'off' stops and 'report' shows profile"))
+COMMANDS.register('help', Player.help,
+                  description='shows list of commands')
+
+
 class Enemy:
     """
     Class Enemy. Contains attributes:
@@ -698,6 +1327,8 @@ class Enemy:
     :param health: enemy's health points
     :type health: int
     """
+    __slots__ = ('_name', '_health', '_power')
+
     def __init__(self, name, health, power):
         """
         Creates instance of Enemy.
@@ -767,6 +1398,8 @@ class Enemy:
 
 
 class Gem:
+    __slots__ = ('_name', '_color')
+
     def __init__(self, name, color):
         if not name:
             raise NameError('Name cannot be empty')
@@ -782,22 +1415,149 @@ class Gem:
         return self._color
 
 
+class Inventory:
+    """
+    Class Inventory. Player's gems in the order they were picked up,
+    with index of gems by color, so that gem of given color is found
+    and taken in constant time. Behaves like list of gems.
+    :param gems: initial gems
+    :type gems: list
+    """
+    __slots__ = ('_gems', '_by_color', '_next')
+
+    def __init__(self, gems=()):
+        # gems are kept under increasing numbers in insertion ordered
+        # dict, so that any of them can be removed in constant time
+        self._gems = {}
+        self._by_color = {}
+        self._next = 0
+        self.extend(gems)
+
+    def __len__(self):
+        return len(self._gems)
+
+    def __iter__(self):
+        return iter(self._gems.values())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += len(self._gems)
+        if not 0 <= index < len(self._gems):
+            raise IndexError('Inventory index out of range')
+        return next(islice(self._gems.values(), index, None))
+
+    def append(self, gem):
+        """
+        Adds gem to inventory.
+        """
+        key = self._next
+        self._next += 1
+        self._gems[key] = gem
+        keys = self._by_color.get(gem._color)
+        if keys is None:
+            self._by_color[gem._color] = [key]
+        else:
+            keys.append(key)
+
+    def extend(self, gems):
+        """
+        Adds all given gems to inventory.
+        """
+        for gem in gems:
+            self.append(gem)
+
+    def _forget(self, color, keys, position):
+        del self._gems[keys.pop(position)]
+        if not keys:
+            del self._by_color[color]
+
+    def remove(self, gem):
+        """
+        Removes given gem from inventory.
+        Raises ValueError if there is no such gem.
+        """
+        keys = self._by_color.get(gem._color, ())
+        for position, key in enumerate(keys):
+            if self._gems[key] == gem:
+                self._forget(gem._color, keys, position)
+                return
+        raise ValueError('Gem is not in inventory')
+
+    def has(self, color):
+        """
+        Returns True if there is gem of given color.
+        """
+        return color in self._by_color
+
+    def take(self, color):
+        """
+        Removes and returns the last gem of given color.
+        Returns None if there is no such gem.
+        """
+        keys = self._by_color.get(color)
+        if keys is None:
+            return None
+        gem = self._gems[keys[-1]]
+        self._forget(color, keys, -1)
+        return gem
+
+    def take_from(self, location):
+        """
+        Moves all gems from location to inventory.
+        Returns number of gems taken.
+        """
+        gems = location._items
+        for gem in gems:
+            self.append(gem)
+        location.clear_items()
+        return len(gems)
+
+    def color_count(self, color):
+        """
+        Returns number of gems of given color.
+        """
+        return len(self._by_color.get(color, ()))
+
+    def color_counts(self):
+        """
+        Returns dict with number of gems of every color.
+        """
+        return {color: len(gems) for color, gems in self._by_color.items()}
+
+
 class Location:
+    """
+    Class Location. Locations without enemies or gems share one empty
+    tuple instead of keeping their own empty lists.
+    Enemies are kept in insertion order together with index of enemies
+    by name, so that enemy is found and removed in constant time.
+    Version grows every time barrier, enemies or gems change.
+    """
+    __slots__ = ('_name', '_barrier', '_barrier_color', '_enemies',
+                 '_enemy_names', '_description', '_items', '_x', '_y',
+                 '_version')
+
     def __init__(self,
                  name,
                  description=None,
                  barrier=None,
                  barrier_color=None,
-                 enemies=[],
+                 enemies=(),
                  items=None,
                  x=None,
                  y=None):
         self._name = name
         self._barrier = barrier
         self._barrier_color = barrier_color
-        self._enemies = enemies
+        self._version = 0
+        self._enemies = ()
+        self._enemy_names = ()
+        for enemy in enemies:
+            self.add_enemy(enemy)
         self._description = description
-        self._items = items
+        self._items = items if items else ()
         self._x = x
         self._y = y
 
@@ -809,12 +1569,94 @@ class Location:
 
     def set_barrier(self, y_n):
         self._barrier = y_n
+        self._version += 1
 
     def barrier_color(self):
         return self._barrier_color
 
     def enemies(self):
-        return self._enemies
+        return list(self._enemies)
+
+    def add_enemy(self, enemy):
+        """
+        Adds enemy to location.
+        Raises ValueError if this enemy is already there.
+        """
+        if enemy in self._enemies:
+            raise ValueError('Enemy is already in location')
+        if not self._enemies:
+            self._enemies = {}
+            self._enemy_names = {}
+        self._version += 1
+        self._enemies[enemy] = None
+        same_name = self._enemy_names.get(enemy._name)
+        if same_name is None:
+            self._enemy_names[enemy._name] = {enemy: None}
+        else:
+            same_name[enemy] = None
+
+    def remove_enemy(self, enemy):
+        """
+        Removes enemy from location.
+        Raises ValueError if enemy is not there.
+        """
+        if enemy not in self._enemies:
+            raise ValueError('Enemy is not in location')
+        self._version += 1
+        del self._enemies[enemy]
+        same_name = self._enemy_names[enemy._name]
+        del same_name[enemy]
+        if not same_name:
+            del self._enemy_names[enemy._name]
+        if not self._enemies:
+            self._enemies = ()
+            self._enemy_names = ()
+
+    def find_enemy(self, name):
+        """
+        Returns enemy with given name or None.
+        Name can end with number to choose one of enemies with the same
+        name, e.g. 'Orc 2' is the second Orc.
+        """
+        same_name = self._enemy_names.get(name) if self._enemies else None
+        if same_name:
+            return next(iter(same_name))
+        base, _, number = name.rpartition(' ')
+        if not (base and number.isdigit() and self._enemies):
+            return None
+        same_name = self._enemy_names.get(base)
+        number = int(number)
+        if not same_name or not 1 <= number <= len(same_name):
+            return None
+        return next(islice(same_name, number - 1, None))
+
+    def enemy_count(self, name=None):
+        """
+        Returns number of enemies, or of enemies with given name.
+        """
+        if name is None:
+            return len(self._enemies)
+        if not self._enemies:
+            return 0
+        return len(self._enemy_names.get(name, ()))
+
+    def has_enemy(self, enemy):
+        return enemy in self._enemies
+
+    def enemy_at(self, index):
+        """
+        Returns enemy with given position in location's list of enemies.
+        """
+        return next(islice(self._enemies, index, None))
+
+    def enemy_index(self, enemy):
+        """
+        Returns position of enemy in location's list of enemies.
+        """
+        for index, other in enumerate(self._enemies):
+            if other is enemy:
+                return index
+        raise ValueError('Enemy is not in location')
 
     def items(self):
         return self._items
@@ -826,18 +1668,638 @@ class Location:
         return self._y
 
     def clear_items(self):
-        self._items = []
+        self._items = ()
+        self._version += 1
 
     def description(self):
         return self._description
 
     def remove_barrier(self):
         self._barrier = False
+        self._version += 1
+
+    def version(self):
+        """
+        Returns number of changes of barrier, enemies and gems.
+        """
+        return self._version
 
     def __str__(self):
         return f'{self._description}'
 
 
+class VoidLocation(Location):
+    """
+    Location used for cells of the map where there is no location.
+    It cannot be entered and its barrier cannot be removed.
+    """
+    __slots__ = ()
+
+    def __init__(self):
+        super().__init__('Sea', '', 1, None, [], [])
+
+    def set_barrier(self, y_n):
+        pass
+
+    def clear_items(self):
+        pass
+
+    def remove_barrier(self):
+        pass
+
+
+VOID = VoidLocation()
+
+
+class WorldRow:
+    """
+    Row of the World. Allows map[x][y] access to World's locations.
+    """
+    def __init__(self, world, x):
+        self._world = world
+        self._x = x
+
+    def __getitem__(self, y):
+        return self._world.get(self._x, y)
+
+    def __setitem__(self, y, location):
+        self._world.put(self._x, y, location)
+
+    def __len__(self):
+        return len(self._world)
+
+    def __iter__(self):
+        for y in range(len(self._world)):
+            yield self._world.get(self._x, y)
+
+
+LOOK_CACHE_SIZE = 4096
+_NO_LOCK = nullcontext()
+
+
+class World:
+    """
+    Class World. Square map of locations divided into chunks.
+    Chunks are created only where there are locations, every other cell
+    of the map is the shared VOID location.
+    :param size: length of map's side
+    :type size: int
+    :param chunk_size: length of chunk's side, has to be power of 2
+    :type chunk_size: int
+    """
+    def __init__(self, size, chunk_size=64):
+        if chunk_size <= 0 or chunk_size & (chunk_size - 1):
+            raise ValueError('Chunk size has to be power of 2')
+        self._size = size
+        self._chunk_size = chunk_size
+        self._shift = chunk_size.bit_length() - 1
+        self._mask = chunk_size - 1
+        self._chunks = {}
+        self._paths = None
+        self._connectivity = None
+        self._looks = OrderedDict()
+        self._frozen = False
+        self._enemy_total = None
+        self._registry = None
+        self._occupants = {}
+        self._lock = _NO_LOCK
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Creates World from list of rows of locations.
+        """
+        world = cls(len(rows))
+        for x, row in enumerate(rows):
+            for y, location in enumerate(row):
+                if isinstance(location, Location):
+                    world.put(x, y, location)
+        return world
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, x):
+        return WorldRow(self, x)
+
+    def __iter__(self):
+        for x in range(self._size):
+            yield WorldRow(self, x)
+
+    def get(self, x, y):
+        """
+        Returns location at given coordinates.
+        Returns VOID if there is no location there or if coordinates
+        are outside of the map.
+        """
+        if not (0 <= x < self._size and 0 <= y < self._size):
+            return VOID
+        chunk = self._chunks.get((x >> self._shift, y >> self._shift))
+        if chunk is None:
+            return VOID
+        location = chunk[((x & self._mask) << self._shift) | (y & self._mask)]
+        if location is None:
+            return VOID
+        return location
+
+    def put(self, x, y, location):
+        """
+        Puts location at given coordinates.
+        """
+        if not (0 <= x < self._size and 0 <= y < self._size):
+            raise IndexError('Coordinates outside of the map')
+        if self._frozen:
+            raise FrozenWorldError('World is frozen')
+        self._paths = None
+        self._connectivity = None
+        if self._looks:
+            self._looks.clear()
+        self._store(x, y, location)
+
+    def _store(self, x, y, location):
+        key = x >> self._shift, y >> self._shift
+        chunk = self._chunks.get(key)
+        if chunk is None:
+            chunk = [None] * (self._chunk_size * self._chunk_size)
+            self._chunks[key] = chunk
+        chunk[((x & self._mask) << self._shift) | (y & self._mask)] = location
+
+    def writable(self, x, y):
+        """
+        Returns location at given coordinates which can be changed.
+        Raises FrozenWorldError if world is frozen.
+        """
+        if self._frozen:
+            raise FrozenWorldError('World is frozen')
+        return self.get(x, y)
+
+    def use_lock(self, lock):
+        """
+        Guards state shared by the whole map with given lock: caches,
+        enemy registry and copying of locations. Changes of single
+        locations have to be guarded by the caller, see locking.
+        """
+        self._lock = lock
+
+    def lock(self):
+        """
+        Returns lock guarding state shared by the whole map.
+        Without use_lock it does nothing.
+        """
+        return self._lock
+
+    def enemy_registry(self):
+        """
+        Returns registry of living enemies, shared by all players
+        on this map.
+        """
+        with self._lock:
+            if self._registry is None:
+                self._registry = EnemyRegistry(self)
+            return self._registry
+
+    def add_player(self, player, x, y):
+        """
+        Puts player into occupancy index at given coordinates.
+        """
+        cell = self._occupants.get((x, y))
+        if cell is None:
+            self._occupants[x, y] = {player: None}
+        else:
+            cell[player] = None
+
+    def remove_player(self, player, x, y):
+        """
+        Removes player from occupancy index at given coordinates.
+        """
+        cell = self._occupants.get((x, y))
+        if cell is None or player not in cell:
+            return
+        del cell[player]
+        if not cell:
+            del self._occupants[x, y]
+
+    def move_player(self, player, old, new):
+        """
+        Moves player in occupancy index from old to new x, y.
+        """
+        if old is not None:
+            self.remove_player(player, old[0], old[1])
+        self.add_player(player, new[0], new[1])
+
+    def players_at(self, x, y):
+        """
+        Returns list of players at given coordinates.
+        """
+        cell = self._occupants.get((x, y))
+        return list(cell) if cell else []
+
+    def player_count(self, x, y):
+        """
+        Returns number of players at given coordinates.
+        """
+        return len(self._occupants.get((x, y), ()))
+
+    def freeze(self):
+        """
+        Forbids changes of locations, so that world can be shared
+        as template of OverlayWorlds.
+        """
+        if not self._frozen:
+            self._enemy_total = sum(len(location._enemies)
+                                    for _, _, location in self.cells())
+            self._frozen = True
+
+    def is_frozen(self):
+        return self._frozen
+
+    def snapshot(self):
+        """
+        Returns frozen world which can be template of OverlayWorlds:
+        this world if it is frozen, otherwise its frozen copy, so that
+        this world can still be changed.
+        """
+        if self._frozen:
+            return self
+        copy = World(self._size, self._chunk_size)
+        for x, y, location in self.cells():
+            copy._store(x, y, _copy_location(location))
+        copy.freeze()
+        return copy
+
+    def enemy_count(self):
+        """
+        Returns number of enemies on the map if it is known without
+        scanning the map, otherwise None.
+        """
+        return self._enemy_total
+
+    def _look_versions(self, x, y):
+        get = self.get
+        return (get(x, y)._version, get(x, y + 1)._version,
+                get(x, y - 1)._version, get(x - 1, y)._version,
+                get(x + 1, y)._version)
+
+    def cached_look(self, x, y):
+        """
+        Returns description of surroundings of x, y remembered by
+        remember_look, or None if any of five locations changed since.
+        """
+        with self._lock:
+            entry = self._looks.get((x, y))
+            if entry is None or entry[0] != self._look_versions(x, y):
+                return None
+            self._looks.move_to_end((x, y))
+            return entry[1]
+
+    def forget_looks(self, x, y):
+        """
+        Forgets descriptions which include location at x, y. Used when
+        location is replaced by another object, whose version starts
+        again from 0.
+        """
+        with self._lock:
+            if self._looks:
+                for cell in ((x, y), (x, y + 1), (x, y - 1), (x - 1, y),
+                             (x + 1, y)):
+                    self._looks.pop(cell, None)
+
+    def remember_look(self, x, y, description):
+        """
+        Remembers description of surroundings of x, y.
+        Only LOOK_CACHE_SIZE most recently used descriptions are kept.
+        """
+        with self._lock:
+            self._looks[x, y] = self._look_versions(x, y), description
+            self._looks.move_to_end((x, y))
+            if len(self._looks) > LOOK_CACHE_SIZE:
+                self._looks.popitem(last=False)
+
+    def paths(self):
+        """
+        Returns PathFinder for this map.
+        """
+        with self._lock:
+            if self._paths is None:
+                self._paths = pathfinding.PathFinder(self)
+            return self._paths
+
+    def remove_barrier(self, x, y):
+        """
+        Removes barrier of location at given coordinates.
+        Returns False if there was no barrier.
+        """
+        location = self.get(x, y)
+        if location is VOID or not location._barrier:
+            return False
+        self.writable(x, y).remove_barrier()
+        with self._lock:
+            if self._paths is not None:
+                self._paths.opened(x, y)
+            if self._connectivity is not None:
+                self._connectivity.opened(x, y)
+        return True
+
+    def set_barrier(self, x, y, barrier):
+        """
+        Sets or removes barrier of location at given coordinates.
+        """
+        if not barrier:
+            self.remove_barrier(x, y)
+            return
+        if self.get(x, y) is VOID:
+            return
+        self.writable(x, y).set_barrier(barrier)
+        with self._lock:
+            if self._paths is not None:
+                self._paths.closed(x, y)
+            self._connectivity = None
+
+    def take_gems(self, x, y, inventory):
+        """
+        Moves all gems from location at given coordinates to inventory.
+        Returns number of gems taken.
+        """
+        location = self.get(x, y)
+        if not location._items:
+            return 0
+        location = self.writable(x, y)
+        colors = [gem._color for gem in location._items]
+        taken = inventory.take_from(location)
+        with self._lock:
+            if self._connectivity is not None and taken:
+                self._connectivity.gems_taken(x, y, colors)
+        return taken
+
+    def connectivity(self):
+        """
+        Returns ConnectivityIndex for this map.
+        """
+        with self._lock:
+            if self._connectivity is None:
+                self._connectivity = connectivity.ConnectivityIndex(self)
+            return self._connectivity
+
+    def cells(self):
+        """
+        Yields x, y and location for every location on the map,
+        row by row. VOID cells are skipped.
+        """
+        columns = {}
+        for chunk_x, chunk_y in self._chunks:
+            columns.setdefault(chunk_x, []).append(chunk_y)
+        size = self._chunk_size
+        for chunk_x in sorted(columns):
+            chunks = [(chunk_y, self._chunks[chunk_x, chunk_y])
+                      for chunk_y in sorted(columns[chunk_x])]
+            for row in range(size):
+                x = (chunk_x << self._shift) | row
+                for chunk_y, chunk in chunks:
+                    start = row << self._shift
+                    first_y = chunk_y << self._shift
+                    for column in range(size):
+                        location = chunk[start + column]
+                        if location is not None:
+                            yield x, first_y | column, location
+
+    def chunk_count(self):
+        """
+        Returns number of allocated chunks.
+        """
+        return len(self._chunks)
+
+    def is_lazy(self):
+        """
+        Returns True if locations are read only when they are used.
+        """
+        return False
+
+    def saved(self, path):
+        """
+        Called after game was saved to given path.
+        """
+        pass
+
+
+def _location_state(location):
+    return (location._barrier, len(location._items or ()),
+            [enemy._health for enemy in location._enemies])
+
+
+class PagedWorld(World):
+    """
+    Class PagedWorld. Map of locations read from memory-mapped binary
+    save. Location is created when its cell is used for the first time.
+    Locations that did not change are forgotten when there are more than
+    cache_size of them, changed locations are kept until game is saved.
+    :param path: path to binary save
+    :type path: str
+    :param cache_size: number of unchanged locations kept in memory
+    :type cache_size: int
+    """
+    def __init__(self, path, cache_size=4096):
+        if cache_size < 16:
+            raise ValueError('Cache size has to be at least 16')
+        self._path = path
+        self._save = binary_save.BinarySave(path)
+        super().__init__(self._save.map_size())
+        self._cache_size = cache_size
+        self._cache = OrderedDict()
+
+    def close(self):
+        self._save.close()
+
+    def is_lazy(self):
+        return True
+
+    def enemy_count(self):
+        """
+        Returns number of enemies in the save file.
+        """
+        return self._save._enemy_count
+
+    def cached_count(self):
+        """
+        Returns number of locations kept in memory.
+        """
+        return len(self._cache) + sum(1 for _ in super().cells())
+
+    def get(self, x, y):
+        if self._chunks:
+            location = super().get(x, y)
+            if location is not VOID:
+                return location
+        key = x, y
+        entry = self._cache.get(key)
+        if entry is not None:
+            self._cache.move_to_end(key)
+            return entry[0]
+        if not (0 <= x < self._size and 0 <= y < self._size):
+            return VOID
+        index = self._save.location_index(x, y)
+        if index is None:
+            return VOID
+        location = FileHandler()._read_location(self._save.location_at(index))
+        self._cache[key] = location, _location_state(location)
+        while len(self._cache) > self._cache_size:
+            (old_x, old_y), (old, state) = self._cache.popitem(last=False)
+            if _location_state(old) != state:
+                self._store(old_x, old_y, old)
+            else:
+                # location will be read again from file
+                self.forget_looks(old_x, old_y)
+        return location
+
+    def put(self, x, y, location):
+        self._cache.pop((x, y), None)
+        super().put(x, y, location)
+
+    def cells(self):
+        """
+        Yields x, y and location for every location on the map, row by
+        row. Locations which are not in memory are read from file but
+        not kept.
+        """
+        pinned = super().cells()
+        pin = next(pinned, None)
+        for index in range(self._save.location_count()):
+            key = self._save._location_key(index)
+            while pin is not None and (pin[0], pin[1]) <= key:
+                yield pin
+                last = pin[0], pin[1]
+                pin = next(pinned, None)
+                if last == key:
+                    break
+            else:
+                entry = self._cache.get(key)
+                if entry is not None:
+                    yield key[0], key[1], entry[0]
+                else:
+                    data = self._save.location_at(index)
+                    yield key[0], key[1], FileHandler()._read_location(data)
+        while pin is not None:
+            yield pin
+            pin = next(pinned, None)
+
+    def saved(self, path):
+        """
+        Maps file again if game was saved to this world's file.
+        Changed locations are now in the file, so they can be forgotten.
+        """
+        if os.path.abspath(path) != os.path.abspath(self._path):
+            return
+        self._save.close()
+        self._save = binary_save.BinarySave(self._path)
+        for x, y, location in list(super().cells()):
+            self._cache[x, y] = location, None
+        self._chunks = {}
+        for key, (location, _) in self._cache.items():
+            self._cache[key] = location, _location_state(location)
+
+
+def _copy_location(location):
+    copy = Location(location._name, location._description,
+                    location._barrier, location._barrier_color,
+                    [Enemy(enemy._name, enemy._health, enemy._power)
+                     for enemy in location._enemies],
+                    list(location._items), location._x, location._y)
+    copy._version = location._version
+    return copy
+
+
+class OverlayWorld(World):
+    """
+    Class OverlayWorld. Map of one game started from shared, frozen
+    template. Locations are read from the template until they are
+    changed, then they are copied and kept by this world, so memory
+    grows only with number of changed locations.
+    :param template: world every game starts from, if it is not frozen
+        its frozen copy is used
+    :type template: World
+    """
+    def __init__(self, template):
+        template = template.snapshot()
+        super().__init__(len(template), template._chunk_size)
+        self._template = template
+        self._changed = 0
+
+    def template(self):
+        return self._template
+
+    def changed_count(self):
+        """
+        Returns number of locations copied from the template.
+        """
+        return self._changed
+
+    def enemy_count(self):
+        count = self._template.enemy_count()
+        for x, y, location in super().cells():
+            count += (len(location._enemies)
+                      - len(self._template.get(x, y)._enemies))
+        return count
+
+    def get(self, x, y):
+        if self._chunks:
+            location = super().get(x, y)
+            if location is not VOID:
+                return location
+        return self._template.get(x, y)
+
+    def writable(self, x, y):
+        """
+        Returns location at given coordinates, copied from the template
+        if it was not changed yet.
+        """
+        if self._chunks:
+            location = super().get(x, y)
+            if location is not VOID:
+                return location
+        location = self._template.get(x, y)
+        if location is VOID:
+            return VOID
+        location = _copy_location(location)
+        with self._lock:
+            # copy looks the same, so caches of this world stay valid
+            self._store(x, y, location)
+            self._changed += 1
+        return location
+
+    def restore(self, x, y, location):
+        """
+        Puts location of loaded game in place of template's one.
+        Raises ValueError if template has no location there.
+        """
+        if self._template.get(x, y) is VOID:
+            raise ValueError('Location is not in template')
+        if not self._chunks or super().get(x, y) is VOID:
+            self._changed += 1
+        self.put(x, y, location)
+
+    def overlay_cells(self):
+        """
+        Yields x, y and location for every location which differs from
+        the template, row by row.
+        """
+        return super().cells()
+
+    def cells(self):
+        changed = super().cells()
+        change = next(changed, None)
+        for x, y, location in self._template.cells():
+            while change is not None and (change[0], change[1]) < (x, y):
+                yield change
+                change = next(changed, None)
+            if change is not None and (change[0], change[1]) == (x, y):
+                yield change
+                change = next(changed, None)
+            else:
+                yield x, y, location
+        while change is not None:
+            yield change
+            change = next(changed, None)
+
+
 class Game:
     def init_player(self):
         self.player = None
@@ -864,6 +2326,17 @@ class Game:
                 continue
             return self.player
 
+    def outcome(self):
+        """
+        Returns 'won' if there are no enemies left, 'lost' if player
+        has no health left and None if game goes on.
+        """
+        if self.player.did_win():
+            return 'won'
+        if self.player._health == 0:
+            return 'lost'
+        return None
+
     def play(self):
         print('\n\t\tStarting game')
         print(self.player.help())
@@ -872,9 +2345,10 @@ class Game:
             if user_input == ('exit'):
                 break
             print(self.player.action(user_input))
-            if self.player.did_win():
+            outcome = self.outcome()
+            if outcome == 'won':
                 print('\t\tYou won\n')
                 break
-            if self.player._health == 0:
+            if outcome == 'lost':
                 print('\t\tYou lost\n')
                 break
@@ -0,0 +1,147 @@
+class CommandError(Exception):
+    """
+    Raised when input does not match any command or has wrong arguments.
+    :param reason: 'empty', 'unknown' or 'arguments'
+    :type reason: str
+    :param usage: usage of matched command, None if no command matched
+    :type usage: str
+    """
+    def __init__(self, reason, message, usage=None):
+        super().__init__(message)
+        self.reason = reason
+        self.usage = usage
+
+
+class Command:
+    """
+    Class Command. Contains attributes:
+    :param words: keywords which start the command, e.g. ('use', 'gem')
+    :type words: tuple
+    :param handler: function called with player and arguments
+    :type handler: function
+    :param args: number of one-word arguments
+    :type args: int
+    :param rest: True if all remaining words make one argument
+    :type rest: bool
+    :param name: keywords joined with spaces, e.g. 'use gem'
+    :type name: str
+    :param arg_names: names of arguments shown in usage, e.g.
+        ('direction',), with rest the last name is for remaining words
+    :type arg_names: tuple
+    :param description: what command does, shown in help
+    :type description: str
+    """
+    __slots__ = ('words', 'handler', 'args', 'rest', 'name', 'arg_names',
+                 'description')
+
+    def __init__(self, words, handler, args=0, rest=False, arg_names=(),
+                 description=''):
+        self.words = words
+        self.name = ' '.join(words)
+        self.handler = handler
+        self.args = args
+        self.rest = rest
+        self.arg_names = tuple(arg_names)
+        self.description = description
+
+    def usage(self):
+        """
+        Returns command with its arguments, e.g. 'use gem (direction)',
+        or 'use gem (1)' if arguments have no names.
+        """
+        if self.arg_names:
+            names = self.arg_names
+        else:
+            names = [str(index + 1) for index in range(self.args)]
+            if self.rest:
+                names.append('...')
+        return ' '.join(self.words + tuple(f'({name})' for name in names))
+
+    def run(self, player, args):
+        return self.handler(player, *args)
+
+
+class CommandRegistry:
+    """
+    Class CommandRegistry. Dispatches user's input to registered commands.
+    Keywords are kept in a trie of dicts, so input is matched word
+    by word with one dict lookup per keyword.
+    """
+    def __init__(self):
+        self._root = {}
+        self._commands = []
+
+    def register(self, words, handler, args=0, rest=False, arg_names=(),
+                 description=''):
+        """
+        Registers command started by given keywords.
+        Handler is called with player and arguments of the command.
+        Returns registered Command.
+        """
+        words = tuple(words.split()) if isinstance(words, str) else words
+        if not words:
+            raise ValueError('Command needs at least one keyword')
+        node = self._root
+        for word in words:
+            node = node.setdefault(word, {})
+        if None in node:
+            raise ValueError(f"Command '{' '.join(words)}' already exists")
+        command = Command(words, handler, args, rest, arg_names,
+                          description)
+        node[None] = command
+        self._commands.append(command)
+        return command
+
+    def commands(self):
+        """
+        Returns list of registered commands.
+        """
+        return list(self._commands)
+
+    def describe(self):
+        """
+        Returns list of lines with usage and description of every
+        command, in order of registration.
+        """
+        return [f"'{command.usage()}' - {command.description}"
+                for command in self._commands]
+
+    def parse(self, line):
+        """
+        Returns matched command and tuple of its arguments.
+        Input is case insensitive. Raises CommandError if input
+        does not match any command.
+        """
+        words = line.lower().split()
+        if not words:
+            raise CommandError('empty', 'Empty command')
+        node = self._root
+        command = None
+        used = 0
+        for index, word in enumerate(words):
+            node = node.get(word)
+            if node is None:
+                break
+            found = node.get(None)
+            if found is not None:
+                command = found
+                used = index + 1
+        if command is None:
+            raise CommandError('unknown', f"Unknown command '{words[0]}'")
+        args = words[used:]
+        if command.rest:
+            if len(args) <= command.args:
+                raise CommandError('arguments', 'Missing arguments',
+                                   command.usage())
+            args[command.args:] = [' '.join(args[command.args:])]
+        elif len(args) != command.args:
+            raise CommandError('arguments', 'Wrong number of arguments',
+                               command.usage())
+        return command, args
+
+    def dispatch(self, player, line):
+        """
+        Runs command matching the input and returns its result.
+        """
+        command, args = self.parse(line)
+        return command.run(player, args)
@@ -0,0 +1,304 @@
+from array import array
+from collections import Counter
+from pathfinding import BLOCK_BITS, BLOCK_MASK, BLOCK_SIZE
+
+CLOSED = 0
+OPEN = 1
+BARRIER = 2
+
+
+class BlockArray:
+    """
+    Class BlockArray. Array indexed by flat index of cell, kept in
+    blocks of BLOCK_SIZE consecutive cells. Only blocks which were
+    written to get memory, other cells have default value.
+    :param typecode: typecode of array, 'q' for flat indices
+    :type typecode: str
+    :param default: value of cells which were not written
+    :type default: int
+    """
+    __slots__ = ('_blocks', '_empty', '_default')
+
+    def __init__(self, typecode, default=0):
+        self._blocks = {}
+        self._empty = array(typecode, [default]) * BLOCK_SIZE
+        self._default = default
+
+    def __getitem__(self, index):
+        block = self._blocks.get(index >> BLOCK_BITS)
+        if block is None:
+            return self._default
+        return block[index & BLOCK_MASK]
+
+    def __setitem__(self, index, value):
+        block = self._blocks.get(index >> BLOCK_BITS)
+        if block is None:
+            block = self._blocks[index >> BLOCK_BITS] = self._empty[:]
+        block[index & BLOCK_MASK] = value
+
+    def block_count(self):
+        return len(self._blocks)
+
+
+class ConnectivityIndex:
+    """
+    Class ConnectivityIndex. Joins locations without barriers into
+    regions with union-find. For every region it keeps barriers next to
+    it, counted by color, and gems lying in it, so that questions about
+    regions do not need flood fill. Removing barrier joins regions next
+    to it.
+    :param world: map of locations
+    :type world: World
+    """
+    def __init__(self, world):
+        size = len(world)
+        self._size = size
+        self._cells = size * size
+        self._world = world
+        # union-find state is kept only in blocks with locations, parent
+        # of every open cell is set when it opens
+        self._state = BlockArray('B', CLOSED)
+        self._parent = BlockArray('q')
+        self._weight = BlockArray('q', 1)
+        self._frontier = {}
+        self._gates = {}
+        self._gems = {}
+        self._closed_gems = {}
+        barriers = []
+        gems = []
+        state = self._state
+        for x, y, location in world.cells():
+            index = x * size + y
+            if location._barrier:
+                state[index] = BARRIER
+                barriers.append((index, location._barrier_color))
+                if location._items:
+                    self._closed_gems[index] = Counter(
+                        gem._color for gem in location._items)
+                continue
+            state[index] = OPEN
+            self._parent[index] = index
+            self._frontier[index] = set()
+            self._gates[index] = Counter()
+            self._gems[index] = Counter()
+            if x and state[index - size] == OPEN:
+                self._union(index, index - size)
+            if y and state[index - 1] == OPEN:
+                self._union(index, index - 1)
+            if location._items:
+                gems.append((index, location._items))
+        for index, items in gems:
+            self._gems[self.find(index)].update(gem._color for gem in items)
+        for index, color in barriers:
+            for neighbour in self._neighbours(index):
+                if state[neighbour] == OPEN:
+                    root = self.find(neighbour)
+                    frontier = self._frontier[root]
+                    if index not in frontier:
+                        frontier.add(index)
+                        self._gates[root][color] += 1
+
+    def _neighbours(self, index):
+        size = self._size
+        if index >= size:
+            yield index - size
+        if index + size < self._cells:
+            yield index + size
+        if index % size:
+            yield index - 1
+        if (index + 1) % size:
+            yield index + 1
+
+    def _color(self, index):
+        return self._world.get(*divmod(index, self._size))._barrier_color
+
+    def find(self, index):
+        """
+        Returns index of cell representing region of given cell.
+        """
+        # blocks are read directly, find runs for every union and query
+        blocks = self._parent._blocks
+        while True:
+            block = blocks[index >> BLOCK_BITS]
+            parent = block[index & BLOCK_MASK]
+            if parent == index:
+                return index
+            grandparent = blocks[parent >> BLOCK_BITS][parent & BLOCK_MASK]
+            block[index & BLOCK_MASK] = grandparent
+            index = grandparent
+
+    def _union(self, first, second):
+        first = self.find(first)
+        second = self.find(second)
+        if first == second:
+            return first
+        if self._weight[first] < self._weight[second]:
+            first, second = second, first
+        self._parent[second] = first
+        self._weight[first] += self._weight[second]
+        frontier = self._frontier.pop(second)
+        gates = self._gates.pop(second)
+        big_frontier = self._frontier[first]
+        big_gates = self._gates[first]
+        if len(frontier) > len(big_frontier):
+            frontier, big_frontier = big_frontier, frontier
+            gates, big_gates = big_gates, gates
+            self._frontier[first] = big_frontier
+            self._gates[first] = big_gates
+        for index in frontier:
+            if index not in big_frontier:
+                big_frontier.add(index)
+                big_gates[self._color(index)] += 1
+        self._gems[first].update(self._gems.pop(second))
+        return first
+
+    def region_count(self):
+        return len(self._frontier)
+
+    def regions(self, x, y):
+        """
+        Returns set of regions player standing at x, y can walk into.
+        Cell with barrier is left through its neighbours.
+        """
+        index = x * self._size + y
+        state = self._state[index]
+        if state == OPEN:
+            return {self.find(index)}
+        if state == CLOSED:
+            return set()
+        return {self.find(neighbour) for neighbour in self._neighbours(index)
+                if self._state[neighbour] == OPEN}
+
+    def reachable(self, start, target):
+        """
+        Returns True if target can be reached from start
+        without removing any barrier.
+        """
+        if start == target:
+            return True
+        index = target[0] * self._size + target[1]
+        if self._state[index] != OPEN:
+            return False
+        return self.find(index) in self.regions(*start)
+
+    def gates(self, x, y):
+        """
+        Returns dict with number of barriers of every color
+        next to region of x, y.
+        """
+        gates = Counter()
+        for root in self.regions(x, y):
+            gates.update(self._gates[root])
+        return dict(gates)
+
+    def gems(self, x, y):
+        """
+        Returns dict with number of gems of every color
+        lying in region of x, y.
+        """
+        gems = Counter()
+        for root in self.regions(x, y):
+            gems.update(self._gems[root])
+        return dict(gems)
+
+    def opened(self, x, y):
+        """
+        Joins regions next to x, y after its barrier was removed.
+        """
+        index = x * self._size + y
+        if self._state[index] != BARRIER:
+            return
+        self._state[index] = OPEN
+        self._parent[index] = index
+        frontier = set()
+        gates = Counter()
+        for neighbour in self._neighbours(index):
+            if self._state[neighbour] == BARRIER:
+                frontier.add(neighbour)
+                gates[self._color(neighbour)] += 1
+        self._frontier[index] = frontier
+        self._gates[index] = gates
+        self._gems[index] = self._closed_gems.pop(index, Counter())
+        root = index
+        for neighbour in self._neighbours(index):
+            if self._state[neighbour] == OPEN:
+                root = self._union(root, neighbour)
+        frontier = self._frontier[root]
+        if index in frontier:
+            frontier.discard(index)
+            gates = self._gates[root]
+            color = self._color(index)
+            gates[color] -= 1
+            if not gates[color]:
+                del gates[color]
+
+    def gems_taken(self, x, y, colors):
+        """
+        Forgets gems of given colors taken from location x, y.
+        """
+        index = x * self._size + y
+        if self._state[index] == OPEN:
+            gems = self._gems[self.find(index)]
+        else:
+            gems = self._closed_gems.get(index, Counter())
+        gems.subtract(colors)
+        for color in [color for color, count in gems.items() if count <= 0]:
+            del gems[color]
+
+    def can_reach_all(self, start, colors, targets):
+        """
+        Returns True if all targets may be reached from start with gems
+        of given colors and gems lying on the way. Check is optimistic:
+        gem of a color is assumed to open every barrier of that color,
+        so False means that targets cannot be reached at all.
+        """
+        size = self._size
+        state = self._state
+        left = set()
+        for x, y in targets:
+            index = x * size + y
+            if state[index] == OPEN:
+                left.add(('region', self.find(index)))
+            else:
+                left.add(('cell', index))
+        start_index = start[0] * size + start[1]
+        left.discard(('cell', start_index))
+        colors = set(colors)
+        waiting = {}
+        opened = {start_index}
+        seen = set()
+        barriers = []
+
+        def add_colors(new_colors):
+            for color in new_colors:
+                if color not in colors:
+                    colors.add(color)
+                    barriers.extend(waiting.pop(color, ()))
+
+        def enter(root):
+            if root not in seen:
+                seen.add(root)
+                left.discard(('region', root))
+                add_colors(self._gems[root])
+                barriers.extend(self._frontier[root])
+
+        add_colors(self._closed_gems.get(start_index, ()))
+        for root in self.regions(*start):
+            enter(root)
+        while barriers and left:
+            index = barriers.pop()
+            if index in opened:
+                continue
+            color = self._color(index)
+            if color not in colors:
+                waiting.setdefault(color, []).append(index)
+                continue
+            opened.add(index)
+            left.discard(('cell', index))
+            add_colors(self._closed_gems.get(index, ()))
+            for neighbour in self._neighbours(index):
+                if state[neighbour] == OPEN:
+                    enter(self.find(neighbour))
+                elif state[neighbour] == BARRIER and neighbour not in opened:
+                    barriers.append(neighbour)
+        return not left
@@ -0,0 +1,196 @@
+"""
+World generator. Writes seeded square worlds in the format of
+FileHandler.save_to_json, one location at a time.
+
+Locations with both coordinates even are rooms. Every room except
+(0, 0) opens the passage to its north or west neighbour room, so rooms
+and opened passages form a maze connecting all of them. Remaining
+locations are barriers with given density. Enemies are placed only in
+rooms and are weak enough to be beaten with full health, so the world
+can always be won without using any gem.
+"""
+import argparse
+import json
+import random
+
+
+COLORS = ('red', 'green', 'blue')
+ENEMY_NAMES = ('Orc', 'Goblin', 'Troll', 'Hydra', 'Wolf')
+
+
+class WorldGenerator:
+    """
+    Class WorldGenerator. Contains attributes:
+    :param size: size of the map
+    :type size: int
+    :param barrier_density: chance that location outside maze has barrier
+    :type barrier_density: float
+    :param enemy_density: chance that room has an enemy
+    :type enemy_density: float
+    :param gem_density: chance that location has a gem
+    :type gem_density: float
+    :param colors: colors of barriers and gems
+    :type colors: tuple
+    :param seed: seed of random, the same seed gives the same world
+    :type seed: int
+    """
+    def __init__(self, size, barrier_density=0.5, enemy_density=0.1,
+                 gem_density=0.1, colors=COLORS, seed=0, player_health=100,
+                 player_power=5, max_enemy_power=10, name='Player'):
+        if size < 1:
+            raise ValueError('Size has to be positive')
+        for density in (barrier_density, enemy_density, gem_density):
+            if not 0 <= density <= 1:
+                raise ValueError('Density has to be between 0 and 1')
+        if not colors:
+            raise ValueError('At least one color is needed')
+        if player_health < 1 or player_power < 1 or max_enemy_power < 1:
+            raise ValueError('Health and power have to be positive')
+        self._size = size
+        self._barrier_density = barrier_density
+        self._enemy_density = enemy_density
+        self._gem_density = gem_density
+        self._colors = tuple(colors)
+        self._seed = seed
+        self._player_health = player_health
+        self._player_power = player_power
+        self._max_enemy_power = max_enemy_power
+        self._name = name
+
+    def size(self):
+        return self._size
+
+    def start(self):
+        """
+        Returns coordinates of room the player starts in.
+        """
+        center = self._size // 2
+        center -= center % 2
+        return center, center
+
+    def player(self):
+        """
+        Returns player as dict, without locations.
+        """
+        x, y = self.start()
+        return {
+            'name': self._name,
+            'current_location': f'{x},{y}',
+            'power': self._player_power,
+            'health': self._player_health,
+            'equipment': []
+        }
+
+    def _carves_north(self, rng, x):
+        """
+        Returns list telling for every room in row x
+        whether it opens passage north (True) or west (False).
+        """
+        rooms = []
+        for y in range(0, self._size, 2):
+            if x == 0:
+                rooms.append(False)
+            elif y == 0:
+                rooms.append(True)
+            else:
+                rooms.append(rng.random() < 0.5)
+        return rooms
+
+    def _enemy(self, rng):
+        power = rng.randint(1, self._max_enemy_power)
+        # enemy attacks at most health - 1 times before it dies
+        max_health = (self._player_health - 1) // power + 1
+        return {
+            'name': rng.choice(ENEMY_NAMES),
+            'health': rng.randint(1, max_health),
+            'power': power
+        }
+
+    def locations(self):
+        """
+        Yields locations as dicts, row by row.
+        Only the maze of the current and the next row is kept in memory.
+        """
+        size = self._size
+        rng = random.Random(f'{self._seed}-locations')
+        maze_rng = random.Random(f'{self._seed}-maze')
+        start = self.start()
+        next_rooms = self._carves_north(maze_rng, 0)
+        for x in range(size):
+            if x % 2 == 0:
+                rooms = next_rooms
+                if x + 2 < size:
+                    next_rooms = self._carves_north(maze_rng, x + 2)
+            for y in range(size):
+                if x % 2 == 0 and y % 2 == 0:
+                    kind = 'Room'
+                    opened = True
+                elif x % 2 == 0:
+                    kind = 'Corridor'
+                    opened = y + 1 < size and not rooms[(y + 1) // 2]
+                elif y % 2 == 0:
+                    kind = 'Corridor'
+                    opened = x + 1 < size and next_rooms[y // 2]
+                else:
+                    kind = 'Wall'
+                    opened = False
+                barrier = not opened and rng.random() < self._barrier_density
+                enemies = []
+                if (kind == 'Room' and (x, y) != start
+                        and rng.random() < self._enemy_density):
+                    enemies.append(self._enemy(rng))
+                gems = []
+                if rng.random() < self._gem_density:
+                    color = rng.choice(self._colors)
+                    gems.append({'name': f'{color} gem', 'color': color})
+                yield {
+                    'x': x,
+                    'y': y,
+                    'name': kind,
+                    'description': ('It is a dangerous area.' if enemies
+                                    else ''),
+                    'barrier': 1 if barrier else 0,
+                    'barrier_color': rng.choice(self._colors),
+                    'enemies': enemies,
+                    'gems': gems
+                }
+
+    def write(self, file_handle):
+        """
+        Writes world as json save to file opened in text mode.
+        """
+        player = json.dumps(self.player())
+        file_handle.write(f'{{"map_size": {self._size}, "player": [')
+        file_handle.write(player[:-1] + ', "locations": [')
+        separator = ''
+        for location in self.locations():
+            file_handle.write(separator)
+            file_handle.write(json.dumps(location))
+            separator = ', '
+        file_handle.write(']}]}')
+
+    def save(self, path):
+        with open(path, 'w') as file_handle:
+            self.write(file_handle)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generates game world')
+    parser.add_argument('path', help='file to write world to')
+    parser.add_argument('--size', type=int, default=10)
+    parser.add_argument('--barrier-density', type=float, default=0.5)
+    parser.add_argument('--enemy-density', type=float, default=0.1)
+    parser.add_argument('--gem-density', type=float, default=0.1)
+    parser.add_argument('--colors', nargs='+', default=list(COLORS))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--health', type=int, default=100)
+    parser.add_argument('--power', type=int, default=5)
+    parser.add_argument('--max-enemy-power', type=int, default=10)
+    args = parser.parse_args()
+    WorldGenerator(args.size, args.barrier_density, args.enemy_density,
+                   args.gem_density, args.colors, args.seed, args.health,
+                   args.power, args.max_enemy_power).save(args.path)
+
+
+if __name__ == '__main__':
+    main()
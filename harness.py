@@ -0,0 +1,218 @@
+"""
+Headless runner. Plays commands from script through Player.action,
+without typing them into input(). Script is a text file with one
+command per line, empty lines and lines starting with '#' are skipped.
+
+Every run seeds random with its seed, so that fights can be repeated.
+Recorded session is a json file with world, seed, commands and
+responses, and replaying it checks that responses are the same.
+"""
+import argparse
+import json
+import random
+import time
+from classes import FileHandler, Game
+
+
+def read_script(path):
+    """
+    Returns list of commands from script file.
+    """
+    with open(path, 'r') as file_handle:
+        lines = [line.strip() for line in file_handle]
+    return [line for line in lines if line and not line.startswith('#')]
+
+
+def _percentile(values, part):
+    index = min(len(values) - 1, int(part * len(values)))
+    return values[index]
+
+
+class RunResult:
+    """
+    Class RunResult. Result of headless run. Contains attributes:
+    :param world: path to world file the run started from
+    :type world: str
+    :param seed: seed of random used in the run
+    :type seed: int
+    :param commands: commands which were run
+    :type commands: list
+    :param responses: responses to commands
+    :type responses: list
+    :param latencies: time of every command in seconds
+    :type latencies: list
+    :param outcome: 'won', 'lost', 'error' or None if game goes on
+    :type outcome: str
+    :param player: player after the run
+    :type player: Player
+    """
+    def __init__(self, world, seed, commands, responses, latencies, outcome,
+                 player):
+        self.world = world
+        self.seed = seed
+        self.commands = commands
+        self.responses = responses
+        self.latencies = latencies
+        self.outcome = outcome
+        self.player = player
+
+    def total_time(self):
+        return sum(self.latencies)
+
+    def throughput(self):
+        """
+        Returns number of commands run per second.
+        """
+        total = self.total_time()
+        return len(self.latencies) / total if total else 0.0
+
+    def latency(self):
+        """
+        Returns dict with mean, median, 95th, 99th percentile
+        and max latency of command in seconds.
+        """
+        if not self.latencies:
+            return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0,
+                    'max': 0.0}
+        values = sorted(self.latencies)
+        return {
+            'mean': self.total_time() / len(values),
+            'p50': _percentile(values, 0.5),
+            'p95': _percentile(values, 0.95),
+            'p99': _percentile(values, 0.99),
+            'max': values[-1]
+        }
+
+    def session(self):
+        """
+        Returns recorded session as dict.
+        """
+        return {
+            'world': self.world,
+            'seed': self.seed,
+            'commands': self.commands,
+            'responses': self.responses
+        }
+
+    def save_session(self, path):
+        with open(path, 'w') as file_handle:
+            json.dump(self.session(), file_handle, indent=4)
+
+    def report(self):
+        """
+        Returns description of the run.
+        """
+        latency = self.latency()
+        x, y = self.player.current_location()
+        lines = [
+            f'World: {self.world}',
+            f'Seed: {self.seed}',
+            f'Commands: {len(self.latencies)}',
+            f'Outcome: {self.outcome or "game goes on"}',
+            f'Position: {x},{y}',
+            f'Health: {self.player.health()}',
+            f'Power: {self.player.power()}',
+            f'Enemies left: {self.player.enemy_registry().count()}',
+            f'Total time: {self.total_time():.6f}s',
+            f'Throughput: {self.throughput():.0f} commands/s',
+            'Latency: ' + ', '.join(f'{key} {1e6 * value:.1f}us'
+                                   for key, value in latency.items())
+        ]
+        return '\n'.join(lines)
+
+
+def run(world, commands, seed=None):
+    """
+    Loads world from file and runs commands until game is won, lost,
+    'exit' command or the end of commands.
+    State of random is restored after the run.
+    Returns RunResult.
+    """
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    game = Game()
+    game.player = FileHandler().read_from_json(world)
+    action = game.player.action
+    responses = []
+    latencies = []
+    outcome = None
+    state = random.getstate()
+    random.seed(seed)
+    try:
+        for command in commands:
+            if command == 'exit':
+                break
+            start = time.perf_counter()
+            try:
+                response = action(command)
+            except Exception as e:
+                response = f'{type(e).__name__}: {e}'
+                outcome = 'error'
+            latencies.append(time.perf_counter() - start)
+            responses.append(response)
+            if outcome is None:
+                outcome = game.outcome()
+            if outcome:
+                break
+    finally:
+        random.setstate(state)
+    return RunResult(world, seed, list(commands[:len(responses)]), responses,
+                     latencies, outcome, game.player)
+
+
+def load_session(path):
+    with open(path, 'r') as file_handle:
+        session = json.load(file_handle)
+    try:
+        return (session['world'], session['seed'], session['commands'],
+                session.get('responses'))
+    except KeyError as e:
+        raise KeyError('Missing key in file') from e
+
+
+def replay(path):
+    """
+    Runs recorded session again with its seed.
+    Returns RunResult and list of indices of commands
+    whose responses differ from recorded ones.
+    """
+    world, seed, commands, responses = load_session(path)
+    result = run(world, commands, seed)
+    if responses is None:
+        return result, []
+    mismatches = [index for index, response in enumerate(result.responses)
+                  if index >= len(responses) or responses[index] != response]
+    mismatches.extend(range(len(result.responses), len(responses)))
+    return result, mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Headless game runner')
+    parser.add_argument('world', nargs='?', help='world file')
+    parser.add_argument('script', nargs='?', help='file with commands')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--record', help='file to record session to')
+    parser.add_argument('--replay', help='recorded session to replay')
+    parser.add_argument('--responses', action='store_true',
+                        help='print responses to commands')
+    args = parser.parse_args()
+    mismatches = []
+    if args.replay:
+        result, mismatches = replay(args.replay)
+    elif args.world and args.script:
+        result = run(args.world, read_script(args.script), args.seed)
+    else:
+        parser.error('give world and script or --replay')
+    if args.responses:
+        for command, response in zip(result.commands, result.responses):
+            print(f'> {command}\n{response}')
+    print(result.report())
+    if args.replay:
+        print(f'Mismatches: {len(mismatches)}')
+    if args.record:
+        result.save_session(args.record)
+    return 1 if mismatches else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
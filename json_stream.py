@@ -0,0 +1,128 @@
+import codecs
+import json
+
+
+class JsonStream:
+    """
+    Class JsonStream. Walks JSON document read from file object piece by
+    piece, so that big arrays can be decoded one item at a time.
+    :param file_handle: file object opened in text or binary mode
+    :type file_handle: file
+    :param chunk_size: number of characters read at once
+    :type chunk_size: int
+    """
+    def __init__(self, file_handle, chunk_size=65536):
+        self._file_handle = file_handle
+        self._chunk_size = chunk_size
+        self._decoder = json.JSONDecoder()
+        self._utf8 = codecs.getincrementaldecoder('utf-8')()
+        self._buffer = ''
+        self._pos = 0
+        self._eof = False
+
+    def _fill(self):
+        """
+        Reads next chunk of file into buffer.
+        Returns False if there is nothing more to read.
+        """
+        if self._eof:
+            return False
+        chunk = self._file_handle.read(self._chunk_size)
+        while isinstance(chunk, bytes):
+            raw = chunk
+            chunk = self._utf8.decode(raw, final=not raw)
+            if raw and not chunk:
+                # chunk ended in the middle of multibyte character
+                chunk = self._file_handle.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+
+    def peek(self):
+        """
+        Returns next non-whitespace character without consuming it.
+        Returns empty string at the end of file.
+        """
+        while True:
+            buffer = self._buffer
+            pos = self._pos
+            while pos < len(buffer) and buffer[pos] in ' \t\n\r':
+                pos += 1
+            self._pos = pos
+            if pos < len(buffer):
+                return buffer[pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char):
+        """
+        Consumes next non-whitespace character.
+        Raises JSONDecodeError if it is not given character.
+        """
+        if self.peek() != char:
+            raise json.JSONDecodeError(f'Expecting {char!r}',
+                                       self._buffer, self._pos)
+        self._pos += 1
+
+    def value(self):
+        """
+        Decodes and returns next complete JSON value.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self._buffer, self._pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            if end == len(self._buffer) and self._fill():
+                # number at the end of buffer may continue in next chunk
+                continue
+            self._pos = end
+            return value
+
+    def members(self):
+        """
+        Iterates over keys of next JSON object.
+        Value of each key has to be consumed before the next key is read.
+        """
+        self.expect('{')
+        if self.peek() == '}':
+            self._pos += 1
+            return
+        while True:
+            key = self.value()
+            self.expect(':')
+            yield key
+            char = self.peek()
+            self._pos += 1
+            if char == '}':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter",
+                                           self._buffer, self._pos - 1)
+
+    def items(self):
+        """
+        Iterates over next JSON array. Yields index of each item,
+        which has to be consumed before the next one is read.
+        """
+        self.expect('[')
+        if self.peek() == ']':
+            self._pos += 1
+            return
+        index = 0
+        while True:
+            yield index
+            index += 1
+            char = self.peek()
+            self._pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter",
+                                           self._buffer, self._pos - 1)
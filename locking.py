@@ -0,0 +1,318 @@
+"""
+Locking for players sharing one World in many threads. Map is divided
+into square regions with one lock each. Command takes locks of regions
+it can change or read, always in increasing order of region, so two
+commands never wait for each other in a cycle. Commands in different
+regions run at the same time, commands which may touch the whole map
+(travel, save) take every region lock.
+
+Player is guarded by its own lock, taken before any region lock, so
+one player's commands run one at a time. State shared by the whole map
+(caches, enemy registry) is guarded by World.lock(), which is taken
+last and never held while waiting for other locks.
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from classes import COMMANDS, FileHandler, Player
+from commands import CommandError
+from generator import ENEMY_NAMES
+
+PLAYER = 'player'
+HERE = 'here'
+AROUND = 'around'
+MAP = 'map'
+
+# cells every command can touch, commands which are not listed take
+# the whole map
+SCOPES = {
+    ('move',): AROUND,
+    ('use', 'gem'): AROUND,
+    ('look', 'around'): AROUND,
+    ('pickup', 'gems'): HERE,
+    ('fight',): HERE,
+    ('quick', 'fight'): HERE,
+    ('predict', 'fight'): HERE,
+    ('enemy', 'info'): HERE,
+    ('rest',): PLAYER,
+    ('show', 'equipment'): PLAYER,
+    ('show', 'stats'): PLAYER,
+    ('help',): PLAYER,
+}
+
+
+class RegionLocks:
+    """
+    Class RegionLocks. One lock for every square region of the map.
+    :param size: length of map's side
+    :type size: int
+    :param region_size: length of region's side
+    :type region_size: int
+    """
+    def __init__(self, size, region_size=16):
+        if region_size < 1:
+            raise ValueError('Region size has to be positive')
+        self._size = size
+        self._region_size = region_size
+        self._per_side = -(-size // region_size)
+        self._locks = [threading.Lock()
+                       for _ in range(self._per_side * self._per_side)]
+
+    def region_count(self):
+        return len(self._locks)
+
+    def region(self, x, y):
+        """
+        Returns index of region with given cell.
+        """
+        return ((x // self._region_size) * self._per_side
+                + y // self._region_size)
+
+    def regions(self, cells):
+        """
+        Returns sorted list of regions with given x, y cells,
+        cells outside of the map are skipped.
+        """
+        size = self._size
+        return sorted({self.region(x, y) for x, y in cells
+                       if 0 <= x < size and 0 <= y < size})
+
+    def all_regions(self):
+        return range(len(self._locks))
+
+    @contextmanager
+    def hold(self, regions):
+        """
+        Holds locks of given sorted regions.
+        """
+        acquired = []
+        try:
+            for index in regions:
+                self._locks[index].acquire()
+                acquired.append(index)
+            yield
+        finally:
+            for index in reversed(acquired):
+                self._locks[index].release()
+
+
+class ConcurrentWorld:
+    """
+    Class ConcurrentWorld. Runs commands of players sharing one World
+    from many threads.
+    :param world: map shared by players
+    :type world: World
+    :param region_size: length of side of region guarded by one lock
+    :type region_size: int
+    """
+    def __init__(self, world, region_size=16):
+        if world.is_lazy():
+            raise ValueError('Lazy world cannot be shared by threads')
+        self._world = world
+        self._locks = RegionLocks(len(world), region_size)
+        self._player_locks = {}
+        world.use_lock(threading.Lock())
+
+    def world(self):
+        return self._world
+
+    def region_locks(self):
+        return self._locks
+
+    def _player_lock(self, player):
+        lock = self._player_locks.get(player)
+        if lock is None:
+            lock = self._player_locks.setdefault(player, threading.Lock())
+        return lock
+
+    def scope(self, line):
+        """
+        Returns which cells command can touch: PLAYER, HERE, AROUND
+        or MAP.
+        """
+        try:
+            command, _ = COMMANDS.parse(line)
+        except CommandError:
+            return PLAYER
+        return SCOPES.get(command.words, MAP)
+
+    def regions(self, player, line):
+        """
+        Returns sorted regions command of player has to lock.
+        """
+        scope = self.scope(line)
+        if scope == PLAYER:
+            return []
+        if scope == MAP:
+            return self._locks.all_regions()
+        x, y = player.current_location()
+        if scope == HERE:
+            return [self._locks.region(x, y)]
+        return self._locks.regions(((x, y), (x, y + 1), (x, y - 1),
+                                    (x - 1, y), (x + 1, y)))
+
+    def action(self, player, line):
+        """
+        Runs player's command holding locks it needs.
+        """
+        with self._player_lock(player):
+            # player moves only in its own commands,
+            # so its position cannot change before regions are locked
+            with self._locks.hold(self.regions(player, line)):
+                return player.action(line)
+
+    def execute(self, jobs, threads=8):
+        """
+        Runs list of (player, command) in pool of threads.
+        Returns list of responses in order of jobs.
+        """
+        with ThreadPoolExecutor(threads) as pool:
+            return list(pool.map(lambda job: self.action(*job), jobs))
+
+
+def gem_count(world, players):
+    """
+    Returns number of gems on the map and in players' equipment.
+    """
+    return (sum(len(location.items()) for _, _, location in world.cells())
+            + sum(len(player.equipment()) for player in players))
+
+
+def check(world, players):
+    """
+    Returns list of broken invariants of shared world: occupancy index
+    has to match players' positions and enemy registry has to match
+    enemies on the map.
+    """
+    problems = []
+    for player in players:
+        x, y = player.current_location()
+        if player not in world.players_at(x, y):
+            problems.append(f'{player.name()} missing at {x},{y}')
+    positions = {player.current_location() for player in players}
+    occupied = sum(world.player_count(x, y) for x, y in positions)
+    if occupied != len(players):
+        problems.append(f'{occupied} players in index, not {len(players)}')
+    enemies = {}
+    for x, y, location in world.cells():
+        for enemy in location.enemies():
+            if enemy.health() <= 0:
+                problems.append(f'Dead {enemy.name()} at {x},{y}')
+            enemies[x, y] = enemies.get((x, y), 0) + 1
+    registry = world.enemy_registry()
+    if registry.count() != sum(enemies.values()):
+        problems.append(f'Registry has {registry.count()} enemies,'
+                        f' map has {sum(enemies.values())}')
+    for position in set(enemies) | set(registry.positions()):
+        if registry.count_at(position) != enemies.get(position, 0):
+            problems.append(f'Registry is wrong at {position}')
+    return problems
+
+
+COMMANDS_TO_PLAY = ('move north', 'move south', 'move west', 'move east',
+                    'use gem north', 'use gem south', 'use gem west',
+                    'use gem east', 'pickup gems', 'look around',
+                    'quick fight {enemy}', 'rest', 'show equipment')
+
+
+def random_jobs(players, count, seed=0, travel=0.01):
+    """
+    Returns list of count random (player, command), with given part
+    of 'travel to' commands which lock the whole map.
+    """
+    generator = random.Random(seed)
+    size = len(players[0].locations())
+    jobs = []
+    for _ in range(count):
+        player = generator.choice(players)
+        if generator.random() < travel:
+            command = (f'travel to {generator.randrange(size)},'
+                       f'{generator.randrange(size)}')
+        else:
+            command = generator.choice(COMMANDS_TO_PLAY).format(
+                enemy=generator.choice(ENEMY_NAMES).lower())
+        jobs.append((player, command))
+    return jobs
+
+
+class StressResult:
+    """
+    Class StressResult. Contains attributes:
+    :param threads: number of threads
+    :type threads: int
+    :param responses: responses to commands
+    :type responses: list
+    :param seconds: time of the whole run
+    :type seconds: float
+    :param problems: invariants broken after the run
+    :type problems: list
+    """
+    def __init__(self, threads, responses, seconds, problems):
+        self.threads = threads
+        self.responses = responses
+        self.seconds = seconds
+        self.problems = problems
+
+    def throughput(self):
+        """
+        Returns commands per second.
+        """
+        return len(self.responses) / self.seconds if self.seconds else 0.0
+
+
+def stress(path, players=64, commands=20000, threads=8, region_size=16,
+           seed=0):
+    """
+    Plays random commands of many players sharing world from json save
+    in a pool of threads. Returns StressResult.
+    """
+    template = FileHandler().read_from_json(path)
+    world = template.locations()
+    world.remove_player(template, *template.current_location())
+    generator = random.Random(seed)
+    cells = [(x, y) for x, y, location in world.cells()
+             if not location.barrier()]
+    team = [Player(f'Player {index}', generator.choice(cells), world,
+                   template.power(), template.health(),
+                   list(template.equipment()))
+            for index in range(players)]
+    jobs = random_jobs(team, commands, seed)
+    gems = gem_count(world, team)
+    concurrent = ConcurrentWorld(world, region_size)
+    start = time.perf_counter()
+    responses = concurrent.execute(jobs, threads)
+    seconds = time.perf_counter() - start
+    problems = check(world, team)
+    used = sum(response == '\n\t\tYou used gem and removed barrier.\n'
+               for response in responses)
+    if gem_count(world, team) + used != gems:
+        problems.append('Gems were lost or duplicated')
+    return StressResult(threads, responses, seconds, problems)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared world stress test')
+    parser.add_argument('path', help='json save file')
+    parser.add_argument('--players', type=int, default=64)
+    parser.add_argument('--commands', type=int, default=20000)
+    parser.add_argument('--threads', type=int, nargs='+',
+                        default=[1, 2, 4, 8])
+    parser.add_argument('--region-size', type=int, default=16)
+    args = parser.parse_args()
+    failed = False
+    for threads in args.threads:
+        result = stress(args.path, args.players, args.commands, threads,
+                        args.region_size)
+        print(f'{threads} threads: {result.throughput():.0f} commands/s,'
+              f' {len(result.problems)} problems')
+        for problem in result.problems:
+            print(f'\t{problem}')
+        failed = failed or bool(result.problems)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
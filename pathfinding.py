@@ -0,0 +1,265 @@
+from array import array
+from collections import OrderedDict, deque
+
+# cells are kept in blocks of consecutive flat indices, only blocks with
+# open or reachable cells get memory
+BLOCK_BITS = 12
+BLOCK_SIZE = 1 << BLOCK_BITS
+BLOCK_MASK = BLOCK_SIZE - 1
+MAX_FIELD_BYTES = 64 << 20
+
+
+class DistanceField:
+    """
+    Class DistanceField. Distance of every cell of the map to the
+    nearest of source cells, counted in moves between open cells.
+    :param sources: flat indices of target cells
+    :type sources: frozenset
+    :param blocks: distances in blocks of BLOCK_SIZE cells, only blocks
+        with reachable cells are kept, unreachable cells have distance
+        equal to number of cells
+    :type blocks: dict
+    """
+    __slots__ = ('sources', 'blocks')
+
+    def __init__(self, sources, blocks):
+        self.sources = sources
+        self.blocks = blocks
+
+    def nbytes(self):
+        """
+        Returns memory taken by distances.
+        """
+        return sum(block.itemsize * len(block)
+                   for block in self.blocks.values())
+
+
+class PathFinder:
+    """
+    Class PathFinder. Finds shortest paths between locations without
+    barriers. Distance fields to recently used targets are kept, and
+    when barrier is removed only cells which got closer are updated.
+    :param world: map of locations
+    :type world: World
+    :param max_fields: number of distance fields kept in memory
+    :type max_fields: int
+    :param max_bytes: memory distance fields can take together, the
+        last used field is kept even if it is bigger
+    :type max_bytes: int
+    """
+    def __init__(self, world, max_fields=8, max_bytes=MAX_FIELD_BYTES):
+        size = len(world)
+        self._size = size
+        self._cells = size * size
+        self._typecode = 'i' if self._cells < 1 << 31 else 'q'
+        self._block_bytes = array(self._typecode).itemsize * BLOCK_SIZE
+        self._open = {}
+        self._names = None
+        self._world = world
+        for x, y, location in world.cells():
+            if not location.barrier():
+                self._set_open(x * size + y, 1)
+        self._max_fields = max_fields
+        self._max_bytes = max_bytes
+        self._fields = OrderedDict()
+        self._bytes = 0
+        self._relaxed = 0
+
+    def _set_open(self, index, value):
+        block = self._open.get(index >> BLOCK_BITS)
+        if block is None:
+            block = self._open[index >> BLOCK_BITS] = bytearray(BLOCK_SIZE)
+        block[index & BLOCK_MASK] = value
+
+    def _is_open(self, index):
+        block = self._open.get(index >> BLOCK_BITS)
+        return block is not None and block[index & BLOCK_MASK] == 1
+
+    def _new_block(self):
+        return array(self._typecode, [self._cells]) * BLOCK_SIZE
+
+    def distance(self, field, index):
+        """
+        Returns distance of cell in field, number of cells if it is
+        not reachable.
+        """
+        block = field.blocks.get(index >> BLOCK_BITS)
+        if block is None:
+            return self._cells
+        return block[index & BLOCK_MASK]
+
+    def _neighbours(self, index):
+        size = self._size
+        if index >= size:
+            yield index - size
+        if index + size < self._cells:
+            yield index + size
+        if index % size:
+            yield index - 1
+        if (index + 1) % size:
+            yield index + 1
+
+    def relaxed_count(self):
+        """
+        Returns number of cells updated after barriers were removed.
+        """
+        return self._relaxed
+
+    def field_count(self):
+        return len(self._fields)
+
+    def field_bytes(self):
+        """
+        Returns memory taken by kept distance fields.
+        """
+        return self._bytes
+
+    def cells_named(self, name):
+        """
+        Returns list of x, y of locations with given name,
+        ignoring case.
+        """
+        if self._names is None:
+            names = {}
+            for x, y, location in self._world.cells():
+                names.setdefault(location.name().lower(), []).append(
+                    x * self._size + y)
+            self._names = names
+        return [divmod(index, self._size)
+                for index in self._names.get(name.lower(), ())]
+
+    def _compute(self, sources):
+        blocks = {}
+        open_blocks = self._open
+        new_block = self._new_block
+        queue = deque()
+        for index in sources:
+            if self._is_open(index):
+                block = blocks.get(index >> BLOCK_BITS)
+                if block is None:
+                    block = blocks[index >> BLOCK_BITS] = new_block()
+                block[index & BLOCK_MASK] = 0
+                queue.append(index)
+        neighbours = self._neighbours
+        while queue:
+            index = queue.popleft()
+            distance = blocks[index >> BLOCK_BITS][index & BLOCK_MASK] + 1
+            for neighbour in neighbours(index):
+                key = neighbour >> BLOCK_BITS
+                is_open = open_blocks.get(key)
+                if is_open is None or not is_open[neighbour & BLOCK_MASK]:
+                    continue
+                block = blocks.get(key)
+                if block is None:
+                    block = blocks[key] = new_block()
+                if block[neighbour & BLOCK_MASK] > distance:
+                    block[neighbour & BLOCK_MASK] = distance
+                    queue.append(neighbour)
+        return DistanceField(sources, blocks)
+
+    def _evict(self):
+        # the last used field stays, even if it is over the memory limit
+        while len(self._fields) > 1 and (
+                len(self._fields) > self._max_fields
+                or self._bytes > self._max_bytes):
+            _, field = self._fields.popitem(last=False)
+            self._bytes -= field.nbytes()
+
+    def field(self, targets):
+        """
+        Returns DistanceField to the nearest of given x, y cells.
+        """
+        sources = frozenset(x * self._size + y for x, y in targets)
+        field = self._fields.get(sources)
+        if field is not None:
+            self._fields.move_to_end(sources)
+            return field
+        field = self._compute(sources)
+        self._fields[sources] = field
+        self._bytes += field.nbytes()
+        self._evict()
+        return field
+
+    def path(self, start, targets):
+        """
+        Returns list of x, y cells leading from start to the nearest
+        of targets, without start, or None if targets cannot be reached.
+        Start cell does not have to be open.
+        """
+        field = self.field(targets)
+        distance_of = self.distance
+        size = self._size
+        index = start[0] * size + start[1]
+        if not self._is_open(index):
+            distance = min((distance_of(field, neighbour) + 1
+                            for neighbour in self._neighbours(index)),
+                           default=self._cells)
+        else:
+            distance = distance_of(field, index)
+        if distance >= self._cells:
+            return None
+        path = []
+        while distance:
+            distance -= 1
+            for neighbour in self._neighbours(index):
+                if distance_of(field, neighbour) == distance:
+                    index = neighbour
+                    break
+            path.append(divmod(index, size))
+        return path
+
+    def opened(self, x, y):
+        """
+        Updates distance fields after barrier at x, y was removed.
+        Only cells which got closer to targets are visited.
+        """
+        index = x * self._size + y
+        if self._is_open(index):
+            return
+        self._set_open(index, 1)
+        neighbours = self._neighbours
+        distance_of = self.distance
+        is_open = self._is_open
+        for field in self._fields.values():
+            blocks = field.blocks
+            if index in field.sources:
+                distance = 0
+            else:
+                distance = min(distance_of(field, neighbour) for neighbour
+                               in neighbours(index)) + 1
+            if distance >= distance_of(field, index):
+                continue
+            added = len(blocks)
+            self._set_distance(blocks, index, distance)
+            queue = deque([index])
+            while queue:
+                current = queue.popleft()
+                self._relaxed += 1
+                distance = distance_of(field, current) + 1
+                for neighbour in neighbours(current):
+                    if (is_open(neighbour)
+                            and distance_of(field, neighbour) > distance):
+                        self._set_distance(blocks, neighbour, distance)
+                        queue.append(neighbour)
+            self._bytes += (len(blocks) - added) * self._block_bytes
+        self._evict()
+
+    def _set_distance(self, blocks, index, distance):
+        block = blocks.get(index >> BLOCK_BITS)
+        if block is None:
+            block = blocks[index >> BLOCK_BITS] = self._new_block()
+        block[index & BLOCK_MASK] = distance
+
+    def closed(self, x, y):
+        """
+        Forgets distance fields which could lead through x, y
+        after barrier was put there.
+        """
+        index = x * self._size + y
+        if not self._is_open(index):
+            return
+        self._set_open(index, 0)
+        for key, field in list(self._fields.items()):
+            if self.distance(field, index) < self._cells:
+                del self._fields[key]
+                self._bytes -= field.nbytes()
@@ -0,0 +1,288 @@
+"""
+Instrumentation. Counts commands and measures their latency in
+histograms with logarithmic buckets, so recording takes constant time
+and memory however many commands are played. Loading and saving games
+and win checks are measured separately as operations.
+
+Chosen command type can be profiled with cProfile, on every n-th call
+so that profiling can stay on under load. Profiler is shared by all
+threads, profiled calls run one at a time.
+"""
+import cProfile
+import functools
+import io
+import json
+import math
+import pstats
+import threading
+from time import perf_counter_ns
+
+# values below 2 ** SUB_BITS nanoseconds get own buckets, bigger ones
+# are split into 2 ** (SUB_BITS - 1) buckets per power of two,
+# so percentiles are off by at most 1 / 2 ** (SUB_BITS - 1)
+SUB_BITS = 4
+_EXACT = 1 << SUB_BITS
+_SUB = 1 << (SUB_BITS - 1)
+
+
+def _bucket(nanoseconds):
+    if nanoseconds < _EXACT:
+        return max(0, nanoseconds)
+    shift = nanoseconds.bit_length() - SUB_BITS
+    return _EXACT + (shift - 1) * _SUB + (nanoseconds >> shift) - _SUB
+
+
+def _bucket_limit(index):
+    """
+    Returns the biggest value which falls into bucket.
+    """
+    if index < _EXACT:
+        return index
+    shift, sub = divmod(index - _EXACT, _SUB)
+    return ((_SUB + sub + 1) << (shift + 1)) - 1
+
+
+class LatencyHistogram:
+    """
+    Class LatencyHistogram. Latencies in nanoseconds counted in
+    logarithmic buckets.
+    """
+    __slots__ = ('_counts', '_count', '_total', '_min', '_max')
+
+    def __init__(self):
+        self._counts = {}
+        self._count = 0
+        self._total = 0
+        self._min = None
+        self._max = 0
+
+    def record(self, nanoseconds):
+        # _bucket written inline, it runs for every command
+        if nanoseconds < _EXACT:
+            bucket = max(0, nanoseconds)
+        else:
+            shift = nanoseconds.bit_length() - SUB_BITS
+            bucket = (_EXACT - _SUB + (shift - 1) * _SUB
+                      + (nanoseconds >> shift))
+        counts = self._counts
+        counts[bucket] = counts.get(bucket, 0) + 1
+        self._count += 1
+        self._total += nanoseconds
+        if nanoseconds > self._max:
+            self._max = nanoseconds
+        if self._min is None or nanoseconds < self._min:
+            self._min = nanoseconds
+
+    def count(self):
+        return self._count
+
+    def total(self):
+        """
+        Returns sum of latencies in nanoseconds.
+        """
+        return self._total
+
+    def percentile(self, part):
+        """
+        Returns latency in nanoseconds which given part of recorded
+        latencies do not exceed, e.g. part 0.99 for p99.
+        Returns 0 if nothing was recorded.
+        """
+        if not self._count:
+            return 0
+        rank = max(1, math.ceil(self._count * part))
+        seen = 0
+        for bucket in sorted(self._counts):
+            seen += self._counts[bucket]
+            if seen >= rank:
+                return max(self._min, min(self._max, _bucket_limit(bucket)))
+        return self._max
+
+    def to_dict(self):
+        """
+        Returns summary with times in seconds.
+        """
+        return {
+            'count': self._count,
+            'total': self._total / 1e9,
+            'mean': self._total / self._count / 1e9 if self._count else 0.0,
+            'min': (self._min or 0) / 1e9,
+            'max': self._max / 1e9,
+            'p50': self.percentile(0.5) / 1e9,
+            'p95': self.percentile(0.95) / 1e9,
+            'p99': self.percentile(0.99) / 1e9
+        }
+
+
+class PerfStats:
+    """
+    Class PerfStats. Latency histograms of commands and operations.
+    Counting is not locked, so with many threads a few calls can be
+    missed. Profiler state is guarded by a lock.
+    :param enabled: False if nothing should be measured
+    :type enabled: bool
+    """
+    def __init__(self, enabled=True):
+        self._enabled = enabled
+        self._commands = {}
+        self._groups = {'commands': self._commands, 'operations': {}}
+        self._profiled = None
+        self._profile_every = 1
+        self._profile_calls = 0
+        self._profiler = None
+        self._profile_lock = threading.Lock()
+
+    def enable(self, enabled=True):
+        self._enabled = enabled
+
+    def is_enabled(self):
+        return self._enabled
+
+    def reset(self):
+        """
+        Forgets all measurements and profile.
+        """
+        for histograms in self._groups.values():
+            histograms.clear()
+        if self._profiled is not None:
+            self.profile(self._profiled, self._profile_every)
+
+    def histogram(self, name, group='commands'):
+        """
+        Returns LatencyHistogram of command or operation, or None if
+        it was not measured.
+        """
+        return self._groups[group].get(name)
+
+    def record(self, name, nanoseconds, group='commands'):
+        histograms = self._groups[group]
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = LatencyHistogram()
+        histogram.record(nanoseconds)
+
+    def run_command(self, name, function, *args):
+        """
+        Calls function and measures it as command with given name.
+        """
+        if not self._enabled:
+            return function(*args)
+        start = perf_counter_ns()
+        if name == self._profiled:
+            # profiler cannot run in two threads at once
+            with self._profile_lock:
+                if name == self._profiled:
+                    self._profile_calls += 1
+                    if self._profile_calls % self._profile_every == 0:
+                        result = self._profiler.runcall(function, *args)
+                        self.record(name, perf_counter_ns() - start)
+                        return result
+        result = function(*args)
+        elapsed = perf_counter_ns() - start
+        histogram = self._commands.get(name)
+        if histogram is None:
+            histogram = self._commands[name] = LatencyHistogram()
+        histogram.record(elapsed)
+        return result
+
+    def timed(self, function):
+        """
+        Decorator which measures every call of function as operation
+        named after it, e.g. 'FileHandler.save_to_json'.
+        """
+        name = function.__qualname__
+
+        @functools.wraps(function)
+        def measured(*args, **kwargs):
+            if not self._enabled:
+                return function(*args, **kwargs)
+            start = perf_counter_ns()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(name, perf_counter_ns() - start, 'operations')
+        return measured
+
+    def profile(self, name, every=1):
+        """
+        Profiles every n-th call of command with given name with
+        cProfile. Name None stops profiling. Previous profile is lost.
+        """
+        if every < 1:
+            raise ValueError('Profiled calls have to be positive')
+        with self._profile_lock:
+            self._profiled = name
+            self._profile_every = every
+            self._profile_calls = 0
+            self._profiler = (cProfile.Profile() if name is not None
+                              else None)
+
+    def profiled(self):
+        """
+        Returns name of profiled command or None.
+        """
+        return self._profiled
+
+    def profile_report(self, limit=15):
+        """
+        Returns functions which took most time in profiled calls,
+        or empty string if nothing was profiled.
+        """
+        output = io.StringIO()
+        with self._profile_lock:
+            if self._profiler is None:
+                return ''
+            try:
+                stats = pstats.Stats(self._profiler, stream=output)
+            except TypeError:
+                # profiler has not run yet
+                return ''
+        stats.sort_stats('cumulative').print_stats(limit)
+        return output.getvalue()
+
+    def to_dict(self):
+        """
+        Returns all measurements as dict which can be saved in json.
+        """
+        data = {group: {name: histogram.to_dict() for name, histogram
+                        in sorted(histograms.items())}
+                for group, histograms in self._groups.items()}
+        data['profiled'] = self._profiled
+        return data
+
+    def export(self, path):
+        """
+        Saves measurements to json file.
+        """
+        with open(path, 'w') as file_handle:
+            json.dump(self.to_dict(), file_handle, indent=4)
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=4)
+
+    def describe(self):
+        """
+        Returns table with count and latencies of commands and
+        operations, in microseconds.
+        """
+        lines = []
+        for group, histograms in self._groups.items():
+            lines.append(f'{group.title():<28}{"count":>8}{"p50":>10}'
+                         f'{"p95":>10}{"p99":>10}{"max":>10}')
+            if not histograms:
+                lines.append('\tnothing measured yet')
+            for name, histogram in sorted(histograms.items()):
+                values = [histogram.percentile(part) / 1000
+                          for part in (0.5, 0.95, 0.99)]
+                values.append(histogram.to_dict()['max'] * 1e6)
+                lines.append(f'{name:<28}{histogram.count():>8}'
+                             + ''.join(f'{value:>10.1f}'
+                                       for value in values))
+        if self._profiled is not None:
+            lines.append(f'Profiling {self._profiled!r} every'
+                         f' {self._profile_every} call(s)')
+        return '\n' + '\n'.join(f'\t\t{line}' for line in lines) + '\n'
+
+
+STATS = PerfStats()
+timed = STATS.timed
@@ -0,0 +1,155 @@
+import random
+from collections import Counter
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class FightPrediction:
+    """
+    Class FightPrediction. Result of simulated fights. Contains attributes:
+    :param trials: number of simulated fights
+    :type trials: int
+    :param wins: number of fights won by player
+    :type wins: int
+    :param health_total: player's health left, summed over all fights
+    :type health_total: int
+    :param lengths: number of fights for every fight length in rounds
+    :type lengths: Counter
+    """
+    def __init__(self, trials, wins, health_total, lengths):
+        self._trials = trials
+        self._wins = wins
+        self._health_total = health_total
+        self._lengths = lengths
+
+    def trials(self):
+        return self._trials
+
+    def wins(self):
+        return self._wins
+
+    def win_probability(self):
+        """
+        Returns part of fights won by player.
+        """
+        return self._wins / self._trials
+
+    def expected_health(self):
+        """
+        Returns average health player has left after fight.
+        """
+        return self._health_total / self._trials
+
+    def lengths(self):
+        """
+        Returns dict with number of fights for every length in rounds.
+        """
+        return dict(sorted(self._lengths.items()))
+
+    def expected_length(self):
+        """
+        Returns average number of rounds of fight.
+        """
+        rounds = sum(length * count for length, count in self._lengths.items())
+        return rounds / self._trials
+
+    def describe(self, name_of_enemy, max_lengths=5):
+        """
+        Returns description of prediction for fight with given enemy.
+        """
+        common = sorted(length for length, _ in
+                        self._lengths.most_common(max_lengths))
+        lengths = ', '.join(
+            f'{length}: {100 * self._lengths[length] / self._trials:.1f}%'
+            for length in common)
+        chance = f'Chance to win with {name_of_enemy}'
+        return (f'\n\t\t{chance} is {100 * self.win_probability():.1f}%.'
+                + '\n\t\tExpected health after fight is'
+                + f' {self.expected_health():.1f}.'
+                + f'\n\t\tMost common fight lengths in rounds: {lengths}.\n')
+
+
+def _check(player_health, player_power, enemy_health, enemy_power, trials):
+    if trials <= 0:
+        raise ValueError('Number of trials has to be positive')
+    if min(player_health, player_power, enemy_health) < 0:
+        raise ValueError('Health and power cannot be negative')
+    if enemy_power < 1:
+        raise ValueError('Enemy power has to be positive')
+
+
+def _simulate(player_health, player_power, enemy_health, enemy_power,
+              trials, seed):
+    randint = random.Random(seed).randint
+    wins = 0
+    health_total = 0
+    lengths = Counter()
+    for _ in range(trials):
+        health = player_health
+        e_health = enemy_health
+        rounds = 0
+        while e_health > 0 and health > 0:
+            rounds += 1
+            if player_power:
+                e_health -= min(randint(1, player_power), e_health)
+            if e_health == 0:
+                wins += 1
+                break
+            health -= min(randint(1, enemy_power), health)
+        health_total += health
+        lengths[rounds] += 1
+    return FightPrediction(trials, wins, health_total, lengths)
+
+
+def _simulate_numpy(player_health, player_power, enemy_health, enemy_power,
+                    trials, seed):
+    rng = numpy.random.default_rng(seed)
+    health = numpy.full(trials, player_health, dtype=numpy.int64)
+    e_health = numpy.full(trials, enemy_health, dtype=numpy.int64)
+    rounds = numpy.zeros(trials, dtype=numpy.int64)
+    won = numpy.zeros(trials, dtype=bool)
+    active = numpy.flatnonzero((e_health > 0) & (health > 0))
+    while active.size:
+        rounds[active] += 1
+        if player_power:
+            damage = rng.integers(1, player_power + 1, size=active.size)
+            e_health[active] -= numpy.minimum(damage, e_health[active])
+        dead = e_health[active] == 0
+        won[active[dead]] = True
+        active = active[~dead]
+        if not active.size:
+            break
+        damage = rng.integers(1, enemy_power + 1, size=active.size)
+        health[active] -= numpy.minimum(damage, health[active])
+        active = active[health[active] > 0]
+    values, counts = numpy.unique(rounds, return_counts=True)
+    lengths = Counter({int(value): int(count)
+                       for value, count in zip(values, counts)})
+    return FightPrediction(trials, int(won.sum()), int(health.sum()),
+                           lengths)
+
+
+def predict_fight(player_health, player_power, enemy_health, enemy_power,
+                  trials=10000, seed=None, use_numpy=None):
+    """
+    Simulates given number of fights by the rules of Player.fight:
+    player and enemy take turns dealing randint(1, power) damage,
+    starting with player, until one of them has no health left.
+    Fights are simulated in batches with NumPy if it is installed,
+    otherwise one by one. Results are reproducible for given seed
+    and the same use_numpy.
+    Returns FightPrediction.
+    """
+    _check(player_health, player_power, enemy_health, enemy_power, trials)
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    if use_numpy:
+        if numpy is None:
+            raise ImportError('NumPy is not installed')
+        return _simulate_numpy(player_health, player_power, enemy_health,
+                               enemy_power, trials, seed)
+    return _simulate(player_health, player_power, enemy_health, enemy_power,
+                     trials, seed)
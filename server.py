@@ -0,0 +1,253 @@
+"""
+Line protocol. Client sends one command per line. Server answers every
+command with lines of text followed by line with single dot. Lines of
+answer which start with a dot get one more dot in front of them.
+Besides game commands server understands:
+    load (file) - loads game from file in server's save directory
+    save (file) - saves game to file in server's save directory
+    exit        - closes connection
+When game is won or lost, server sends the result and closes connection.
+Commands run in a pool of threads, so long ones do not hold up other
+clients. Commands which control the whole server process, like
+'stats perf profile', are refused.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from classes import (COMMANDS, FileHandler, Game, InvalidDirectionError,
+                     NegativeDamageError, NegativeHealthError,
+                     NegativePowerError)
+from commands import CommandError
+import validation
+
+END = '.'
+# commands of server's administrator, not available to clients
+ADMIN_COMMANDS = (('stats', 'perf'),)
+# errors of game rules, any other error of command is a bug and is logged
+GAME_ERRORS = (InvalidDirectionError, NegativeDamageError,
+               NegativeHealthError, NegativePowerError)
+
+logger = logging.getLogger(__name__)
+
+
+def encode_response(text):
+    """
+    Returns text as lines of response ending with terminator line.
+    """
+    lines = text.split('\n')
+    lines = [f'.{line}' if line.startswith('.') else line for line in lines]
+    lines.append(END)
+    return ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+async def read_response(reader):
+    """
+    Reads one response from server and returns it as text.
+    Returns None if connection was closed.
+    """
+    lines = []
+    while True:
+        line = await reader.readline()
+        if not line:
+            return None
+        line = line.decode('utf-8').rstrip('\n')
+        if line == END:
+            return '\n'.join(lines)
+        if line.startswith('.'):
+            line = line[1:]
+        lines.append(line)
+
+
+class Session(Game):
+    """
+    Class Session. Game played by one connected client.
+    """
+    def __init__(self, player):
+        self.player = player
+
+
+class GameServer:
+    """
+    Class GameServer. Hosts independent game sessions for clients
+    connected with TCP. Template is read once and shared by all
+    sessions, every session keeps only locations it changed.
+    :param template: path to file every new game starts from
+    :type template: str
+    :param save_dir: directory with files clients can load and save
+    :type save_dir: str
+    """
+    def __init__(self, template='json_files/init.json', save_dir='json_files',
+                 host='127.0.0.1', port=0):
+        self._template = template
+        self._template_player = None
+        self._save_dir = save_dir
+        self._host = host
+        self._port = port
+        self._server = None
+        self._sessions = 0
+        self._commands = 0
+
+    def sessions(self):
+        """
+        Returns number of connected clients.
+        """
+        return self._sessions
+
+    def commands(self):
+        """
+        Returns number of commands handled since server started.
+        """
+        return self._commands
+
+    async def start(self):
+        """
+        Starts listening. Returns port the server listens on.
+        """
+        if self._template_player is None:
+            loop = asyncio.get_running_loop()
+            self._template_player = await loop.run_in_executor(
+                None, FileHandler().read_template, self._template)
+        self._server = await asyncio.start_server(self._handle, self._host,
+                                                  self._port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _is_admin(self, line):
+        try:
+            command, _ = COMMANDS.parse(line)
+        except CommandError:
+            return False
+        return any(command.words[:len(words)] == words
+                   for words in ADMIN_COMMANDS)
+
+    def _save_path(self, name):
+        if (not name or name != os.path.basename(name)
+                or name.startswith('.')):
+            raise ValueError('Invalid file name')
+        return os.path.join(self._save_dir, name)
+
+    async def _load(self, path):
+        # read_from_json validates the save and raises SaveValidationError,
+        # so the file is parsed only once
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(
+                None, FileHandler().read_from_json, path)
+        except json.JSONDecodeError as e:
+            raise validation.SaveValidationError(
+                [('$', f'Invalid json, {e.msg}')])
+
+    async def _command(self, session, line):
+        words = line.split()
+        if len(words) == 2 and words[0].lower() in ('load', 'save'):
+            try:
+                path = self._save_path(words[1])
+            except ValueError as e:
+                return f'\n\t\t{e}\n'
+            loop = asyncio.get_running_loop()
+            try:
+                if words[0].lower() == 'load':
+                    session.player = await self._load(path)
+                    return f'\n\t\tloaded {words[1]}\n'
+                await loop.run_in_executor(None, FileHandler().save_to_json,
+                                           path, session.player)
+                return f'\n\t\tsaved to {words[1]}\n'
+            except validation.SaveValidationError as e:
+                return f'\n\t\tInvalid save file, {e}\n'
+            except (OSError, KeyError, ValueError):
+                return f'\n\t\tCould not {words[0].lower()} {words[1]}\n'
+        if self._is_admin(line):
+            return '\n\t\tThis command is not available on server.\n'
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, session.player.action,
+                                              line)
+        except GAME_ERRORS:
+            return 'Invalid action.'
+        except Exception:
+            logger.exception('Command %r failed', line)
+            return '\n\t\tServer error.\n'
+
+    async def _handle(self, reader, writer):
+        self._sessions += 1
+        try:
+            session = Session(self._template_player.fork())
+            writer.write(encode_response('\n\t\tStarting game'))
+            await writer.drain()
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    break
+                if not line:
+                    break
+                line = line.decode('utf-8', 'replace').strip()
+                if line == 'exit':
+                    break
+                response = await self._command(session, line)
+                self._commands += 1
+                outcome = session.outcome()
+                if outcome == 'won':
+                    response += '\t\tYou won\n'
+                if outcome == 'lost':
+                    response += '\t\tYou lost\n'
+                writer.write(encode_response(response))
+                await writer.drain()
+                if outcome:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self._sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+
+async def play(host, port, commands):
+    """
+    Connects to server, sends commands one by one and returns list
+    of responses, starting with greeting.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+    responses = [await read_response(reader)]
+    try:
+        for command in commands:
+            writer.write(f'{command}\n'.encode('utf-8'))
+            await writer.drain()
+            response = await read_response(reader)
+            if response is None:
+                break
+            responses.append(response)
+    finally:
+        writer.close()
+        await writer.wait_closed()
+    return responses
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Text game server')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4000)
+    parser.add_argument('--template', default='json_files/init.json')
+    parser.add_argument('--save-dir', default='json_files')
+    args = parser.parse_args()
+    server = GameServer(args.template, args.save_dir, args.host, args.port)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == '__main__':
+    main()
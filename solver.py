@@ -0,0 +1,363 @@
+"""
+Solver. Finds the shortest list of commands which wins the game saved
+in json file, with breadth-first search over game states.
+
+State is player's position, removed barriers, picked up gems, killed
+enemies and number of gems of every color in equipment, all packed
+into one int. States already seen are kept in transposition table
+together with the state and command they were reached by. Every big
+level of the search is split into chunks which are expanded by a pool
+of processes. The pool is forked once, at the first big level, with the
+table seen so far. Workers remember states they found, so that they
+send back only states which neither the table nor they have seen, and
+states found by other workers are dropped here.
+
+Fights are random, so every 'fight' command is assumed to kill the
+enemy. 'rest' is added before fights which could be lost with health
+left after previous ones, and the found commands are played by Player
+to check that they really win.
+"""
+import argparse
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from classes import (DIRECTIONS, FileHandler, can_enter, can_fight,
+                     gems_to_pick, leaving_opens, opening_gem, step)
+import harness
+
+MOVE = 0
+USE_GEM = 4
+PICKUP = 8
+FIGHT = 9
+
+
+class SolverError(Exception):
+    pass
+
+
+class Model:
+    """
+    Class Model. Rules of the game for one world, written in terms of
+    packed states. Tables of the model are built with the same rules
+    Player follows, from classes: moving out of a location can remove its
+    barrier, location with barrier cannot be entered, use_gem removes
+    barrier next to player with proper gem, pickup_gems takes gems from
+    player's location and only some enemies can be fought. Enemy which
+    cannot be fought is never killed, so the game cannot be won.
+    """
+    def __init__(self, player):
+        world = player.locations()
+        size = len(world)
+        self._size = size
+        colors = {}
+        barriers = {}
+        gems = {}
+        enemies = {}
+        leaving = set()
+        cells = set()
+        self._beatable = True
+        for color in player.equipment().color_counts():
+            colors.setdefault(color, len(colors))
+        for x, y, location in world.cells():
+            index = x * size + y
+            cells.add(index)
+            if not can_enter(location):
+                color = colors.setdefault(opening_gem(location),
+                                          len(colors))
+                barriers[index] = (len(barriers), color)
+                if leaving_opens(location):
+                    leaving.add(index)
+            picked = gems_to_pick(location)
+            if picked:
+                for gem in picked:
+                    colors.setdefault(gem.color(), len(colors))
+                gems[index] = [gem.color() for gem in picked]
+            if location.enemies():
+                enemies[index] = [(enemy.name(), enemy.health(),
+                                   enemy.power())
+                                  for enemy in location.enemies()]
+                if not all(map(can_fight, location.enemies())):
+                    self._beatable = False
+        self._colors = list(colors)
+        totals = [0] * len(colors)
+        for color, count in player.equipment().color_counts().items():
+            totals[colors[color]] += count
+        for cell_gems in gems.values():
+            for color in cell_gems:
+                totals[colors[color]] += 1
+        self._position_bits = max(1, (size * size - 1).bit_length())
+        self._removed_shift = self._position_bits
+        self._picked_shift = self._removed_shift + len(barriers)
+        self._killed_shift = self._picked_shift + len(gems)
+        enemy_count = sum(len(cell) for cell in enemies.values())
+        self._counts_shift = self._killed_shift + enemy_count
+        self._all_killed = ((1 << enemy_count) - 1) << self._killed_shift
+        offsets = []
+        masks = []
+        offset = self._counts_shift
+        for total in totals:
+            offsets.append(offset)
+            masks.append((1 << max(1, total.bit_length())) - 1)
+            offset += max(1, total.bit_length())
+        # direction player has to move after using gem, plus one
+        self._pending_shift = offset
+        self._barriers = {index: (1 << (self._removed_shift + bit), color)
+                          for index, (bit, color) in barriers.items()}
+        self._leaving = {index: self._barriers[index][0]
+                         for index in leaving}
+        self._gems = {}
+        for bit, (index, cell_gems) in enumerate(sorted(gems.items())):
+            change = sum(1 << offsets[colors[color]] for color in cell_gems)
+            self._gems[index] = (1 << (self._picked_shift + bit), change)
+        self._enemies = {}
+        self._enemy_list = []
+        bit = self._killed_shift
+        for index, cell in sorted(enemies.items()):
+            self._enemies[index] = []
+            for name, health, power in cell:
+                self._enemies[index].append(1 << bit)
+                self._enemy_list.append((1 << bit, name, health, power))
+                bit += 1
+        self._offsets = offsets
+        self._masks = masks
+        self._neighbours = {}
+        for index in cells:
+            x, y = divmod(index, size)
+            near = []
+            for action, direction in enumerate(DIRECTIONS):
+                nx, ny = step(x, y, direction)
+                if 0 <= nx < size and 0 <= ny < size \
+                        and nx * size + ny in cells:
+                    near.append((action, nx * size + ny))
+            self._neighbours[index] = near
+        x, y = player.current_location()
+        state = x * size + y
+        for color, count in player.equipment().color_counts().items():
+            state += count << offsets[colors[color]]
+        self._start = state
+
+    def start(self):
+        return self._start
+
+    def is_beatable(self):
+        """
+        Returns False if some enemy cannot be fought.
+        """
+        return self._beatable
+
+    def is_won(self, state):
+        return state & self._all_killed == self._all_killed
+
+    def _barrier_at(self, state, index):
+        barrier = self._barriers.get(index)
+        if barrier is None or state & barrier[0]:
+            return None
+        return barrier
+
+    def successors(self, state):
+        """
+        Returns list of (state, command code) reachable with one command.
+        Commands which cannot make solution shorter are skipped: enemy in
+        player's location is fought at once, and after using gem player
+        goes straight to the location it opened. Any solution can be
+        changed to such one with the same number of commands.
+        """
+        position = state & ((1 << self._position_bits) - 1)
+        for bit in self._enemies.get(position, ()):
+            if not state & bit:
+                return [(state | bit, FIGHT)]
+        pending = state >> self._pending_shift
+        state -= pending << self._pending_shift
+        leaving = state | self._leaving.get(position, 0)
+        result = []
+        for action, neighbour in self._neighbours[position]:
+            if pending and action != pending - 1:
+                continue
+            barrier = self._barrier_at(state, neighbour)
+            if barrier is None:
+                result.append((leaving - position + neighbour,
+                               MOVE + action))
+                continue
+            bit, color = barrier
+            offset = self._offsets[color]
+            if (state >> offset) & self._masks[color]:
+                result.append(((state - (1 << offset) | bit)
+                               + ((action + 1) << self._pending_shift),
+                               USE_GEM + action))
+        if pending:
+            return result
+        gems = self._gems.get(position)
+        if gems and not state & gems[0]:
+            result.append(((state | gems[0]) + gems[1], PICKUP))
+        return result
+
+    def enemy(self, before, after):
+        """
+        Returns name, health and power of enemy killed between states.
+        """
+        for bit, name, health, power in self._enemy_list:
+            if after & bit and not before & bit:
+                return name, health, power
+        raise SolverError('No enemy was killed')
+
+
+_model = None
+_table = None
+_remember = False
+
+
+def _init_worker(model, table):
+    global _model, _table
+    _model = model
+    _table = table
+
+
+def _start_worker():
+    # forked worker has its own copy of the table,
+    # states it found are added there so that they are not sent again
+    global _remember
+    _remember = True
+
+
+def _expand(states):
+    """
+    Returns list of (state, child, command) for children of given states
+    which are not in transposition table yet.
+    """
+    table = _table
+    found = {}
+    for state in states:
+        for child, command in _model.successors(state):
+            if child not in table and child not in found:
+                found[child] = state, command
+    if _remember:
+        table.update(found)
+    return [(state, child, command)
+            for child, (state, command) in found.items()]
+
+
+class Solution:
+    """
+    Class Solution. Contains attributes:
+    :param commands: commands which win the game
+    :type commands: list
+    :param par: number of commands without added rests
+    :type par: int
+    :param states: number of states seen by search
+    :type states: int
+    :param verified: True if Player won by playing commands
+    :type verified: bool
+    """
+    def __init__(self, commands, par, states, verified):
+        self.commands = commands
+        self.par = par
+        self.states = states
+        self.verified = verified
+
+
+def _commands(model, path, health, base_health):
+    commands = []
+    for before, after, command in path:
+        if command < USE_GEM:
+            commands.append(f'move {DIRECTIONS[command - MOVE]}')
+        elif command < PICKUP:
+            commands.append(f'use gem {DIRECTIONS[command - USE_GEM]}')
+        elif command == PICKUP:
+            commands.append('pickup gems')
+        else:
+            name, enemy_health, power = model.enemy(before, after)
+            # enemy hits at most enemy_health - 1 times before it dies
+            damage = power * (enemy_health - 1)
+            if damage >= health and health < base_health:
+                commands.append('rest')
+                health = base_health
+            health = max(0, health - damage)
+            commands.append(f'fight {name.lower()}')
+    return commands
+
+
+def solve(path, processes=None, max_states=1000000, chunk_size=2048,
+          seed=0):
+    """
+    Returns Solution with the shortest list of commands which wins
+    the game saved in json file, or None if the game cannot be won.
+    Raises SolverError if more than max_states states would be seen.
+    With processes=1 search runs in this process.
+    """
+    player = FileHandler().read_from_json(path)
+    model = Model(player)
+    if not model.is_beatable():
+        return None
+    start = model.start()
+    table = {start: None}
+    level = [start]
+    goal = start if model.is_won(start) else None
+    if processes is None:
+        processes = os.cpu_count() or 1
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        processes = 1
+    _init_worker(model, table)
+    pool = None
+    try:
+        while level and goal is None:
+            chunks = [level[index:index + chunk_size]
+                      for index in range(0, len(level), chunk_size)]
+            if processes > 1 and len(chunks) >= processes:
+                if pool is None:
+                    context = multiprocessing.get_context('fork')
+                    pool = ProcessPoolExecutor(processes, context,
+                                               initializer=_start_worker)
+                results = list(pool.map(_expand, chunks))
+            else:
+                results = map(_expand, chunks)
+            level = []
+            for expanded in results:
+                for state, child, command in expanded:
+                    if child in table:
+                        continue
+                    table[child] = (state, command)
+                    if model.is_won(child):
+                        goal = child
+                        break
+                    level.append(child)
+                if goal is not None:
+                    break
+            if len(table) > max_states:
+                raise SolverError(f'More than {max_states} states')
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    if goal is None:
+        return None
+    steps = []
+    state = goal
+    while table[state] is not None:
+        parent, command = table[state]
+        steps.append((parent, state, command))
+        state = parent
+    steps.reverse()
+    commands = _commands(model, steps, player.health(), player.health())
+    result = harness.run(path, commands, seed)
+    return Solution(commands, len(steps), len(table),
+                    result.outcome == 'won')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Finds shortest win')
+    parser.add_argument('path', help='json save file')
+    parser.add_argument('--processes', type=int)
+    parser.add_argument('--max-states', type=int, default=1000000)
+    args = parser.parse_args()
+    solution = solve(args.path, args.processes, args.max_states)
+    if solution is None:
+        print('Game cannot be won')
+        return 1
+    for command in solution.commands:
+        print(command)
+    print(f'Par: {solution.par}, states: {solution.states},'
+          f' verified: {solution.verified}')
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
@@ -0,0 +1,30 @@
+from benchmark import write_world, run, compare, describe, OPERATIONS
+from classes import FileHandler
+import pytest
+
+
+def test_write_world(tmp_path):
+    path = str(tmp_path / 'world.json')
+    write_world(path, 5, seed=1)
+    player = FileHandler().read_from_json(path)
+    assert player.current_location() == (2, 2)
+    assert len(list(player.locations().cells())) == 25
+
+
+def test_run_and_compare():
+    results = run(sizes=[10], repeat=1)
+    assert set(results['results']) == set(OPERATIONS)
+    for sizes in results['results'].values():
+        assert sizes['10']['time'] >= 0
+        assert sizes['10']['peak'] >= 0
+    assert compare(results, results) == []
+    slower = {'results': {'move': {'10': {'time': 1.0, 'peak': 0}}}}
+    faster = {'results': {'move': {'10': {'time': 0.5, 'peak': 0}}}}
+    assert compare(slower, faster, threshold=0.5) == [('move', 10, 2.0)]
+    assert compare(faster, slower) == []
+    assert '0.50x' in describe(faster, slower)
+
+
+def test_run_too_small():
+    with pytest.raises(ValueError):
+        run(sizes=[2])
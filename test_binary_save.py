@@ -0,0 +1,87 @@
+from binary_save import (
+    BinarySave,
+    BinarySaveError,
+    binary_to_json,
+    json_to_binary,
+    write
+)
+import io
+import json
+import pytest
+
+
+def locations():
+    return [
+        {'x': 1, 'y': 0, 'name': 'B', 'description': None, 'barrier': 1,
+         'barrier_color': 'red', 'enemies': [], 'gems': []},
+        {'x': 0, 'y': 2, 'name': 'A', 'description': 'Ogórek', 'barrier': 0,
+         'barrier_color': 'green',
+         'enemies': [{'name': 'Orc', 'health': 5, 'power': 3}],
+         'gems': [{'name': 'red gem', 'color': 'red'}]}
+    ]
+
+
+def player():
+    return {'name': 'Jurek', 'current_location': '0,2', 'power': 5,
+            'health': 100,
+            'equipment': [{'name': 'green gem', 'color': 'green'}]}
+
+
+def save_bytes():
+    file_handle = io.BytesIO()
+    write(file_handle, 3, [player()], locations())
+    return file_handle.getvalue()
+
+
+def test_write_and_read():
+    save = BinarySave(save_bytes())
+    assert save.map_size() == 3
+    assert save.location_count() == 2
+    assert save.players() == [player()]
+    assert [loc['name'] for loc in save.locations()] == ['A', 'B']
+    assert save.location(0, 2) == locations()[1]
+    assert save.location(1, 0) == locations()[0]
+
+
+def test_location_missing():
+    save = BinarySave(save_bytes())
+    assert save.location(2, 2) is None
+    assert save.location_index(0, 0) is None
+    assert save.location_index(1, 0) == 1
+
+
+def test_strings_are_stored_once():
+    many = [{'x': 0, 'y': y, 'name': 'Forest', 'description': 'Trees.',
+             'barrier': 0, 'barrier_color': 'green', 'enemies': [],
+             'gems': []} for y in range(100)]
+    file_handle = io.BytesIO()
+    write(file_handle, 100, [player()], many)
+    assert len(file_handle.getvalue()) < 100 * 48 + 300
+
+
+def test_not_a_save():
+    with pytest.raises(BinarySaveError):
+        BinarySave(b'x' * 200)
+    with pytest.raises(BinarySaveError):
+        BinarySave(b'TGSB')
+
+
+def test_convert_json_to_binary_and_back(tmp_path):
+    binary_path = tmp_path / 'save.bin'
+    json_path = tmp_path / 'save.json'
+    json_to_binary('json_files/test_init.json', binary_path)
+    with BinarySave(binary_path) as save:
+        assert save.location(0, 1)['enemies'][0]['name'] == 'Hydra'
+        assert save.players()[0]['name'] == 'Jurek Ogórek'
+    binary_to_json(binary_path, json_path)
+    with open('json_files/test_init.json') as file_handle:
+        expected = json.load(file_handle)
+    with open(json_path) as file_handle:
+        assert json.load(file_handle) == expected
+
+
+def test_convert_missing_key(tmp_path):
+    path = tmp_path / 'broken.json'
+    path.write_text('{"map_size": 1, "player": [{"name": "A"}]}')
+    with pytest.raises(KeyError, match='Missing key in file'):
+        json_to_binary(path, tmp_path / 'broken.bin')
@@ -1,4 +1,6 @@
 from classes import Player, Enemy, Gem, Location, Game, FileHandler
+from classes import EnemyRegistry, World, VOID, Journal, PagedWorld, Inventory
+from classes import OverlayWorld, FrozenWorldError, COMMANDS
 from classes import (
     NegativePowerError,
     NameError,
@@ -6,6 +8,11 @@ from classes import (
     NegativeHealthError,
     NegativeDamageError
 )
+from validation import SaveValidationError
+import io
+import random
+import os
+import threading
 import pytest
 
 
@@ -16,6 +23,91 @@ def test_create_player():
     assert player.health() == 100
 
 
+def test_stream_from_json():
+    player = FileHandler().stream_from_json('json_files/test_init.json')
+    expected = FileHandler().read_from_json('json_files/test_init.json')
+    assert player.name() == expected.name()
+    assert player.current_location() == expected.current_location()
+    assert player.power() == 5
+    assert player.health() == 100
+    assert player.equipment()[0].color() == 'green'
+    for x in range(3):
+        for y in range(3):
+            loc = player.locations()[x][y]
+            assert loc.name() == expected.locations()[x][y].name()
+            assert loc.barrier() == expected.locations()[x][y].barrier()
+    assert player.locations()[0][1].enemies()[1].name() == 'Orc'
+    assert player.locations()[0][1].items()[1].color() == 'red'
+
+
+def test_stream_from_json_file_object_small_chunks():
+    with open('json_files/test_init.json') as file_handle:
+        text = file_handle.read()
+    player = FileHandler().stream_from_json(io.StringIO(text), chunk_size=7)
+    assert player.look_around() == FileHandler().read_from_json(
+        'json_files/test_init.json').look_around()
+
+
+def test_stream_from_json_locations_before_map_size():
+    text = ('{"player": [{"name": "A", "current_location": "0,0", '
+            '"power": 1, "health": 2, "equipment": [], "locations": ['
+            '{"x": 0, "y": 0, "name": "Only", "description": "", '
+            '"barrier": 0, "barrier_color": "red", "enemies": [], '
+            '"gems": []}]}], "map_size": 1}')
+    player = FileHandler().stream_from_json(io.StringIO(text))
+    assert player.locations()[0][0].name() == 'Only'
+
+
+def test_stream_from_json_pipe():
+    with open('json_files/test_init.json', 'rb') as file_handle:
+        data = file_handle.read()
+    read_fd, write_fd = os.pipe()
+
+    def write():
+        with os.fdopen(write_fd, 'wb') as pipe:
+            pipe.write(data)
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    with os.fdopen(read_fd, 'rb') as pipe:
+        player = FileHandler().stream_from_json(pipe, chunk_size=64)
+    writer.join()
+    assert player.did_win() is not True
+    assert player.enemy_registry().count() == 2
+
+
+def test_stream_from_json_missing_key():
+    text = ('{"map_size": 1, "player": [{"name": "A", '
+            '"current_location": "0,0", "power": 1, "health": 2, '
+            '"equipment": [], "locations": [{"x": 0, "y": 0, '
+            '"name": "Only", "barrier": 0, "barrier_color": "red", '
+            '"enemies": [], "gems": []}]}]}')
+    with pytest.raises(KeyError, match='Missing key in file'):
+        FileHandler().stream_from_json(io.StringIO(text))
+
+
+def test_stream_from_json_missing_player_key():
+    text = '{"map_size": 1, "player": [{"name": "A", "locations": []}]}'
+    with pytest.raises(KeyError, match='Missing key in file'):
+        FileHandler().stream_from_json(io.StringIO(text))
+
+
+def test_save_and_read_binary(tmp_path):
+    path = tmp_path / 'save.bin'
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+    player.pickup_gems()
+    FileHandler().save_to_binary(path, player)
+    loaded = FileHandler().read_from_binary(path)
+    assert loaded.name() == 'Jurek Ogórek'
+    assert loaded.current_location() == (0, 1)
+    assert [gem.color() for gem in loaded.equipment()] == [
+        'green', 'green', 'red'
+    ]
+    assert loaded.look_around() == player.look_around()
+    assert loaded.enemy_registry().count() == 2
+
+
 def test_create_player_with_negative_power():
     with pytest.raises(NegativePowerError):
         Player('Jurek Ogórek', power = -1)
@@ -375,6 +467,42 @@ def test_did_win_killed_enemies():
     assert player.did_win() is True
 
 
+def test_enemy_registry_counts():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    registry = player.enemy_registry()
+    assert registry.count() == 2
+    assert registry.count_at((0, 1)) == 2
+    assert registry.count_at((1, 1)) == 0
+    assert registry.count_named('Hydra') == 1
+    assert registry.count_named('Elf') == 0
+
+
+def test_enemy_registry_updated_after_fight(monkeypatch):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+
+    def return_10(t, d):
+        return 10
+
+    monkeypatch.setattr('classes.randint', return_10)
+    player.fight('Hydra')
+    registry = player.enemy_registry()
+    assert registry.count() == 1
+    assert registry.count_at((0, 1)) == 1
+    assert registry.count_named('Hydra') == 0
+    assert list(registry.positions()) == [(0, 1)]
+
+
+def test_enemy_registry_empty_map():
+    registry = EnemyRegistry()
+    assert registry.count() == 0
+    registry.add((0, 0), 'Orc')
+    assert registry.count() == 1
+    registry.remove((0, 0), 'Orc')
+    assert registry.count() == 0
+    assert registry.count_at((0, 0)) == 0
+
+
 def test_rest():
     player = FileHandler().read_from_json('json_files/test_init.json')
     assert player.health() == 100
@@ -413,6 +541,13 @@ def test_action_move_too_long():
     assert player.action('move north fast') == 'Invalid action.'
 
 
+def test_action_too_short():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    for action in ['', '   ', 'look', 'use', 'use gem', 'show', 'enemy info',
+                   'fight', 'quick fight']:
+        assert player.action(action) == 'Invalid action.'
+
+
 def test_action_use_gem():
     player = FileHandler().read_from_json('json_files/test_init.json')
     assert player.action('use gem east') == '\n\t\tYou used gem and removed barrier.\n'
@@ -485,36 +620,35 @@ def test_action_enemy_info():
     assert player.action('enemy info Hydra') == f'{name}{health}{power}'
 
 
+HELP_LINES = [
+    "'show equipment' - shows player's current equipment",
+    "'show stats' - shows player's current stats",
+    "'pickup gems' - pickups all gems from current location",
+    "'use gem (direction)' - uses proper gem from equipment and removes"
+    " barrier",
+    "'look around' - shows info about current location",
+    "'move (direction)' - moves player to new location",
+    "'travel to (location or x,y)' - moves player by the shortest way",
+    "'fight (enemy)' - player fights with chosen enemy",
+    "'quick fight (enemy)' - fights with chosen enemy, shows only result",
+    "'predict fight (enemy)' - predicts result of fight with chosen enemy",
+    "'rest' - restores player's health",
+    "'enemy info (enemy)' - shows info about enemy",
+    "'save (path to file)' - saves game to chosen file",
+    "'stats perf' - shows latency of commands and operations",
+    "'stats perf json' - shows latency measurements as json",
+    "'stats perf profile (command)' - profiles chosen command, 'off' stops"
+    " and 'report' shows profile",
+    "'help' - shows list of commands",
+    "'exit' - closes the game",
+]
+
+
 def test_action_help():
     player = FileHandler().read_from_json('json_files/test_init.json')
-    se = "'show equipment' - shows player's current equipment"
-    ss = "'show stats' - shows player's current stats"
-    pg = "'pickup gems' - pickups all gems from current location"
-    ug = ("'use gem (direction)' - uses proper gem from equipment"
-            + "and removes barrier")
-    la = "'look around' - shows info about current location"
-    mo = "'move (direction)' - moves player to new location"
-    fi = "'fight (enemy)' - player fights with chosen enemy"
-    re = "'rest' - restores player's health"
-    en = "'enemy info (enemy)' - shows info about enemy"
-    save = "'save (path to file)' - saves game to chosen file"
-    exit = "'exit' - closes the game"
-    help = "'help' - shows list of commends"
-    assert player.action('help') == f"""
-        \tList of commands:
-        \t{se}
-        \t{ss}
-        \t{pg}
-        \t{ug}
-        \t{la}
-        \t{mo}
-        \t{fi}
-        \t{re}
-        \t{en}
-        \t{save}
-        \t{exit}
-        \t{help}
-        """
+    lines = ''.join(f'        \t{line}\n' for line in HELP_LINES)
+    assert player.action('help') == (f'\n        \tList of commands:\n'
+                                     f'{lines}        ')
 
 
 def test_action_save():
@@ -538,34 +672,14 @@ def test_action_invalid():
 
 def test_help():
     player = FileHandler().read_from_json('json_files/test_init.json')
-    se = "'show equipment' - shows player's current equipment"
-    ss = "'show stats' - shows player's current stats"
-    pg = "'pickup gems' - pickups all gems from current location"
-    ug = ("'use gem (direction)' - uses proper gem from equipment"
-            + "and removes barrier")
-    la = "'look around' - shows info about current location"
-    mo = "'move (direction)' - moves player to new location"
-    fi = "'fight (enemy)' - player fights with chosen enemy"
-    re = "'rest' - restores player's health"
-    en = "'enemy info (enemy)' - shows info about enemy"
-    save = "'save (path to file)' - saves game to chosen file"
-    exit = "'exit' - closes the game"
-    help = "'help' - shows list of commends"
-    assert player.help() == f"""
-        \tList of commands:
-        \t{se}
-        \t{ss}
-        \t{pg}
-        \t{ug}
-        \t{la}
-        \t{mo}
-        \t{fi}
-        \t{re}
-        \t{en}
-        \t{save}
-        \t{exit}
-        \t{help}
-        """
+    assert player.help().split('\n')[2:-1] == [
+        f'        \t{line}' for line in HELP_LINES]
+
+
+def test_help_lists_every_command():
+    help = Player('A').help()
+    for command in COMMANDS.commands():
+        assert f"'{command.usage()}' - {command.description}" in help
 
 
 def test_info():
@@ -746,3 +860,761 @@ def test_game_create_default_enemies():
     assert orc.name() == 'Orc'
     assert orc.health() == 5
     assert orc.power() == 5
+
+
+def test_world_get_and_put():
+    world = World(10000, chunk_size=16)
+    location = Location('Island', '', 0, 'green', [], [], 5000, 17)
+    world.put(5000, 17, location)
+    assert world[5000][17] is location
+    assert world.get(5000, 17) is location
+    assert world[5000][18] is VOID
+    assert world[0][0] is VOID
+    assert world.chunk_count() == 1
+    assert len(world) == 10000
+
+
+def test_world_outside_of_map():
+    world = World(3)
+    assert world[-1][0] is VOID
+    assert world[3][1] is VOID
+    with pytest.raises(IndexError):
+        world.put(3, 0, Location('Nowhere'))
+
+
+def test_world_chunk_size_power_of_2():
+    with pytest.raises(ValueError):
+        World(10, chunk_size=10)
+
+
+def test_world_cells_row_by_row():
+    world = World(10, chunk_size=4)
+    for x, y in [(9, 1), (0, 9), (0, 0), (5, 5), (0, 3)]:
+        world[x][y] = Location(f'{x}{y}')
+    assert [(x, y) for x, y, _ in world.cells()] == [
+        (0, 0), (0, 3), (0, 9), (5, 5), (9, 1)
+    ]
+
+
+def test_world_from_rows():
+    rows = [[Location('A'), 1], [2, Location('B')]]
+    world = World.from_rows(rows)
+    assert world[0][0].name() == 'A'
+    assert world[0][1] is VOID
+    assert world[1][1].name() == 'B'
+
+
+def test_move_into_void():
+    world = World(2)
+    world.put(0, 0, Location('A', '', 0, 'green', [], []))
+    player = Player('Jurek', (0, 0), world, 5, 100, [])
+    assert player.move('east') == '\n\t\tCannot go east\n'
+    assert player.move('south') == '\n\t\tCannot go south\n'
+    assert player.current_location() == (0, 0)
+    assert 'To the east you see Sea East. ' in player.look_around()
+
+
+def test_use_gem_on_void():
+    world = World(2)
+    world.put(0, 0, Location('A', '', 0, 'green', [], []))
+    player = Player('Jurek', (0, 0), world, 5, 100, [Gem('gem', 'green')])
+    assert player.use_gem('east') == '\n\t\tYou do not have proper gem to remove this barrier.\n'
+    assert world[0][1] is VOID
+    assert world[0][1].barrier() == 1
+
+
+def play_and_compare(tmp_path, threshold=1 << 20):
+    path = str(tmp_path / 'game.json')
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    journal = Journal(path, threshold)
+    journal.attach(player)
+    assert player.action(f'save {path}') == f'\n\t\tsaved to {path}\n'
+    snapshot_size = os.path.getsize(path)
+    player.use_gem('east')
+    player.move('north')
+    player.pickup_gems()
+    player.fight('Orc')
+    player.attack('Hydra')
+    player.take_damage(3)
+    player.action(f'save {path}')
+    loaded = Journal(path).load()
+    assert loaded.current_location() == player.current_location()
+    assert loaded.health() == player.health()
+    assert loaded.look_around() == player.look_around()
+    assert loaded.show_equipment() == player.show_equipment()
+    assert loaded.enemy_info('Hydra') == player.enemy_info('Hydra')
+    assert loaded.enemy_registry().count() == 1
+    assert loaded.locations()[1][2].barrier() == player.locations()[1][2].barrier()
+    assert loaded.journal() is not None
+    return path, snapshot_size
+
+
+def test_journal_appends_changes(tmp_path):
+    path, snapshot_size = play_and_compare(tmp_path)
+    assert os.path.getsize(path) == snapshot_size
+    with open(f'{path}.journal') as file_handle:
+        lines = file_handle.readlines()
+    assert len(lines) > 1
+    assert '"pickup", 0, 1' in ''.join(lines)
+
+
+def test_journal_compacts_above_threshold(tmp_path):
+    path, snapshot_size = play_and_compare(tmp_path, threshold=10)
+    with open(f'{path}.journal') as file_handle:
+        assert len(file_handle.readlines()) == 1
+
+
+def test_journal_load_continues_recording(tmp_path):
+    path, _ = play_and_compare(tmp_path)
+    loaded = Journal(path).load()
+    loaded.move('south')
+    loaded.action(f'save {path}')
+    again = Journal(path).load()
+    assert again.current_location() == (1, 1)
+
+
+def test_journal_ignores_stale_journal(tmp_path):
+    path, _ = play_and_compare(tmp_path)
+    with open(f'{path}.journal') as file_handle:
+        stale = file_handle.read()
+    player = Journal(path).load()
+    player.journal().snapshot(player)
+    with open(f'{path}.journal', 'w') as file_handle:
+        file_handle.write(stale)
+    loaded = Journal(path).load()
+    assert loaded.current_location() == player.current_location()
+    assert loaded.show_equipment() == player.show_equipment()
+
+
+def test_save_without_journal_writes_json(tmp_path):
+    path = str(tmp_path / 'plain.json')
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.action(f'save {path}')
+    assert not os.path.exists(f'{path}.journal')
+
+
+def open_world(size):
+    world = World(size)
+    for x in range(size):
+        for y in range(size):
+            gems = [Gem('red gem', 'red')] if (x, y) == (0, 1) else []
+            enemies = [Enemy('Orc', 5, 1)] if (x, y) == (0, 2) else []
+            world.put(x, y, Location(f'{x},{y}', '', 0, 'green', enemies,
+                                     gems, x, y))
+    return world
+
+
+def test_paged_world_reads_locations_lazily(tmp_path):
+    path = str(tmp_path / 'world.bin')
+    player = Player('Jurek', (0, 0), open_world(40), 5, 100, [])
+    FileHandler().save_to_binary(path, player)
+    loaded = FileHandler().read_from_binary(path, lazy=True, cache_size=16)
+    world = loaded.locations()
+    assert isinstance(world, PagedWorld)
+    assert world.cached_count() == 0
+    assert loaded.did_win() is False
+    assert world.cached_count() == 0
+    assert loaded.look_around() == player.look_around()
+    assert world.cached_count() == 3
+    assert world[39][39].name() == '39,39'
+    assert world[40][0] is VOID
+
+
+def test_paged_world_keeps_changed_locations(tmp_path):
+    path = str(tmp_path / 'world.bin')
+    FileHandler().save_to_binary(path, Player('Jurek', (0, 0),
+                                              open_world(40), 5, 100, []))
+    player = FileHandler().read_from_binary(path, lazy=True, cache_size=16)
+    world = player.locations()
+    player.move('east')
+    player.pickup_gems()
+    for _ in range(30):
+        player.move('south')
+    assert world.cached_count() <= 17
+    assert not world[0][1].items()
+    assert len(player.equipment()) == 1
+    assert [(x, y) for x, y, _ in world.cells()][:3] == [(0, 0), (0, 1), (0, 2)]
+    FileHandler().save_to_binary(path, player)
+    reloaded = FileHandler().read_from_binary(path, lazy=True)
+    assert not reloaded.locations()[0][1].items()
+    assert reloaded.current_location() == (30, 1)
+
+
+def test_paged_world_enemy_registry(tmp_path, monkeypatch):
+    path = str(tmp_path / 'world.bin')
+    FileHandler().save_to_binary(path, Player('Jurek', (0, 2),
+                                              open_world(20), 5, 100, []))
+    player = FileHandler().read_from_binary(path, lazy=True)
+    assert player.enemy_registry().count() == 1
+
+    def return_5(t, d):
+        return 5
+
+    monkeypatch.setattr('classes.randint', return_5)
+    player.fight('Orc')
+    assert player.did_win() is True
+    assert player.enemy_registry().count_at((0, 2)) == 0
+    assert player.enemy_registry().count_named('Orc') == 0
+
+
+def test_paged_world_cache_size():
+    with pytest.raises(ValueError):
+        PagedWorld('json_files/test_init.json', cache_size=1)
+
+
+def test_entities_have_no_instance_dict():
+    for item in [Location('A'), Enemy('Orc', 1, 1), Gem('gem', 'red'),
+                 Player('Jurek'), VOID]:
+        assert not hasattr(item, '__dict__')
+
+
+def test_location_shares_empty_collections():
+    first = Location('A', '', 0, 'red', [], [])
+    second = Location('B')
+    assert first._enemies is second._enemies
+    assert first.items() is second.items()
+    assert len(first.items()) == 0
+
+
+def test_loaded_strings_are_shared():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    first = player.locations()[0][0].barrier_color()
+    second = player.locations()[0][2].barrier_color()
+    assert first is second
+
+
+def test_inventory_list_view():
+    inventory = Inventory([Gem('a', 'green'), Gem('b', 'red'),
+                           Gem('c', 'green')])
+    assert len(inventory) == 3
+    assert [gem.name() for gem in inventory] == ['a', 'b', 'c']
+    assert inventory[1].name() == 'b'
+    assert inventory[-1].name() == 'c'
+    assert [gem.name() for gem in inventory[:2]] == ['a', 'b']
+    with pytest.raises(IndexError):
+        inventory[3]
+
+
+def test_inventory_take_one_gem():
+    inventory = Inventory([Gem('a', 'green'), Gem('b', 'green')])
+    assert inventory.has('green')
+    assert inventory.take('green').color() == 'green'
+    assert inventory.color_count('green') == 1
+    assert inventory.take('red') is None
+    inventory.take('green')
+    assert not inventory.has('green')
+    assert len(inventory) == 0
+
+
+def test_inventory_take_from_location():
+    location = Location('A', '', 0, 'red', [], [Gem('a', 'red'),
+                                                Gem('b', 'blue')])
+    inventory = Inventory()
+    assert inventory.take_from(location) == 2
+    assert not location.items()
+    assert inventory.color_counts() == {'red': 1, 'blue': 1}
+
+
+def test_inventory_keeps_pickup_order():
+    player = Player('A', (0, 0), [[Location('A', '', 0, '', [], [
+        Gem('red gem', 'red'), Gem('blue gem', 'blue')])]], 5, 5,
+        [Gem('green gem', 'green')])
+    player.equipment().append(Gem('second green gem', 'green'))
+    player.pickup_gems()
+    player.equipment().take('blue')
+    player.equipment().append(Gem('second red gem', 'red'))
+    names = ['green gem', 'second green gem', 'red gem', 'second red gem']
+    expected = f'\n\t\tYou have {", ".join(names)}\n'
+    assert player.show_equipment() == expected
+    saved = FileHandler().save_data(player)['player'][0]['equipment']
+    assert [gem['name'] for gem in saved] == names
+
+
+def test_inventory_remove():
+    gem = Gem('a', 'red')
+    inventory = Inventory([gem])
+    inventory.remove(gem)
+    assert len(inventory) == 0
+    with pytest.raises(ValueError):
+        inventory.remove(gem)
+
+
+def test_use_gem_consumes_one_gem():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.equipment().append(Gem('green gem', 'green'))
+    assert player.use_gem('east') == '\n\t\tYou used gem and removed barrier.\n'
+    assert len(player.equipment()) == 1
+
+
+def test_players_do_not_share_default_equipment():
+    first = Player('A')
+    first.equipment().append(Gem('a', 'red'))
+    assert len(Player('B').equipment()) == 0
+
+
+def horde():
+    return Location('Camp', '', 0, 'red', [Enemy('Orc', 5, 1),
+                                          Enemy('Goblin', 3, 1),
+                                          Enemy('Orc', 7, 1)], [])
+
+
+def test_location_find_enemy():
+    location = horde()
+    assert location.find_enemy('Orc').health() == 5
+    assert location.find_enemy('Orc 1').health() == 5
+    assert location.find_enemy('Orc 2').health() == 7
+    assert location.find_enemy('Orc 3') is None
+    assert location.find_enemy('Orc 0') is None
+    assert location.find_enemy('Elf') is None
+    assert location.enemy_count('Orc') == 2
+    assert location.enemy_count() == 3
+
+
+def test_location_find_enemy_with_number_in_name():
+    location = Location('Camp', '', 0, 'red', [Enemy('Orc 2', 1, 1),
+                                              Enemy('Orc', 2, 1)], [])
+    assert location.find_enemy('Orc 2').health() == 1
+
+
+def test_location_remove_enemy():
+    location = horde()
+    first = location.find_enemy('Orc')
+    location.remove_enemy(first)
+    assert location.find_enemy('Orc').health() == 7
+    assert location.find_enemy('Orc 2') is None
+    assert [enemy.name() for enemy in location.enemies()] == ['Goblin', 'Orc']
+    assert location.enemy_at(1).health() == 7
+    assert location.enemy_index(location.find_enemy('Goblin')) == 0
+    with pytest.raises(ValueError):
+        location.remove_enemy(first)
+
+
+def test_location_remove_last_enemy():
+    location = Location('Camp', '', 0, 'red', [Enemy('Orc', 5, 1)], [])
+    location.remove_enemy(location.find_enemy('Orc'))
+    assert location.enemies() == []
+    assert location.find_enemy('Orc') is None
+    location.add_enemy(Enemy('Elf', 1, 1))
+    assert location.find_enemy('Elf').name() == 'Elf'
+
+
+def test_fight_numbered_enemy(monkeypatch):
+    world = World(1)
+    world.put(0, 0, horde())
+    player = Player('Jurek', (0, 0), world, 5, 100, [])
+
+    def return_10(t, d):
+        return 10
+
+    monkeypatch.setattr('classes.randint', return_10)
+    assert player.action('fight orc 2') == '\n\t\tOrc lost 10 points of health. Orc has 0 points of health left.\n\n\t\tOrc died.\n'
+    assert world[0][0].find_enemy('Orc').health() == 5
+    assert world[0][0].find_enemy('Orc 2') is None
+    assert player.enemy_registry().count_named('Orc') == 1
+
+
+def boss_fight_player(seed):
+    world = World(1)
+    world.put(0, 0, Location('Lair', '', 0, 'red',
+                             [Enemy('Dragon', 400, 3), Enemy('Rat', 1, 1)],
+                             []))
+    random.seed(seed)
+    return Player('Jurek', (0, 0), world, 5, 150, [])
+
+
+def test_fight_summary_matches_full_fight():
+    for seed in range(20):
+        full = boss_fight_player(seed)
+        full.fight('Dragon')
+        after_full = random.random()
+        summary = boss_fight_player(seed)
+        summary.fight('Dragon', log='summary')
+        assert random.random() == after_full
+        assert summary.health() == full.health()
+        assert summary.enemy_info('Dragon') == full.enemy_info('Dragon')
+        assert (summary.enemy_registry().count()
+                == full.enemy_registry().count())
+
+
+def test_fight_summary(monkeypatch):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+
+    def return_5(t, d):
+        return 5
+
+    monkeypatch.setattr('classes.randint', return_5)
+    assert player.fight('Hydra', log='summary') == '\n\t\tHydra died after 2 rounds. You have 95 points of health left.\n'
+    assert player.enemy_registry().count_named('Hydra') == 0
+    player.set_health(5)
+    assert player.action('quick fight orc') == '\n\t\tOrc died after 1 round. You have 5 points of health left.\n'
+    assert player.did_win() is True
+
+
+def test_fight_summary_player_dies(monkeypatch):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+    player.set_health(5)
+
+    def return_5(t, d):
+        return 5
+
+    monkeypatch.setattr('classes.randint', return_5)
+    assert player.fight('Hydra', log='summary') == '\n\t\tYou died after 1 round. Hydra has 5 points of health left.\n'
+    assert player.health() == 0
+    assert player.locations()[0][1].find_enemy('Hydra').health() == 5
+
+
+def test_fight_stream(monkeypatch):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+
+    def return_5(t, d):
+        return 5
+
+    monkeypatch.setattr('classes.randint', return_5)
+    lines = player.fight('Hydra', log='stream')
+    assert player.locations()[0][1].find_enemy('Hydra').health() == 10
+    assert next(lines) == '\t\tHydra lost 5 points of health. Hydra has 5 points of health left.\n\n'
+    assert player.locations()[0][1].find_enemy('Hydra').health() == 5
+    assert list(lines)[-1] == '\t\tHydra died.\n'
+    assert player.enemy_registry().count_named('Hydra') == 0
+
+
+def test_fight_unknown_log_and_enemy():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+    assert player.fight('Elf', log='summary') is None
+    assert player.action('quick fight elf') == 'Invalid action.'
+    with pytest.raises(ValueError):
+        player.fight('Orc', log='short')
+
+
+def test_unreachable_travel_changes_nothing(tmp_path):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    world = player.locations()
+    player = Player('A', (1, 2), world, 5, 100, [])
+    journal = Journal(str(tmp_path / 'game.json'))
+    journal.attach(player)
+    assert player.travel('l') == '\n\t\tYou cannot get to l.\n'
+    assert world.get(1, 2).barrier() == 1
+    assert player.current_location() == (1, 2)
+    assert journal._changes == []
+    assert player.travel('s') == '\n\t\tYou travelled to S (1,1) in 1 move.\n'
+    assert world.get(1, 2).barrier() == 0
+    assert journal._changes[0] == ('barrier', 1, 2)
+
+
+def test_action_travel():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    assert player.action('travel to s') == '\n\t\tYou are already in S.\n'
+    assert player.action('travel to 1, 2') == '\n\t\tYou cannot get to 1, 2.\n'
+    assert player.action('travel to nowhere') == '\n\t\tThere is no such location.\n'
+    assert player.action('travel to 5,5') == '\n\t\tThere is no such location.\n'
+    assert player.action('travel to') == 'Invalid action.'
+    player.use_gem('east')
+    assert player.action('travel to p') == '\n\t\tYou travelled to P (1,2) in 1 move.\n'
+    assert player.action('travel to 0,1') == '\n\t\tYou travelled to GG (0,1) in 2 moves.\n'
+    assert player.current_location() == (0, 1)
+
+
+def test_world_barrier_changes_update_paths():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    world = player.locations()
+    paths = world.paths()
+    assert paths.path((1, 1), [(2, 1)]) is None
+    assert world.remove_barrier(2, 1)
+    assert not world.remove_barrier(2, 1)
+    assert paths.path((1, 1), [(2, 1)]) == [(2, 1)]
+    world.set_barrier(2, 1, 1)
+    assert paths.path((1, 1), [(2, 1)]) is None
+    world.put(2, 1, world.get(1, 1))
+    assert world.paths() is not paths
+
+
+def test_look_around_is_cached():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    first = player.look_around()
+    assert player.look_around() is first
+    assert first == player._describe_around()
+
+
+def test_look_around_cache_follows_changes(monkeypatch):
+    monkeypatch.setattr('classes.randint', lambda a, b: b)
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    before = player.look_around()
+    player.use_gem('east')
+    assert 'To the east you see P. It has no barrier.' in player.look_around()
+    assert player.look_around() != before
+    player.move('north')
+    before = player.look_around()
+    player.pickup_gems()
+    assert 'There are no gems here.' in player.look_around()
+    player.fight('Orc')
+    assert player.look_around() == player._describe_around()
+    assert 'You see Hydra.' in player.look_around()
+
+
+def test_location_version():
+    location = Location('L', '', 1, 'red', [Enemy('Orc', 5, 5)],
+                        [Gem('red gem', 'red')])
+    version = location.version()
+    location.remove_barrier()
+    location.clear_items()
+    location.remove_enemy(location.enemy_at(0))
+    assert location.version() == version + 3
+    VOID.remove_barrier()
+    assert VOID.version() == 0
+
+
+def test_can_reach_and_can_still_win():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    assert player.can_reach(0, 1)
+    assert not player.can_reach(1, 2)
+    assert player.can_still_win()
+    world = player.locations()
+    world.set_barrier(0, 1, 1)
+    assert player.can_still_win()
+    player._equipment = Inventory()
+    assert not player.can_still_win()
+    player.use_gem('east')
+    assert not player.can_reach(1, 2)
+
+
+def test_connectivity_follows_game():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    world = player.locations()
+    index = world.connectivity()
+    player.use_gem('east')
+    assert world.connectivity() is index
+    assert player.can_reach(1, 2)
+    player.move('north')
+    player.pickup_gems()
+    assert index.gems(0, 1) == {}
+
+
+def test_frozen_world_cannot_change():
+    template = FileHandler().read_template('json_files/test_init.json')
+    world = template.locations()
+    assert world.is_frozen()
+    assert world.enemy_count() == 2
+    with pytest.raises(FrozenWorldError):
+        world.remove_barrier(0, 0)
+    with pytest.raises(FrozenWorldError):
+        world.put(0, 0, Location('X'))
+    with pytest.raises(FrozenWorldError):
+        template.use_gem('east')
+
+
+def test_forks_share_template(monkeypatch):
+    monkeypatch.setattr('classes.randint', lambda a, b: b)
+    template = FileHandler().read_template('json_files/test_init.json')
+    first = template.fork()
+    second = template.fork()
+    assert first.locations().get(0, 1) is second.locations().get(0, 1)
+    first.action('use gem east')
+    first.action('move north')
+    first.action('pickup gems')
+    first.action('fight orc')
+    assert first.locations().changed_count() == 2
+    assert first.locations().get(0, 1).enemy_count() == 1
+    assert first.enemy_registry().count() == 1
+    assert second.locations().changed_count() == 0
+    assert second.locations().get(1, 2).barrier() == 1
+    assert template.locations().get(1, 2).barrier() == 1
+    assert template.locations().get(0, 1).enemy_count() == 2
+    assert len(template.locations().get(0, 1).items()) == 2
+    assert len(first.equipment()) == 2 and len(second.equipment()) == 1
+    second.action('move north')
+    assert second.locations().get(0, 1).items()
+    assert second.action('fight hydra').endswith('Hydra died.\n')
+
+
+def test_fork_does_not_freeze_players_map():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    fork = player.fork()
+    assert not player.locations().is_frozen()
+    assert fork.locations().template() is not player.locations()
+    player.action('use gem east')
+    assert player.locations().get(1, 2).barrier() == 0
+    assert fork.locations().get(1, 2).barrier() == 1
+    assert fork.action('use gem east') == ('\n\t\tYou used gem and'
+                                           ' removed barrier.\n')
+    template = FileHandler().read_template('json_files/test_init.json')
+    assert template.fork().locations().template() is template.locations()
+
+
+def test_overlay_restore():
+    template = FileHandler().read_template('json_files/test_init.json')
+    overlay = template.fork().locations()
+    overlay.restore(1, 2, Location('Changed', '', 0, 'green', [], [], 1, 2))
+    overlay.restore(1, 2, Location('Again', '', 0, 'green', [], [], 1, 2))
+    assert overlay.get(1, 2).name() == 'Again'
+    assert overlay.changed_count() == 1
+    assert template.locations().get(1, 2).barrier() == 1
+    with pytest.raises(ValueError):
+        overlay.restore(5, 5, Location('Outside'))
+
+
+def test_overlay_cells_merge_with_template():
+    template = FileHandler().read_template('json_files/test_init.json')
+    player = template.fork()
+    player.action('use gem east')
+    overlay = player.locations()
+    assert [(x, y) for x, y, _ in overlay.overlay_cells()] == [(1, 2)]
+    cells = list(overlay.cells())
+    assert [(x, y) for x, y, _ in cells] == [
+        (x, y) for x, y, _ in template.locations().cells()]
+    assert cells[5][2] is overlay.get(1, 2)
+    assert cells[4][2] is template.locations().get(1, 1)
+
+
+def test_save_overlay_and_full(tmp_path, monkeypatch):
+    monkeypatch.setattr('classes.randint', lambda a, b: b)
+    template = FileHandler().read_template('json_files/test_init.json')
+    player = template.fork()
+    for command in ('use gem east', 'move north', 'pickup gems',
+                    'fight orc'):
+        player.action(command)
+    FileHandler().save_overlay(str(tmp_path / 'overlay.json'), player)
+    FileHandler().save_to_json(str(tmp_path / 'full.json'), player)
+    loaded = FileHandler().read_overlay(str(tmp_path / 'overlay.json'),
+                                        template.locations())
+    full = FileHandler().read_from_json(str(tmp_path / 'full.json'))
+    assert loaded.locations().changed_count() == 2
+    assert loaded.current_location() == (0, 1)
+    assert loaded.enemy_registry().count() == 1
+    assert (FileHandler().save_data(loaded)
+            == FileHandler().save_data(full)
+            == FileHandler().save_data(player))
+
+
+def test_read_overlay_checks_template(tmp_path):
+    template = FileHandler().read_template('json_files/test_init.json')
+    player = template.fork()
+    player._current_location = (5, 5)
+    FileHandler().save_overlay(str(tmp_path / 'overlay.json'), player)
+    with pytest.raises(SaveValidationError):
+        FileHandler().read_overlay(str(tmp_path / 'overlay.json'),
+                                   template.locations())
+    with pytest.raises(SaveValidationError):
+        FileHandler().read_overlay(str(tmp_path / 'overlay.json'),
+                                   OverlayWorld(World(4)))
+
+
+def shared_players():
+    world = FileHandler().read_from_json(
+        'json_files/test_init.json').locations()
+    first = Player('Ala', (1, 1), world, 5, 100, [])
+    second = Player('Ola', (1, 1), world, 5, 100, [])
+    return world, first, second
+
+
+def test_occupancy_follows_players():
+    world, first, second = shared_players()
+    assert world.player_count(1, 1) == 3
+    first.action('move north')
+    assert world.players_at(0, 1) == [first]
+    assert world.player_count(1, 1) == 2
+    first.action('travel to 1,1')
+    assert world.player_count(0, 1) == 0
+    assert world.player_count(1, 1) == 3
+
+
+def test_look_around_reports_players():
+    world, first, second = shared_players()
+    world.remove_player(world.players_at(1, 1)[0], 1, 1)
+    assert 'Players nearby' not in Player(
+        'Solo', (2, 2), World(3), 5, 100, []).look_around()
+    first.action('move north')
+    assert first.look_around().endswith('\t\tPlayers nearby: Ola (south).\n')
+    assert second.look_around().endswith(
+        '\t\tPlayers nearby: Ala (north).\n')
+    second.action('move north')
+    assert first.look_around().endswith('\t\tPlayers nearby: Ola (here).\n')
+
+
+def test_shared_enemy_and_registry(monkeypatch):
+    monkeypatch.setattr('classes.randint', lambda a, b: b)
+    world, first, second = shared_players()
+    first.action('move north')
+    second.action('move north')
+    stream = first.fight('Hydra', log='stream')
+    next(stream)
+    assert second.action('quick fight hydra').startswith('\n\t\tHydra died')
+    assert list(stream) == ['\t\tHydra was killed by someone else.\n']
+    assert first.enemy_registry() is second.enemy_registry()
+    second.action('quick fight orc')
+    assert first.did_win() and second.did_win()
+
+
+def test_save_and_read_players(tmp_path):
+    world, first, second = shared_players()
+    world.remove_player(world.players_at(1, 1)[0], 1, 1)
+    first.action('move north')
+    path = str(tmp_path / 'players.json')
+    FileHandler().save_players(path, [first, second])
+    loaded = FileHandler().read_players(path)
+    assert [player.name() for player in loaded] == ['Ala', 'Ola']
+    assert loaded[0].locations() is loaded[1].locations()
+    assert loaded[0].locations().players_at(0, 1) == [loaded[0]]
+    assert loaded[0].enemy_registry().count() == 2
+    with pytest.raises(SaveValidationError):
+        FileHandler().read_from_json(path)
+
+
+def test_fight_enemy_without_health_in_all_modes():
+    results = []
+    for log in ('full', 'summary', 'stream'):
+        player = FileHandler().read_from_json('json_files/test_init.json')
+        player.move('north')
+        player.locations().get(0, 1).find_enemy('Orc').set_health(0)
+        random.seed(3)
+        result = player.fight('Orc', log=log)
+        if log == 'stream':
+            result = list(result)
+        results.append((log, result, random.random(), player.did_win(),
+                        player.locations().get(0, 1).enemy_count('Orc'),
+                        player.enemy_registry().count()))
+    assert results[0][1:] == ('\n',) + results[1][2:]
+    assert results[1][1] == '\n\t\tOrc has no health left.\n'
+    assert results[2][1:] == ([],) + results[1][2:]
+    assert results[0][4:] == (1, 2)
+
+
+def test_paged_world_look_cache_after_eviction(tmp_path):
+    path = str(tmp_path / 'world.bin')
+    FileHandler().save_to_binary(path, Player('Jurek', (0, 1),
+                                              open_world(40), 5, 100, []))
+    player = FileHandler().read_from_binary(path, lazy=True, cache_size=16)
+    world = player.locations()
+    assert 'You see red gem.' in player.look_around()
+    player.pickup_gems()
+    FileHandler().save_to_binary(path, player)
+    for x in range(1, 30):
+        world.get(x, 20)
+    assert world.cached_count() <= 16
+    assert 'There are no gems here.' in player.look_around()
+
+
+def test_action_enemy_info_numbered():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+    location = player.locations().get(0, 1)
+    second = Enemy('Orc', 7, 2)
+    location.add_enemy(second)
+    assert player.action('enemy info orc 2') == str(second)
+    assert player.action('enemy info orc') == str(location.find_enemy('Orc'))
+    assert player.action('enemy info orc 3') == (
+        '\n\t\tThere is no enemy named Orc 3\n')
+    assert player.action('enemy info orc two') == 'Invalid action.'
+
+
+def test_location_rejects_same_enemy_twice():
+    enemy = Enemy('Orc', 5, 1)
+    location = Location('Cave', enemies=[enemy])
+    with pytest.raises(ValueError):
+        location.add_enemy(enemy)
+    assert location.enemy_count() == 1
+    location.add_enemy(Enemy('Orc', 5, 1))
+    assert location.enemy_count('Orc') == 2
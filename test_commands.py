@@ -0,0 +1,69 @@
+from commands import CommandRegistry, CommandError
+import pytest
+
+
+def make_registry():
+    registry = CommandRegistry()
+    registry.register('move', lambda player, direction: f'move {direction}',
+                      args=1)
+    registry.register('look around', lambda player: 'look')
+    registry.register('fight', lambda player, name: f'fight {name}',
+                      rest=True)
+    registry.register('quick fight', lambda player, name: f'quick {name}',
+                      rest=True)
+    return registry
+
+
+def test_dispatch():
+    registry = make_registry()
+    assert registry.dispatch(None, 'Move  North') == 'move north'
+    assert registry.dispatch(None, 'look around') == 'look'
+    assert registry.dispatch(None, 'fight big orc') == 'fight big orc'
+    assert registry.dispatch(None, 'quick fight orc') == 'quick orc'
+
+
+def test_parse_returns_command_and_args():
+    command, args = make_registry().parse('move east')
+    assert command.words == ('move',)
+    assert args == ['east']
+    assert command.usage() == 'move (1)'
+
+
+def test_parse_errors():
+    registry = make_registry()
+    with pytest.raises(CommandError) as e:
+        registry.parse('   ')
+    assert e.value.reason == 'empty'
+    with pytest.raises(CommandError) as e:
+        registry.parse('look')
+    assert e.value.reason == 'unknown'
+    with pytest.raises(CommandError) as e:
+        registry.parse('move')
+    assert e.value.reason == 'arguments'
+    assert e.value.usage == 'move (1)'
+    with pytest.raises(CommandError) as e:
+        registry.parse('fight')
+    assert e.value.usage == 'fight (...)'
+    with pytest.raises(CommandError):
+        registry.parse('look around now')
+
+
+def test_register_twice():
+    registry = make_registry()
+    with pytest.raises(ValueError):
+        registry.register('look around', lambda player: None)
+    with pytest.raises(ValueError):
+        registry.register('', lambda player: None)
+    assert len(registry.commands()) == 4
+
+
+def test_usage_and_description():
+    registry = CommandRegistry()
+    registry.register('use gem', lambda player, direction: direction,
+                      args=1, arg_names=('direction',),
+                      description='uses gem')
+    registry.register('rest', lambda player: 'rest')
+    command, _ = registry.parse('use gem east')
+    assert command.usage() == 'use gem (direction)'
+    assert registry.describe() == ["'use gem (direction)' - uses gem",
+                                   "'rest' - "]
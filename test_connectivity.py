@@ -0,0 +1,122 @@
+from connectivity import ConnectivityIndex
+from classes import FileHandler, World, Location, Gem
+from generator import WorldGenerator
+from collections import Counter, deque
+import random
+
+
+def make_world(tmp_path, size=15, seed=1):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(size, barrier_density=0.8, gem_density=0.2,
+                   seed=seed).save(path)
+    return FileHandler().read_from_json(path).locations()
+
+
+def flood(world, x, y):
+    seen = {(x, y)}
+    queue = deque(seen)
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            location = world.get(nx, ny)
+            if (nx, ny) not in seen and location.name() != 'Sea' \
+                    and not location.barrier():
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return seen
+
+
+def brute_gates(world, region):
+    gates = Counter()
+    border = set()
+    for x, y in region:
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            location = world.get(nx, ny)
+            if location.name() != 'Sea' and location.barrier():
+                border.add((nx, ny))
+    for x, y in border:
+        gates[world.get(x, y).barrier_color()] += 1
+    return dict(gates)
+
+
+def test_regions_follow_removed_barriers(tmp_path):
+    world = make_world(tmp_path, seed=3)
+    index = ConnectivityIndex(world)
+    walls = [(x, y) for x, y, location in world.cells()
+             if location.barrier()]
+    random.Random(1).shuffle(walls)
+    for step, (x, y) in enumerate(walls[:60]):
+        world.get(x, y).remove_barrier()
+        index.opened(x, y)
+        if step % 10:
+            continue
+        region = flood(world, 0, 0)
+        for cx, cy, location in world.cells():
+            expected = (cx, cy) in region and not location.barrier()
+            assert index.reachable((0, 0), (cx, cy)) == expected
+        assert index.gates(0, 0) == brute_gates(world, region)
+
+
+def test_gems_in_region(tmp_path):
+    world = make_world(tmp_path, seed=4)
+    index = ConnectivityIndex(world)
+    expected = Counter()
+    for x, y in flood(world, 0, 0):
+        expected.update(gem.color() for gem in world.get(x, y).items())
+    assert index.gems(0, 0) == dict(expected)
+
+
+def corridor():
+    # open cells (0,0) and (0,2) divided by red barrier (0,1),
+    # blue barrier (0,3) hides green gem, (0,4) behind green barrier
+    world = World(5)
+    world.put(0, 0, Location('A', '', 0, 'red'))
+    world.put(0, 1, Location('B', '', 1, 'red'))
+    world.put(0, 2, Location('C', '', 0, 'red', [],
+                             [Gem('blue gem', 'blue')]))
+    world.put(0, 3, Location('D', '', 1, 'blue', [],
+                             [Gem('green gem', 'green')]))
+    world.put(0, 4, Location('E', '', 1, 'green'))
+    return world
+
+
+def test_can_reach_all_collects_gems_on_the_way():
+    index = ConnectivityIndex(corridor())
+    assert not index.reachable((0, 0), (0, 2))
+    assert index.gates(0, 0) == {'red': 1}
+    assert index.can_reach_all((0, 0), [], [(0, 0)])
+    assert not index.can_reach_all((0, 0), [], [(0, 2)])
+    assert index.can_reach_all((0, 0), ['red'], [(0, 2), (0, 4)])
+    assert not index.can_reach_all((0, 0), ['blue'], [(0, 4)])
+
+
+def test_gems_taken():
+    world = corridor()
+    index = ConnectivityIndex(world)
+    world.get(0, 1).remove_barrier()
+    index.opened(0, 1)
+    assert index.reachable((0, 0), (0, 2))
+    assert index.gems(0, 0) == {'blue': 1}
+    assert index.gates(0, 0) == {'blue': 1}
+    index.gems_taken(0, 2, ['blue'])
+    assert index.gems(0, 0) == {}
+    assert not index.can_reach_all((0, 0), [], [(0, 4)])
+    assert index.can_reach_all((0, 0), ['blue'], [(0, 4)])
+
+
+def test_large_sparse_world():
+    world = World(60000)
+    for y in range(59990, 60000):
+        world.put(59999, y, Location('Road', '', 0, 'red', [],
+                                     [Gem('gem', 'red')]))
+    world.put(0, 0, Location('Corner'))
+    world.get(59999, 59995).set_barrier(1)
+    index = ConnectivityIndex(world)
+    assert index._state.block_count() == 2
+    assert index.region_count() == 3
+    assert not index.reachable((59999, 59990), (59999, 59999))
+    assert index.gates(59999, 59990) == {'red': 1}
+    index.opened(59999, 59995)
+    assert index.reachable((59999, 59990), (59999, 59999))
+    assert index.gems(59999, 59999) == {'red': 10}
+    assert not index.reachable((0, 0), (59999, 59999))
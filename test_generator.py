@@ -0,0 +1,76 @@
+from generator import WorldGenerator
+from classes import FileHandler
+from collections import deque
+import io
+import json
+import pytest
+
+
+def reachable(player):
+    locations = player.locations()
+    size = len(locations)
+    seen = {player.current_location()}
+    queue = deque(seen)
+    while queue:
+        x, y = queue.popleft()
+        for nx, ny in ((x - 1, y), (x + 1, y), (x, y - 1), (x, y + 1)):
+            if (0 <= nx < size and 0 <= ny < size and (nx, ny) not in seen
+                    and not locations[nx][ny].barrier()):
+                seen.add((nx, ny))
+                queue.append((nx, ny))
+    return seen
+
+
+@pytest.mark.parametrize('size', [1, 2, 7, 20, 31])
+def test_world_is_winnable(tmp_path, size):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(size, barrier_density=1, enemy_density=0.5,
+                   seed=size).save(path)
+    player = FileHandler().read_from_json(path)
+    assert player.locations().get(*player.current_location()).barrier() == 0
+    seen = reachable(player)
+    for x, y, location in player.locations().cells():
+        for enemy in location.enemies():
+            assert (x, y) in seen
+            assert enemy.power() * (enemy.health() - 1) < player.health()
+
+
+def test_same_seed_gives_same_world():
+    first, second, other = io.StringIO(), io.StringIO(), io.StringIO()
+    WorldGenerator(9, seed=3).write(first)
+    WorldGenerator(9, seed=3).write(second)
+    WorldGenerator(9, seed=4).write(other)
+    assert first.getvalue() == second.getvalue()
+    assert first.getvalue() != other.getvalue()
+
+
+def test_generated_schema():
+    world = io.StringIO()
+    WorldGenerator(4, gem_density=1, colors=['pink'], seed=1).write(world)
+    data = json.loads(world.getvalue())
+    assert data['map_size'] == 4
+    player = data['player'][0]
+    assert player['current_location'] == '2,2'
+    assert len(player['locations']) == 16
+    location = player['locations'][5]
+    assert (location['x'], location['y']) == (1, 1)
+    assert location['name'] == 'Wall'
+    assert location['barrier_color'] == 'pink'
+    assert location['gems'] == [{'name': 'pink gem', 'color': 'pink'}]
+
+
+def test_locations_are_generated_lazily():
+    locations = WorldGenerator(5000, seed=1).locations()
+    assert next(locations)['name'] == 'Room'
+    assert next(locations)['name'] == 'Corridor'
+
+
+def test_invalid_parameters():
+    with pytest.raises(ValueError):
+        WorldGenerator(0)
+    with pytest.raises(ValueError):
+        WorldGenerator(5, barrier_density=1.5)
+    with pytest.raises(ValueError):
+        WorldGenerator(5, colors=[])
+    with pytest.raises(ValueError):
+        WorldGenerator(5, player_power=0)
@@ -0,0 +1,61 @@
+from harness import read_script, run, replay
+import json
+import random
+
+WORLD = 'json_files/test_init.json'
+
+
+def test_read_script(tmp_path):
+    path = tmp_path / 'script.txt'
+    path.write_text('move north\n\n# comment\n  pickup gems  \n')
+    assert read_script(str(path)) == ['move north', 'pickup gems']
+
+
+def test_run_until_won():
+    commands = ['move north', 'pickup gems', 'fight hydra', 'fight orc',
+                'show stats']
+    result = run(WORLD, commands, seed=3)
+    assert result.outcome == 'won'
+    assert result.commands == commands[:4]
+    assert len(result.responses) == len(result.latencies) == 4
+    assert result.responses[0] == '\n\t\tYou moved north\n'
+    assert result.player.enemy_registry().count() == 0
+    assert result.throughput() > 0
+    assert 'Outcome: won' in result.report()
+
+
+def test_run_stops_at_exit():
+    result = run(WORLD, ['look', 'exit', 'move north'], seed=1)
+    assert result.responses == ['Invalid action.']
+    assert result.outcome is None
+    assert result.player.current_location() == (1, 1)
+
+
+def test_run_is_deterministic_and_keeps_random_state():
+    commands = ['move north', 'fight hydra']
+    random.seed(5)
+    expected = random.random()
+    random.seed(5)
+    first = run(WORLD, commands, seed=11)
+    assert random.random() == expected
+    second = run(WORLD, commands, seed=11)
+    assert first.responses == second.responses
+
+
+def test_run_reports_error(tmp_path):
+    result = run(WORLD, [f'save {tmp_path}', 'move north'], seed=1)
+    assert result.outcome == 'error'
+    assert result.responses == ['IsADirectoryError: Can only work on files']
+
+
+def test_record_and_replay(tmp_path):
+    path = tmp_path / 'session.json'
+    result = run(WORLD, ['move north', 'fight hydra', 'fight orc'])
+    result.save_session(str(path))
+    replayed, mismatches = replay(str(path))
+    assert mismatches == []
+    assert replayed.responses == result.responses
+    session = json.loads(path.read_text())
+    session['responses'][1] = 'changed'
+    path.write_text(json.dumps(session))
+    assert replay(str(path))[1] == [1]
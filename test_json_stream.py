@@ -0,0 +1,54 @@
+from json_stream import JsonStream
+import io
+import json
+import pytest
+
+
+def test_value():
+    stream = JsonStream(io.StringIO(' {"a": [1, 2]} '))
+    assert stream.value() == {'a': [1, 2]}
+    assert stream.peek() == ''
+
+
+def test_members_and_items():
+    text = '{"size": 12345, "list": [{"x": 1}, {"x": 2}, {"x": 3}], "b": null}'
+    stream = JsonStream(io.StringIO(text), chunk_size=3)
+    result = {}
+    for key in stream.members():
+        if key == 'list':
+            result[key] = [stream.value() for _ in stream.items()]
+        else:
+            result[key] = stream.value()
+    assert result == json.loads(text)
+
+
+def test_number_split_between_chunks():
+    stream = JsonStream(io.StringIO('[123456789, 2]'), chunk_size=4)
+    assert [stream.value() for _ in stream.items()] == [123456789, 2]
+
+
+def test_empty_object_and_array():
+    stream = JsonStream(io.StringIO('{"a": [], "b": {}}'))
+    for key in stream.members():
+        if key == 'a':
+            assert list(stream.items()) == []
+        else:
+            assert list(stream.members()) == []
+
+
+def test_binary_file_with_multibyte_characters():
+    data = json.dumps({'name': 'Jurek Ogórek'}, ensure_ascii=False)
+    stream = JsonStream(io.BytesIO(data.encode('utf-8')), chunk_size=1)
+    assert stream.value() == {'name': 'Jurek Ogórek'}
+
+
+def test_invalid_delimiter():
+    stream = JsonStream(io.StringIO('[1; 2]'))
+    with pytest.raises(json.JSONDecodeError):
+        [stream.value() for _ in stream.items()]
+
+
+def test_truncated_file():
+    stream = JsonStream(io.StringIO('{"a": [1, 2'))
+    with pytest.raises(json.JSONDecodeError):
+        stream.value()
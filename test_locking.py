@@ -0,0 +1,87 @@
+from classes import FileHandler, Player
+from generator import WorldGenerator
+from locking import (
+    AROUND,
+    HERE,
+    MAP,
+    PLAYER,
+    ConcurrentWorld,
+    RegionLocks,
+    check,
+    stress
+)
+import sys
+import threading
+import pytest
+
+
+def test_regions_are_sorted_and_inside_map():
+    locks = RegionLocks(10, 4)
+    assert locks.region_count() == 9
+    assert locks.regions([(9, 9), (0, 0), (4, 3), (-1, 0), (0, 10)]) == [
+        0, 3, 8]
+
+
+def test_hold_releases_locks_on_error():
+    locks = RegionLocks(8, 4)
+    with pytest.raises(ValueError):
+        with locks.hold([0, 2]):
+            assert not locks._locks[0].acquire(blocking=False)
+            raise ValueError()
+    assert all(lock.acquire(blocking=False) for lock in locks._locks)
+
+
+def test_scope_of_commands():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    concurrent = ConcurrentWorld(player.locations(), region_size=1)
+    assert concurrent.scope('move north') == AROUND
+    assert concurrent.scope('quick fight orc') == HERE
+    assert concurrent.scope('rest') == PLAYER
+    assert concurrent.scope('dance') == PLAYER
+    assert concurrent.scope('travel to 0,0') == MAP
+    assert concurrent.regions(player, 'look around') == [1, 3, 4, 5, 7]
+    assert concurrent.regions(player, 'fight orc') == [4]
+    assert list(concurrent.regions(player, 'save x.json')) == list(range(9))
+
+
+def test_players_share_world_in_threads():
+    template = FileHandler().read_from_json('json_files/test_init.json')
+    world = template.locations()
+    concurrent = ConcurrentWorld(world)
+    players = [Player(f'P{index}', (1, 1), world, 5, 100, [])
+               for index in range(4)]
+    responses = concurrent.execute([(player, 'move north')
+                                    for player in players], threads=4)
+    assert responses == ['\n\t\tYou moved north\n'] * 4
+    assert world.player_count(0, 1) == 4
+    assert check(world, players) == []
+
+
+@pytest.fixture
+def short_switches():
+    interval = sys.getswitchinterval()
+    # threads switch often, so that races would show up
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def test_stress_keeps_invariants(tmp_path, short_switches):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(10, enemy_density=0.5, gem_density=0.5, seed=3).save(path)
+    results = []
+
+    def run():
+        for threads in (1, 16):
+            results.append(stress(path, players=32, commands=5000,
+                                  threads=threads, region_size=4))
+
+    worker = threading.Thread(target=run, daemon=True)
+    worker.start()
+    worker.join(120)
+    assert not worker.is_alive(), 'deadlock'
+    assert len(results) == 2
+    for result in results:
+        assert result.problems == []
+        assert len(result.responses) == 5000
+        assert result.throughput() > 0
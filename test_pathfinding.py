@@ -0,0 +1,98 @@
+from pathfinding import PathFinder
+from classes import FileHandler, Location, World
+from generator import WorldGenerator
+import random
+
+
+def make_world(tmp_path, size=21, seed=1):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(size, barrier_density=0.7, seed=seed).save(path)
+    return FileHandler().read_from_json(path).locations()
+
+
+def test_path_is_shortest_and_open(tmp_path):
+    world = make_world(tmp_path)
+    paths = PathFinder(world)
+    path = paths.path((0, 0), [(20, 20)])
+    assert path[-1] == (20, 20)
+    previous = (0, 0)
+    for x, y in path:
+        assert abs(x - previous[0]) + abs(y - previous[1]) == 1
+        assert not world.get(x, y).barrier()
+        previous = x, y
+    assert len(path) == paths.distance(paths.field([(20, 20)]), 0)
+
+
+def test_unreachable_target(tmp_path):
+    world = make_world(tmp_path)
+    world.get(1, 1).set_barrier(1)
+    assert PathFinder(world).path((0, 0), [(1, 1)]) is None
+
+
+def test_fields_are_cached(tmp_path):
+    paths = PathFinder(make_world(tmp_path), max_fields=2)
+    first = paths.field([(0, 0)])
+    assert paths.field([(0, 0)]) is first
+    paths.field([(2, 2)])
+    paths.field([(4, 4)])
+    assert paths.field_count() == 2
+    assert paths.field([(0, 0)]) is not first
+
+
+def test_opened_updates_only_closer_cells(tmp_path):
+    world = make_world(tmp_path, seed=2)
+    paths = PathFinder(world)
+    targets = [(10, 10)]
+    field = paths.field(targets)
+    walls = [(x, y) for x, y, location in world.cells()
+             if location.barrier()]
+    random.Random(0).shuffle(walls)
+    for x, y in walls[:40]:
+        world.get(x, y).remove_barrier()
+        paths.opened(x, y)
+        expected = PathFinder(world).field(targets).blocks
+        assert paths.field(targets) is field
+        assert field.blocks == expected
+    assert 0 < paths.relaxed_count() < 40 * 21 * 21
+
+
+def test_closed_forgets_fields(tmp_path):
+    world = make_world(tmp_path)
+    paths = PathFinder(world)
+    field = paths.field([(0, 0)])
+    world.get(0, 1).set_barrier(1)
+    paths.closed(0, 1)
+    assert paths.field([(0, 0)]) is not field
+    assert paths.field([(0, 0)]).blocks == \
+        PathFinder(world).field([(0, 0)]).blocks
+
+
+def test_cells_named(tmp_path):
+    paths = PathFinder(make_world(tmp_path, size=3))
+    assert paths.cells_named('ROOM') == [(0, 0), (0, 2), (2, 0), (2, 2)]
+    assert paths.cells_named('nothing') == []
+
+
+def test_sparse_world_keeps_only_reachable_blocks():
+    world = World(10000)
+    for y in range(5):
+        world.put(9000, 9000 + y, Location('Road'))
+    paths = PathFinder(world)
+    field = paths.field([(9000, 9004)])
+    assert len(field.blocks) == 1
+    assert paths.field_bytes() == field.nbytes() < 1 << 16
+    assert paths.path((9000, 9000), [(9000, 9004)])[-1] == (9000, 9004)
+    assert paths.distance(field, 0) == 10000 * 10000
+
+
+def test_fields_are_limited_by_memory(tmp_path):
+    world = make_world(tmp_path)
+    one_field = PathFinder(world).field([(0, 0)]).nbytes()
+    paths = PathFinder(world, max_bytes=2 * one_field)
+    for target in ((0, 0), (2, 2), (4, 4), (6, 6)):
+        paths.field([target])
+    assert paths.field_count() == 2
+    assert paths.field_bytes() == 2 * one_field
+    paths = PathFinder(world, max_bytes=0)
+    paths.field([(0, 0)])
+    assert paths.field_count() == 1
@@ -0,0 +1,111 @@
+from classes import FileHandler
+from perf import LatencyHistogram, PerfStats, STATS, _bucket, _bucket_limit
+import json
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+
+@pytest.fixture
+def stats():
+    STATS.reset()
+    STATS.profile(None)
+    yield STATS
+    STATS.profile(None)
+    STATS.enable()
+
+
+def test_buckets_cover_all_values():
+    for value in range(1, 70000):
+        bucket = _bucket(value)
+        assert _bucket_limit(bucket - 1) < value <= _bucket_limit(bucket)
+        assert _bucket_limit(bucket) <= value * 1.125
+
+
+def test_histogram_percentiles():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0
+    for value in range(1, 1001):
+        histogram.record(value * 1000)
+    assert histogram.count() == 1000
+    assert 500000 <= histogram.percentile(0.5) <= 500000 * 1.125
+    assert 990000 <= histogram.percentile(0.99) <= 1000000
+    assert histogram.percentile(1) == 1000000
+    summary = histogram.to_dict()
+    assert summary['min'] == 1e-06 and summary['max'] == 0.001
+    assert summary['mean'] == pytest.approx(0.0005005)
+
+
+def test_perf_stats_groups_and_export(tmp_path):
+    stats = PerfStats()
+    assert stats.run_command('move', lambda value: value * 2, 21) == 42
+    decorated = stats.timed(lambda: 'saved')
+    assert decorated() == 'saved'
+    data = stats.to_dict()
+    assert data['commands']['move']['count'] == 1
+    name = decorated.__wrapped__.__qualname__
+    assert data['operations'][name]['count'] == 1
+    stats.export(str(tmp_path / 'perf.json'))
+    with open(tmp_path / 'perf.json') as file_handle:
+        assert json.load(file_handle) == data
+    stats.enable(False)
+    stats.run_command('move', lambda: None)
+    assert stats.histogram('move').count() == 1
+    stats.reset()
+    assert stats.histogram('move') is None
+
+
+def test_actions_and_operations_are_measured(stats):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.action('move north')
+    player.action('MOVE south')
+    player.action('dance')
+    player.did_win()
+    assert stats.histogram('move').count() == 2
+    assert stats.histogram('dance') is None
+    operations = stats.to_dict()['operations']
+    assert operations['FileHandler.read_from_json']['count'] == 1
+    assert operations['Player.did_win']['count'] == 1
+    table = player.action('stats perf')
+    assert 'move' in table and 'Player.did_win' in table
+    data = json.loads(player.action('stats perf json'))
+    assert data['commands']['move']['count'] == 2
+    assert data['commands']['stats perf']['count'] == 1
+
+
+def test_profile_chosen_command(stats):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    assert player.action('stats perf profile report') == (
+        '\n\t\tNothing profiled yet.\n')
+    assert player.action('stats perf profile look around every 2') == (
+        "\n\t\tProfiling 'look around' every 2 call(s).\n")
+    assert player.action('stats perf profile report') == (
+        '\n\t\tNothing profiled yet.\n')
+    player.action('look around')
+    player.action('look around')
+    player.action('move north')
+    report = player.action('stats perf profile report')
+    assert 'look_around' in report
+    assert 'move_north' not in report
+    assert stats.histogram('look around').count() == 2
+    assert player.action('stats perf profile off') == (
+        '\n\t\tProfiling stopped.\n')
+    assert stats.profiled() is None
+
+
+def test_profile_unknown_command(stats):
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    assert player.action('stats perf profile dance') == 'Invalid action.'
+    assert player.action('stats perf profile dance every 3') == (
+        'Invalid action.')
+    assert stats.profiled() is None
+
+
+def test_profile_from_many_threads(stats):
+    players = [FileHandler().read_from_json('json_files/test_init.json')
+               for _ in range(4)]
+    stats.profile('look around')
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda player: [player.action('look around')
+                                      for _ in range(50)], players))
+    assert stats.histogram('look around').count() == 200
+    assert 'look_around' in stats.profile_report()
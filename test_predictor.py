@@ -0,0 +1,92 @@
+from classes import FileHandler
+from predictor import predict_fight
+import random
+import predictor
+import pytest
+
+
+def test_one_hit_kills_enemy():
+    prediction = predict_fight(100, 5, 1, 5, trials=100, seed=1,
+                               use_numpy=False)
+    assert prediction.win_probability() == 1
+    assert prediction.expected_health() == 100
+    assert prediction.lengths() == {1: 100}
+    assert prediction.expected_length() == 1
+
+
+def test_no_power_always_loses():
+    prediction = predict_fight(10, 0, 5, 3, trials=50, seed=1,
+                               use_numpy=False)
+    assert prediction.win_probability() == 0
+    assert prediction.expected_health() == 0
+
+
+def test_dead_player_does_not_fight():
+    prediction = predict_fight(0, 5, 5, 3, trials=10, use_numpy=False)
+    assert prediction.wins() == 0
+    assert prediction.lengths() == {0: 10}
+
+
+def test_reproducible_with_seed():
+    first = predict_fight(20, 5, 20, 5, trials=1000, seed=7, use_numpy=False)
+    second = predict_fight(20, 5, 20, 5, trials=1000, seed=7, use_numpy=False)
+    assert first.wins() == second.wins()
+    assert first.lengths() == second.lengths()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        predict_fight(10, 5, 10, 0)
+    with pytest.raises(ValueError):
+        predict_fight(10, 5, 10, 5, trials=0)
+    with pytest.raises(ValueError):
+        predict_fight(-1, 5, 10, 5)
+
+
+def test_matches_real_fights(monkeypatch):
+    rng = random.Random(3)
+    monkeypatch.setattr('classes.randint', rng.randint)
+    wins = 0
+    trials = 1000
+    for _ in range(trials):
+        player = FileHandler().read_from_json('json_files/test_init.json')
+        player.move('north')
+        player.set_health(30)
+        player.fight('Hydra')
+        wins += player.health() > 0
+    prediction = predict_fight(30, 5, 10, 5, trials=20000, seed=3,
+                               use_numpy=False)
+    assert abs(prediction.win_probability() - wins / trials) < 0.05
+
+
+def test_numpy_matches_simulation():
+    pytest.importorskip('numpy')
+    slow = predict_fight(30, 5, 10, 5, trials=20000, seed=1, use_numpy=False)
+    fast = predict_fight(30, 5, 10, 5, trials=20000, seed=1, use_numpy=True)
+    again = predict_fight(30, 5, 10, 5, trials=20000, seed=1, use_numpy=True)
+    assert abs(slow.win_probability() - fast.win_probability()) < 0.02
+    assert fast.lengths() == again.lengths()
+
+
+def test_numpy_missing(monkeypatch):
+    monkeypatch.setattr(predictor, 'numpy', None)
+    with pytest.raises(ImportError):
+        predict_fight(10, 5, 10, 5, use_numpy=True)
+    assert predict_fight(10, 5, 10, 5, trials=10).trials() == 10
+
+
+def test_describe():
+    prediction = predict_fight(100, 5, 1, 5, trials=10, use_numpy=False)
+    assert prediction.describe('Orc') == (
+        '\n\t\tChance to win with Orc is 100.0%.'
+        '\n\t\tExpected health after fight is 100.0.'
+        '\n\t\tMost common fight lengths in rounds: 1: 100.0%.\n')
+
+
+def test_action_predict_fight():
+    player = FileHandler().read_from_json('json_files/test_init.json')
+    player.move('north')
+    assert 'Chance to win with Hydra' in player.action('predict fight hydra')
+    assert player.locations()[0][1].find_enemy('Hydra').health() == 10
+    assert player.action('predict fight elf') == '\n\t\tThere is no enemy named Elf\n'
+    assert player.action('predict fight') == 'Invalid action.'
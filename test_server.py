@@ -0,0 +1,227 @@
+from server import GameServer, encode_response, play, read_response
+from classes import NegativeDamageError, Player
+import perf
+import asyncio
+import logging
+import shutil
+import threading
+import time
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def make_server(tmp_path):
+    shutil.copy('json_files/test_init.json', tmp_path / 'test_init.json')
+    return GameServer(str(tmp_path / 'test_init.json'), str(tmp_path))
+
+
+def test_encode_and_read_response():
+    async def check():
+        reader = asyncio.StreamReader()
+        reader.feed_data(encode_response('.hidden\n\nline'))
+        reader.feed_eof()
+        assert await read_response(reader) == '.hidden\n\nline'
+        assert await read_response(reader) is None
+
+    run(check())
+
+
+def test_session_plays_game(tmp_path):
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, [
+            'move north', 'pickup gems', 'show equipment', 'look'
+        ])
+        await server.close()
+        return responses
+
+    responses = run(check())
+    assert responses[0] == '\n\t\tStarting game'
+    assert responses[1] == '\n\t\tYou moved north\n'
+    assert responses[3] == '\n\t\tYou have green gem, green gem, red gem\n'
+    assert responses[4] == 'Invalid action.'
+
+
+def test_save_and_load(tmp_path):
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        first = await play('127.0.0.1', port, ['move north', 'save mine.json'])
+        second = await play('127.0.0.1', port, [
+            'load mine.json', 'move north', 'load ../escape.json',
+            'save /tmp/escape.json', 'load missing.json'
+        ])
+        await server.close()
+        return first, second
+
+    first, second = run(check())
+    assert first[2] == '\n\t\tsaved to mine.json\n'
+    assert (tmp_path / 'mine.json').exists()
+    assert second[1] == '\n\t\tloaded mine.json\n'
+    assert second[2] == '\n\t\tCannot go north\n'
+    assert second[3] == '\n\t\tInvalid file name\n'
+    assert second[4] == '\n\t\tInvalid file name\n'
+    assert second[5] == '\n\t\tCould not load missing.json\n'
+
+
+def test_load_rejects_invalid_save(tmp_path):
+    (tmp_path / 'broken.json').write_text('{"map_size": 3, "player": []}')
+    (tmp_path / 'cut.json').write_text('{"map_size": 3,')
+
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, ['load broken.json',
+                                                   'load cut.json'])
+        await server.close()
+        return responses
+
+    responses = run(check())
+    assert responses[1] == ('\n\t\tInvalid save file, Save needs a player:'
+                            ' player\n')
+    assert responses[2].startswith('\n\t\tInvalid save file, Invalid json')
+
+
+def test_load_reads_save_once(tmp_path, monkeypatch):
+    opened = []
+    real_open = open
+
+    def counted_open(path, *args, **kwargs):
+        if str(path).endswith('mine.json'):
+            opened.append(path)
+        return real_open(path, *args, **kwargs)
+    shutil.copy('json_files/test_init.json', tmp_path / 'mine.json')
+    monkeypatch.setattr('builtins.open', counted_open)
+
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, ['load mine.json'])
+        await server.close()
+        return responses
+
+    assert run(check())[1] == '\n\t\tloaded mine.json\n'
+    assert len(opened) == 1
+
+
+def test_game_ends_when_player_wins(tmp_path):
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, [
+            'move north', 'quick fight hydra', 'quick fight orc', 'rest'
+        ])
+        await server.close()
+        return responses
+
+    responses = run(check())
+    assert len(responses) == 4
+    assert responses[-1].endswith('\t\tYou won\n')
+
+
+def test_slow_client_does_not_block_others(tmp_path):
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for _ in range(2000):
+            writer.write(b'look around\n')
+        responses = await asyncio.wait_for(
+            play('127.0.0.1', port, ['move north']), timeout=10)
+        writer.close()
+        await server.close()
+        return responses
+
+    assert run(check())[1] == '\n\t\tYou moved north\n'
+
+
+def test_many_concurrent_clients(tmp_path):
+    clients = 200
+    commands = ['look around', 'move north', 'pickup gems',
+                'show equipment', 'move south', 'use gem east',
+                'move east', 'show stats']
+
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        start = time.perf_counter()
+        results = await asyncio.gather(*[
+            play('127.0.0.1', port, commands) for _ in range(clients)
+        ])
+        elapsed = time.perf_counter() - start
+        await server.close()
+        return results, elapsed, server
+
+    results, elapsed, server = run(check())
+    assert len(results) == clients
+    for responses in results:
+        assert responses[7] == '\n\t\tYou moved east\n'
+    assert server.commands() == clients * len(commands)
+    assert server.sessions() == 0
+    print(f'\n{clients} clients, {clients * len(commands)} commands in'
+          f' {elapsed:.2f}s: {clients * len(commands) / elapsed:.0f}'
+          ' commands/s')
+
+
+def test_long_command_does_not_block_other_clients(tmp_path, monkeypatch):
+    action = Player.action
+    release = threading.Event()
+
+    def slow_action(player, line):
+        if line == 'wait':
+            release.wait(10)
+        return action(player, line)
+    monkeypatch.setattr(Player, 'action', slow_action)
+
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        slow = asyncio.ensure_future(play('127.0.0.1', port, ['wait']))
+        responses = await asyncio.wait_for(
+            play('127.0.0.1', port, ['move north']), timeout=5)
+        release.set()
+        await slow
+        await server.close()
+        return responses
+
+    assert run(check())[1] == '\n\t\tYou moved north\n'
+
+
+def test_command_errors(tmp_path, monkeypatch, caplog):
+    def failing_action(player, line):
+        if line == 'damage':
+            raise NegativeDamageError('Damage cannot be negative.')
+        raise KeyError(line)
+    monkeypatch.setattr(Player, 'action', failing_action)
+
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, ['damage', 'bug'])
+        await server.close()
+        return responses
+
+    with caplog.at_level(logging.ERROR, logger='server'):
+        responses = run(check())
+    assert responses[1] == 'Invalid action.'
+    assert responses[2] == '\n\t\tServer error.\n'
+    assert "Command 'bug' failed" in caplog.text
+    assert 'KeyError' in caplog.text
+
+
+def test_admin_commands_are_refused(tmp_path):
+    async def check():
+        server = make_server(tmp_path)
+        port = await server.start()
+        responses = await play('127.0.0.1', port, [
+            'stats perf', 'stats perf profile move', 'stats perf json'
+        ])
+        await server.close()
+        return responses
+
+    refused = '\n\t\tThis command is not available on server.\n'
+    assert run(check())[1:] == [refused] * 3
+    assert perf.STATS.profiled() is None
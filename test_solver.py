@@ -0,0 +1,99 @@
+import solver
+from solver import solve, Model, SolverError
+from classes import FileHandler
+from generator import WorldGenerator
+import json
+import pytest
+
+
+def test_solve_test_world():
+    solution = solve('json_files/test_init.json', processes=1)
+    assert solution.commands == ['move north', 'fight hydra', 'fight orc']
+    assert solution.par == 3
+    assert solution.verified
+
+
+def test_solve_needs_gem(tmp_path):
+    with open('json_files/test_init.json') as file_handle:
+        data = json.load(file_handle)
+    player = data['player'][0]
+    player['locations'][1]['barrier'] = 1
+    path = str(tmp_path / 'world.json')
+    with open(path, 'w') as file_handle:
+        json.dump(data, file_handle)
+    solution = solve(path, processes=1)
+    assert solution.commands == ['use gem north', 'move north',
+                                 'fight hydra', 'fight orc']
+    assert solution.verified
+    player['equipment'] = []
+    with open(path, 'w') as file_handle:
+        json.dump(data, file_handle)
+    assert solve(path, processes=1) is None
+
+
+def test_rest_before_dangerous_fight(tmp_path):
+    with open('json_files/test_init.json') as file_handle:
+        data = json.load(file_handle)
+    enemies = data['player'][0]['locations'][1]['enemies']
+    enemies[0].update(health=20, power=5)
+    enemies[1].update(health=20, power=5)
+    path = str(tmp_path / 'world.json')
+    with open(path, 'w') as file_handle:
+        json.dump(data, file_handle)
+    solution = solve(path, processes=1)
+    assert solution.commands == ['move north', 'fight hydra', 'rest',
+                                 'fight orc']
+    assert solution.par == 3
+    assert solution.verified
+
+
+def test_parallel_search_gives_same_solution(tmp_path):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(7, enemy_density=0.5, gem_density=0.2, seed=5).save(path)
+    single = solve(path, processes=1)
+    parallel = solve(path, processes=2, chunk_size=16)
+    assert single.verified
+    assert parallel.par == single.par == 18
+    assert parallel.states == single.states
+
+
+def test_state_limit(tmp_path):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(7, enemy_density=0.5, gem_density=0.2, seed=5).save(path)
+    with pytest.raises(SolverError):
+        solve(path, processes=1, max_states=100)
+
+
+def test_model_start_state():
+    model = Model(FileHandler().read_from_json('json_files/test_init.json'))
+    start = model.start()
+    assert start & 15 == 4
+    assert not model.is_won(start)
+    assert [command for _, command in model.successors(start)] == [0, 5, 7]
+
+
+def test_one_pool_for_whole_search(tmp_path, monkeypatch):
+    path = str(tmp_path / 'world.json')
+    WorldGenerator(7, enemy_density=0.5, gem_density=0.2, seed=5).save(path)
+    pools = []
+    executor = solver.ProcessPoolExecutor
+
+    def counted(*args, **kwargs):
+        pools.append(executor(*args, **kwargs))
+        return pools[-1]
+    monkeypatch.setattr(solver, 'ProcessPoolExecutor', counted)
+    solution = solve(path, processes=2, chunk_size=4)
+    assert solution.par == 18
+    assert len(pools) == 1
+
+
+def test_enemy_without_health_cannot_be_beaten(tmp_path):
+    with open('json_files/test_init.json') as file_handle:
+        data = json.load(file_handle)
+    data['player'][0]['locations'][1]['enemies'][0]['health'] = 0
+    path = str(tmp_path / 'world.json')
+    with open(path, 'w') as file_handle:
+        json.dump(data, file_handle)
+    player = FileHandler().read_from_json(path)
+    assert not Model(player).is_beatable()
+    assert solve(path, processes=1) is None
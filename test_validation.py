@@ -0,0 +1,165 @@
+from classes import FileHandler, Journal, Location, Player, World
+from validation import (
+    SaveValidationError,
+    SaveValidator,
+    validate,
+    validate_file
+)
+import copy
+import io
+import json
+import pytest
+
+
+def load():
+    with open('json_files/test_init.json') as file_handle:
+        return json.load(file_handle)
+
+
+def problems(data, **kwargs):
+    with pytest.raises(SaveValidationError) as error:
+        validate(data, **kwargs)
+    return error.value.problems
+
+
+def test_valid_save():
+    validate(load())
+    validate_file('json_files/test_init.json')
+
+
+def test_error_is_key_error():
+    data = load()
+    del data['player'][0]['name']
+    with pytest.raises(KeyError) as error:
+        validate(data)
+    assert str(error.value) == 'Missing key in file: player[0].name'
+
+
+def test_paths_to_wrong_values():
+    data = load()
+    data['player'][0]['locations'][1]['enemies'][0]['power'] = 'strong'
+    data['player'][0]['locations'][1]['gems'][1]['color'] = ''
+    data['player'][0]['locations'][2]['barrier'] = 2
+    data['player'][0]['health'] = -1
+    assert problems(data) == [
+        ('player[0].health', 'Cannot be negative'),
+        ('player[0].locations[1].enemies[0].power', 'Expected integer'),
+        ('player[0].locations[1].gems[1].color', 'Cannot be empty'),
+        ('player[0].locations[2].barrier', 'Expected 0 or 1'),
+    ]
+
+
+def test_map_coverage():
+    data = load()
+    locations = data['player'][0]['locations']
+    locations[0]['x'] = 5
+    locations[2] = copy.deepcopy(locations[1])
+    assert problems(data, full_map=True) == [
+        ('player[0].locations[0]', 'Coordinates outside of 3x3 map'),
+        ('player[0].locations[2]', 'Second location at 0,1'),
+        ('map_size', '2 cells have no location, first is 0,0'),
+    ]
+    assert problems(data) == [
+        ('player[0].locations[0]', 'Coordinates outside of 3x3 map'),
+        ('player[0].locations[2]', 'Second location at 0,1'),
+    ]
+
+
+def test_player_location_and_count():
+    data = load()
+    data['player'][0]['current_location'] = '7,7'
+    data['player'].append({'name': 'Second'})
+    result = problems(data)
+    assert ('player', 'Save can have only one player') in result
+    assert ('player[0].current_location',
+            'Player is not in any location') in result
+
+
+def test_missing_keys_and_bad_json():
+    assert problems({}) == [('map_size', 'Missing key in file'),
+                            ('player', 'Missing key in file')]
+    with pytest.raises(SaveValidationError) as error:
+        validate_file(io.StringIO('{"map_size": 3, "player": ['))
+    assert error.value.problems[0][0] == '$'
+
+
+def test_max_problems():
+    data = load()
+    for location in data['player'][0]['locations']:
+        location['name'] = 1
+    assert len(problems(data, max_problems=3)) == 3
+
+
+def test_streaming_matches_parsed():
+    data = load()
+    data['player'][0]['locations'][4]['enemies'] = [{'name': 'Orc'}]
+    text = json.dumps(data)
+    validator = SaveValidator()
+    validator.check(data)
+    with pytest.raises(SaveValidationError) as error:
+        validate_file(io.StringIO(text), chunk_size=16)
+    assert error.value.problems == validator.problems()
+
+
+def test_file_handler_rejects_before_building(tmp_path):
+    data = load()
+    data['map_size'] = 0
+    path = tmp_path / 'broken.json'
+    path.write_text(json.dumps(data))
+    with pytest.raises(SaveValidationError):
+        FileHandler().read_from_json(str(path))
+    with pytest.raises(SaveValidationError):
+        FileHandler().stream_from_json(str(path))
+
+
+def test_sparse_world_can_be_saved_and_loaded(tmp_path):
+    world = World(5)
+    world.put(0, 0, Location('Start', '', 0, 'green', [], [], 0, 0))
+    world.put(4, 4, Location('End', '', 1, 'red', [], [], 4, 4))
+    player = Player('Jurek', (0, 0), world, 5, 100, [])
+    path = str(tmp_path / 'sparse.json')
+    FileHandler().save_to_json(path, player)
+    validate_file(path)
+    loaded = FileHandler().read_from_json(path)
+    assert [(x, y) for x, y, _ in loaded.locations().cells()] == [
+        (0, 0), (4, 4)]
+    journal = Journal(path)
+    journal.attach(player)
+    journal.save(player)
+    assert journal.load().locations().get(4, 4).name() == 'End'
+
+
+def test_huge_map_size_is_rejected_without_allocating():
+    with pytest.raises(SaveValidationError) as error:
+        validate_file(io.StringIO('{"map_size": 40000, "player": []}'))
+    assert error.value.problems == [('player', 'Save needs a player')]
+    with pytest.raises(SaveValidationError) as error:
+        validate({'map_size': 10 ** 9, 'player': []})
+    assert error.value.problems[0] == (
+        'map_size', 'Map cannot be bigger than 65536')
+
+
+def test_current_location_needs_ascii_digits():
+    data = load()
+    data['player'][0]['current_location'] = '1,²'
+    assert problems(data) == [('player[0].current_location',
+                               "Expected 'x,y'")]
+    data['player'][0]['current_location'] = f'1,{1 << 32}'
+    assert problems(data) == [('player[0].current_location',
+                               'Cannot be bigger than 4294967295')]
+
+
+def test_numbers_fit_binary_save(tmp_path):
+    data = load()
+    data['player'][0]['health'] = 1 << 32
+    data['player'][0]['locations'][1]['enemies'][0]['power'] = 1 << 40
+    assert problems(data) == [
+        ('player[0].health', 'Cannot be bigger than 4294967295'),
+        ('player[0].locations[1].enemies[0].power',
+         'Cannot be bigger than 4294967295')]
+    data['player'][0]['health'] = (1 << 32) - 1
+    data['player'][0]['locations'][1]['enemies'][0]['power'] = 5
+    path = tmp_path / 'big.json'
+    path.write_text(json.dumps(data))
+    player = FileHandler().read_from_json(str(path))
+    FileHandler().save_to_binary(str(tmp_path / 'big.bin'), player)
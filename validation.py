@@ -0,0 +1,362 @@
+"""
+Validation of json saves. Save is checked in one pass, every problem
+is reported with path to the wrong value, e.g.
+player[0].locations[812].enemies[3].power. Big files are checked while
+they are read, locations one by one, without building game objects.
+"""
+import json
+from json_stream import JsonStream
+
+# checking does not depend on map size, but bigger maps cannot be played
+MAX_MAP_SIZE = 1 << 16
+# numbers are kept as unsigned 32-bit integers in binary saves
+MAX_NATURAL = (1 << 32) - 1
+
+
+class SaveValidationError(KeyError):
+    """
+    Raised when save file is not valid. Contains attributes:
+    :param problems: list of (path, message) for every problem found
+    :type problems: list
+    """
+    def __init__(self, problems):
+        super().__init__(problems[0][1])
+        self.problems = problems
+
+    def __str__(self):
+        path, message = self.problems[0]
+        description = f'{message}: {path}'
+        if len(self.problems) > 1:
+            description += f' (and {len(self.problems) - 1} more problems)'
+        return description
+
+
+class TooManyProblems(Exception):
+    pass
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+class SaveValidator:
+    """
+    Class SaveValidator. Collects problems found in parts of save.
+    :param max_problems: checking stops after so many problems
+    :type max_problems: int
+    :param full_map: True if every cell of the map needs a location
+    :type full_map: bool
+    :param overlay: True if save has only locations changed from
+        template, then player does not have to stand in one of them
+    :type overlay: bool
+    :param max_players: number of players save can have, None if any
+    :type max_players: int
+    """
+    def __init__(self, max_problems=100, full_map=False, overlay=False,
+                 max_players=1):
+        self._max_problems = max_problems
+        self._full_map = full_map and not overlay
+        self._overlay = overlay
+        self._max_players = max_players
+        self._names = set()
+        self._problems = []
+        self._map_size = None
+        self._seen = None
+        self._pending = []
+        self._players = 0
+        self._current = []
+
+    def problems(self):
+        return list(self._problems)
+
+    def problem(self, path, message):
+        self._problems.append((path, message))
+        if len(self._problems) >= self._max_problems:
+            raise TooManyProblems()
+
+    def _key(self, data, path, key):
+        if key not in data:
+            self.problem(f'{path}.{key}', 'Missing key in file')
+            return False
+        return True
+
+    def _string(self, data, path, key, empty=True, none=False):
+        if not self._key(data, path, key):
+            return
+        value = data[key]
+        if value is None and none:
+            return
+        if not isinstance(value, str):
+            self.problem(f'{path}.{key}', 'Expected string')
+        elif not value and not empty:
+            self.problem(f'{path}.{key}', 'Cannot be empty')
+
+    def _natural(self, data, path, key):
+        if not self._key(data, path, key):
+            return None
+        value = data[key]
+        if not _is_int(value):
+            self.problem(f'{path}.{key}', 'Expected integer')
+            return None
+        if value < 0:
+            self.problem(f'{path}.{key}', 'Cannot be negative')
+            return None
+        if value > MAX_NATURAL:
+            self.problem(f'{path}.{key}',
+                         f'Cannot be bigger than {MAX_NATURAL}')
+            return None
+        return value
+
+    def _object(self, data, path):
+        if not isinstance(data, dict):
+            self.problem(path, 'Expected object')
+            return False
+        return True
+
+    def _list(self, data, path, key):
+        if not self._key(data, path, key):
+            return []
+        if not isinstance(data[key], list):
+            self.problem(f'{path}.{key}', 'Expected list')
+            return []
+        return data[key]
+
+    def gem(self, data, path):
+        if self._object(data, path):
+            self._string(data, path, 'name')
+            self._string(data, path, 'color', empty=False)
+
+    def enemy(self, data, path):
+        if self._object(data, path):
+            self._string(data, path, 'name', empty=False)
+            self._natural(data, path, 'health')
+            self._natural(data, path, 'power')
+
+    def size(self):
+        """
+        Returns map size or None if it was not checked yet.
+        """
+        return self._map_size
+
+    def check_map_size(self, value, path='map_size'):
+        if not _is_int(value) or value < 1:
+            self.problem(path, 'Expected positive integer')
+            return
+        if value > MAX_MAP_SIZE:
+            self.problem(path, f'Map cannot be bigger than {MAX_MAP_SIZE}')
+            return
+        self._map_size = value
+        self._seen = set()
+        pending, self._pending = self._pending, None
+        for x, y, location_path in pending:
+            self._cell(x, y, location_path)
+
+    def _cell(self, x, y, path):
+        size = self._map_size
+        if self._seen is None:
+            if self._pending is not None:
+                self._pending.append((x, y, path))
+            return
+        if not (x < size and y < size):
+            self.problem(path, f'Coordinates outside of {size}x{size} map')
+        elif (x, y) in self._seen:
+            self.problem(path, f'Second location at {x},{y}')
+        else:
+            self._seen.add((x, y))
+
+    def location(self, data, path):
+        """
+        Checks one location.
+        """
+        if not self._object(data, path):
+            return
+        x = self._natural(data, path, 'x')
+        y = self._natural(data, path, 'y')
+        self._string(data, path, 'name')
+        self._string(data, path, 'description', none=True)
+        if self._key(data, path, 'barrier'):
+            if data['barrier'] not in (0, 1):
+                self.problem(f'{path}.barrier', 'Expected 0 or 1')
+        self._string(data, path, 'barrier_color', empty=False, none=True)
+        for index, enemy in enumerate(self._list(data, path, 'enemies')):
+            self.enemy(enemy, f'{path}.enemies[{index}]')
+        for index, gem in enumerate(self._list(data, path, 'gems')):
+            self.gem(gem, f'{path}.gems[{index}]')
+        if x is not None and y is not None:
+            self._cell(x, y, path)
+
+    def player(self, data, path):
+        """
+        Checks player's fields, without locations.
+        """
+        self._players += 1
+        if self._max_players is not None \
+                and self._players == self._max_players + 1:
+            if self._max_players == 1:
+                self.problem('player', 'Save can have only one player')
+            else:
+                self.problem('player', f'Save can have at most'
+                             f' {self._max_players} players')
+        self._string(data, path, 'name', empty=False)
+        name = data.get('name')
+        if isinstance(name, str):
+            if name in self._names:
+                self.problem(f'{path}.name', f'Second player named {name}')
+            self._names.add(name)
+        self._natural(data, path, 'power')
+        self._natural(data, path, 'health')
+        for index, gem in enumerate(self._list(data, path, 'equipment')):
+            self.gem(gem, f'{path}.equipment[{index}]')
+        self._list(data, path, 'locations')
+        if not self._key(data, path, 'current_location'):
+            return
+        value = data['current_location']
+        parts = value.split(',') if isinstance(value, str) else ()
+        parts = [part.strip() for part in parts]
+        # isdigit alone accepts digits like '²' which int cannot read
+        if len(parts) != 2 or not all(part.isascii() and part.isdigit()
+                                      for part in parts):
+            self.problem(f'{path}.current_location', "Expected 'x,y'")
+            return
+        x, y = int(parts[0]), int(parts[1])
+        if x > MAX_NATURAL or y > MAX_NATURAL:
+            self.problem(f'{path}.current_location',
+                         f'Cannot be bigger than {MAX_NATURAL}')
+            return
+        self._current.append((x, y, path))
+
+    def finish(self, has_map_size=True, has_player=True):
+        """
+        Makes checks which need the whole file.
+        """
+        if not has_map_size:
+            self.problem('map_size', 'Missing key in file')
+        if not has_player:
+            self.problem('player', 'Missing key in file')
+        elif not self._players:
+            self.problem('player', 'Save needs a player')
+        if self._seen is not None:
+            size = self._map_size
+            for x, y, path in self._current if not self._overlay else ():
+                if (x, y) not in self._seen:
+                    self.problem(f'{path}.current_location',
+                                 'Player is not in any location')
+            missing = size * size - len(self._seen)
+            if self._full_map and missing:
+                # one of the first len(seen) + 1 cells has to be missing
+                index = next(index for index in range(len(self._seen) + 1)
+                             if divmod(index, size) not in self._seen)
+                self.problem('map_size', f'{missing} cells have no location,'
+                             f' first is {index // size},{index % size}')
+
+    def check(self, data):
+        """
+        Checks save which was already parsed from json.
+        """
+        if not self._object(data, '$'):
+            return
+        if 'map_size' in data:
+            self.check_map_size(data['map_size'])
+        players = data.get('player')
+        if players is not None and not isinstance(players, list):
+            self.problem('player', 'Expected list')
+            players = []
+        for index, player in enumerate(players or ()):
+            path = f'player[{index}]'
+            if not self._object(player, path):
+                continue
+            self.player(player, path)
+            locations = player.get('locations')
+            if not isinstance(locations, list):
+                continue
+            for number, location in enumerate(locations):
+                self.location(location, f'{path}.locations[{number}]')
+        self.finish('map_size' in data, players is not None)
+
+    def check_stream(self, stream):
+        """
+        Checks save read from JsonStream, one location at a time.
+        """
+        has_map_size = False
+        has_player = False
+        for key in stream.members():
+            if key == 'map_size':
+                has_map_size = True
+                self.check_map_size(stream.value())
+            elif key == 'player':
+                has_player = True
+                if stream.peek() != '[':
+                    stream.value()
+                    self.problem('player', 'Expected list')
+                    continue
+                for index in stream.items():
+                    self.stream_player(stream, f'player[{index}]')
+            else:
+                stream.value()
+        self.finish(has_map_size, has_player)
+
+    def stream_player(self, stream, path, on_location=None):
+        """
+        Checks player read from JsonStream. Every valid location is
+        passed to on_location. Returns player's fields.
+        """
+        if stream.peek() != '{':
+            stream.value()
+            self.problem(path, 'Expected object')
+            return None
+        data = {}
+        for key in stream.members():
+            if key != 'locations':
+                data[key] = stream.value()
+                continue
+            if stream.peek() != '[':
+                data[key] = stream.value()
+                continue
+            data[key] = []
+            for index in stream.items():
+                location = stream.value()
+                problems = len(self._problems)
+                self.location(location, f'{path}.locations[{index}]')
+                if on_location and len(self._problems) == problems:
+                    on_location(location)
+        self.player(data, path)
+        return data
+
+
+def _raise(validator):
+    if validator.problems():
+        raise SaveValidationError(validator.problems())
+
+
+def validate(data, max_problems=100, full_map=False, overlay=False,
+             max_players=1):
+    """
+    Checks save parsed from json.
+    Raises SaveValidationError with all problems found.
+    """
+    validator = SaveValidator(max_problems, full_map, overlay, max_players)
+    try:
+        validator.check(data)
+    except TooManyProblems:
+        pass
+    _raise(validator)
+
+
+def validate_file(source, max_problems=100, full_map=False,
+                  chunk_size=65536):
+    """
+    Checks save file given by path or file object while reading it.
+    Raises SaveValidationError with all problems found.
+    """
+    if not hasattr(source, 'read'):
+        with open(source, 'r') as file_handle:
+            return validate_file(file_handle, max_problems, full_map,
+                                 chunk_size)
+    validator = SaveValidator(max_problems, full_map)
+    try:
+        validator.check_stream(JsonStream(source, chunk_size))
+    except TooManyProblems:
+        pass
+    except json.JSONDecodeError as e:
+        validator._problems.append(('$', f'Invalid json, {e.msg}'))
+    _raise(validator)